@@ -1,23 +1,88 @@
+import aiohttp
+import asyncio
 import openai
 import os
 import weaviate  # type: ignore[import]
 import json
-import re
+import time
+
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, List, Optional
 
 from wasabi import msg  # type: ignore[import]
 
-from fastapi import FastAPI, status
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Header, Query, Request, status
+from fastapi.responses import Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
 from dotenv import load_dotenv
 
+from async_weaviate import AsyncWeaviateClient
+from cache_policy import CachePolicy, cache_entry_id, policy_properties
+from embeddings import (
+    BatchingEmbedder,
+    CachedEmbedder,
+    EmbeddingCache,
+    OpenAIEmbedder,
+    vectorized_text,
+)
+from graphql_transform import (
+    modify_graphql,
+    near_text_concepts,
+    near_vector_graphql,
+    project_graphql,
+)
+from graphql_validator import validate_graphql
+from intent import IntentParser
+from metrics import (
+    cache_lookups,
+    cache_writes,
+    llm_in_flight,
+    llm_requests,
+    llm_tokens,
+    mark_process_dead,
+    query_retries,
+    render,
+    requests_total,
+    stage_timer,
+    timed,
+    track_request,
+)
+from product_store import ProductStore
+from prompt import build_system_prompt
+from query_cache import QueryCache, normalize_query, read_cache_generation
+from responses import OrjsonResponse, json_bytes_response, serialize
+from schema import cached_result_class, product_class
+from shared_state import create_state
+from singleflight import SingleFlight
+from tracing import RequestIdMiddleware, annotate, span, start_trace
+from vector_index import VectorIndex
+from write_behind import WriteBehindQueue
+
 load_dotenv()
 
-# Request Count
-request_count = 0
-cache_count = 0
+# Counters and cache bookkeeping shared by the uvicorn workers, set SHARED_STATE_PATH when running several
+shared_state = create_state(os.environ.get("SHARED_STATE_PATH", ""))
+# Seconds between writes of the buffered shared state updates of a worker
+shared_state_flush_interval = float(os.environ.get("SHARED_STATE_FLUSH_INTERVAL", 0.5))
+# Query requests a client may send per RATE_LIMIT_WINDOW seconds, counted by all workers together, 0 disables the limit
+rate_limit = int(os.environ.get("RATE_LIMIT", 0))
+rate_limit_window = float(os.environ.get("RATE_LIMIT_WINDOW", 60))
+
+# Number of CachedResult objects, readiness probes share one Aggregate count for CACHE_COUNT_TTL seconds
+cache_count_ttl = float(os.environ.get("CACHE_COUNT_TTL", 5))
+cache_count_flight = SingleFlight()
+
+# Key for the admin endpoints (X-Admin-Key header), they are open if not set
+admin_api_key = os.environ.get("ADMIN_API_KEY", "")
+
+# Single-flight coalescing of identical in-flight queries
+single_flight = SingleFlight()
+
+# Pooled HTTP session for the OpenAI API, created on startup
+openai_session = None
 
 # Configuration
 data_fields = [
@@ -32,6 +97,54 @@ data_fields = [
     "effects",
 ]
 
+# Properties a response can be projected to, id and distance are always included
+projection_fields = data_fields + ["reviewCount"]
+
+# In-process exact-match cache in front of the Weaviate cache
+query_cache = QueryCache(
+    max_entries=int(os.environ.get("QUERY_CACHE_MAX_ENTRIES", 1024)),
+    max_bytes=int(os.environ.get("QUERY_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+    ttl=float(os.environ.get("QUERY_CACHE_TTL", 3600)),
+)
+
+# Eviction of CachedResult objects, hits are written back and entries evicted by the periodic compactor
+cache_policy = CachePolicy(
+    ttl=float(os.environ.get("CACHE_TTL", 7 * 24 * 3600)),
+    max_entries=int(os.environ.get("CACHE_MAX_ENTRIES", 10000)),
+    max_bytes=int(os.environ.get("CACHE_MAX_BYTES", 256 * 1024 * 1024)),
+    mode=os.environ.get("CACHE_EVICTION", "lfu"),
+    state=shared_state,
+)
+cache_compact_interval = float(os.environ.get("CACHE_COMPACT_INTERVAL", 600))
+
+# Product records by id, cached results only store the product ids and distances
+product_store = ProductStore(
+    max_entries=int(os.environ.get("PRODUCT_STORE_MAX_ENTRIES", 100000))
+)
+cached_result_fields = [
+    "naturalQuery",
+    "graphQuery",
+    "productIds",
+    "productDistances",
+    "summary",
+]
+
+# Local vector index over the CachedResult vectors for the semantic cache lookup
+semantic_index = VectorIndex()
+semantic_index_path = os.environ.get("SEMANTIC_INDEX_PATH", "")
+semantic_index_refresh = float(os.environ.get("SEMANTIC_INDEX_REFRESH", 300))
+# Queries and nearText concepts are embedded once: concurrent requests share a batch and the vectors are kept on disk
+embedding_cache = EmbeddingCache(
+    Path(os.environ.get("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite"))
+)
+batching_embedder = BatchingEmbedder(
+    OpenAIEmbedder(), max_wait=float(os.environ.get("EMBED_BATCH_WAIT", 0.005))
+)
+embedder = CachedEmbedder(batching_embedder, embedding_cache)
+
+# Deterministic fast path for common query shapes, the brands are loaded on startup
+intent_parser = IntentParser(data_fields)
+
 model_name = (
     "gpt-4"  # default (gpt-4), change to (gpt-3.5-turbo) if you don't have access
 )
@@ -50,6 +163,11 @@ if openai.api_key != "":
             additional_headers={"X-OpenAI-Api-Key": openai.api_key},
             auth_client_secret=auth_config,
         )
+        aclient = AsyncWeaviateClient(
+            url=url,
+            api_key=os.environ.get("HEALTHSEARCH_API_KEY", ""),
+            additional_headers={"X-OpenAI-Api-Key": openai.api_key},
+        )
     else:
         msg.warn("Server URL not available")
         exit()
@@ -57,151 +175,313 @@ else:
     msg.warn("Open AI API Key not available")
     exit()
 
-# Define system prompt for conversation with GPT model
-system_prompt = """
+# System prompt for the query generation, rebuilt from the live schema on startup
+system_prompt = build_system_prompt(product_class, data_fields)
 
-You are a parser that understands the meaning of natural language queries and parses them into valid graphql queries based on this schema:
 
-    class_obj = {
-        "class": "Product",
-        "description": "Supplementary products from iHerb",
-        "properties": [
-            {
-                "dataType": ["text"],
-                "description": "The name of the product",
-                "name": "name",
-            },
-            {
-                "dataType": ["text"],
-                "description": "The brand of the product",
-                "name": "brand",
-            },
-            {
-                "dataType": ["text"],
-                "description": "The ingredients contained in the product.",
-                "name": "ingredients",
-            },
-            {
-                "dataType": ["text[]"],
-                "description": "Reviews about the product",
-                "name": "reviews",
-            },
-            {
-                "dataType": ["text"],
-                "description": "Image URL of the product",
-                "name": "image",
-            },
-            {
-                "dataType": ["number"],
-                "description": "The Rating of the product",
-                "name": "rating",
-            },
-            {
-                "dataType": ["text"],
-                "description": "The description of the product",
-                "name": "description",
-            },
-            {
-                "dataType": ["text"],
-                "description": "The summary of the reviews",
-                "name": "summary",
-            },
-            {
-                "dataType": ["text"],
-                "description": "The health effects of the product",
-                "name": "effects",
-            },
-        ],
+async def load_semantic_index() -> VectorIndex:
+    """Page through all CachedResult objects and load their vectors into a local index
+    @returns VectorIndex - Index over the cached natural language queries
+    """
+    index = VectorIndex()
+    index.generation = read_cache_generation()
+    after = None
+    try:
+        while True:
+            query = (
+                client.query.get("CachedResult")
+                .with_additional(["id", "vector"])
+                .with_limit(500)
+            )
+            if after:
+                query = query.with_after(after)
+            results = await aclient.raw(query.build())
+            if "errors" in results:
+                msg.warn(f"Error in load_semantic_index: {results['errors']}")
+                break
+            objects = results["data"]["Get"]["CachedResult"]
+            for obj in objects:
+                index.add(obj["_additional"]["id"], obj["_additional"]["vector"])
+            if len(objects) < 500:
+                break
+            after = objects[-1]["_additional"]["id"]
+    except Exception as e:
+        msg.warn(f"Semantic cache index could not be loaded: {str(e)}")
+
+    msg.good(f"Loaded semantic cache index ({len(index)} entries)")
+    return index
+
+
+async def refresh_semantic_index() -> None:
+    """Periodically rebuild the semantic index to pick up entries added by other workers"""
+    global semantic_index
+    while True:
+        await asyncio.sleep(semantic_index_refresh)
+        semantic_index = await load_semantic_index()
+
+
+async def load_cache_entries() -> list:
+    """Page through all CachedResult objects and read their bookkeeping properties
+    @returns list - Entries with "id", "vector" and the properties of policy_properties
+    """
+    entries = []
+    after = None
+    while True:
+        query = (
+            client.query.get("CachedResult", policy_properties)
+            .with_additional(["id", "vector"])
+            .with_limit(500)
+        )
+        if after:
+            query = query.with_after(after)
+        results = await aclient.raw(query.build())
+        if "errors" in results:
+            raise Exception(results["errors"])
+        objects = results["data"]["Get"]["CachedResult"]
+        for obj in objects:
+            additional = obj.pop("_additional")
+            entries.append(dict(obj, id=additional["id"], vector=additional["vector"]))
+        if len(objects) < 500:
+            return entries
+        after = entries[-1]["id"]
+
+
+async def compact_cache() -> dict:
+    """Write the recorded hits back to the CachedResult objects and evict entries according to the cache policy
+    @returns dict - Number of entries, their size and the hits written, expired and evicted entries
+    """
+    now = time.time()
+    entries = await load_cache_entries()
+    # The hits are taken once the entries loaded, a failed load keeps them for the next run
+    hits = cache_policy.take_hits()
+
+    updates = []
+    for entry in entries:
+        vector = entry.pop("vector")
+        update = {}
+        # Entries written before the cache policy existed don't have the bookkeeping properties
+        if entry.get("createdAt") is None:
+            update = {"createdAt": now, "lastHitAt": now, "hitCount": 0}
+        if entry["id"] in hits:
+            count, last_hit = hits[entry["id"]]
+            update["hitCount"] = (entry.get("hitCount") or 0) + count
+            update["lastHitAt"] = max(entry.get("lastHitAt") or 0, last_hit)
+        entry.update(update)
+        entry["sizeBytes"] = entry.get("sizeBytes") or 0
+        if update:
+            updates.append((entry["id"], update, vector))
+
+    # The patch carries the stored vector, otherwise Weaviate would vectorize every updated entry again
+    for start in range(0, len(updates), 20):
+        await asyncio.gather(
+            *[
+                aclient.patch_object("CachedResult", entry_id, update, vector)
+                for entry_id, update, vector in updates[start : start + 20]
+            ]
+        )
+
+    expired, evicted = cache_policy.select_evictions(entries, now)
+    removed = expired + evicted
+    for start in range(0, len(removed), 100):
+        operands = [
+            {"path": ["id"], "operator": "Equal", "valueText": entry["id"]}
+            for entry in removed[start : start + 100]
+        ]
+        await aclient.delete_objects(
+            "CachedResult",
+            (
+                operands[0]
+                if len(operands) == 1
+                else {"operator": "Or", "operands": operands}
+            ),
+        )
+
+    if removed:
+        semantic_index.remove({entry["id"] for entry in removed})
+        # Every projection of a query is cached under its own response_key
+        removed_queries = {entry["naturalQuery"] for entry in removed}
+        query_cache.remove_where(lambda key: key.split("\n", 1)[0] in removed_queries)
+
+    removed_ids = {entry["id"] for entry in removed}
+    return {
+        "entries": len(entries) - len(removed),
+        "bytes": sum(
+            entry["sizeBytes"] for entry in entries if entry["id"] not in removed_ids
+        ),
+        "hits_written": sum(
+            hits[entry_id][0] for entry_id, _, _ in updates if entry_id in hits
+        ),
+        "expired": len(expired),
+        "evicted": len(evicted),
+        "seconds": round(time.time() - now, 3),
     }
 
-    The query will be used to retrieve supplement products from a Weaviate database, make sure that all fields are returned with the _additional distance attribute.
-    Your answers are only allowed to contain the query, the results will be used directly.
-
-    Example natural language query: 'Which product is helpful for joint pain?' produce this GraphQL query:
-
-    {
-      Get {
-        Product(
-          nearText: {concepts: ["Helpful", "joint pain"]}
-        ) {
-          name
-          brand
-          ingredients
-          reviews
-          image
-          rating
-          description
-          summary
-          effects
-          _additional {
-            id
-            distance
-          }
+
+async def run_cache_compactor() -> None:
+    """Periodically compact the CachedResult class"""
+    while True:
+        await asyncio.sleep(cache_compact_interval)
+        # One worker compacts per interval, the lease expires a little early so the next wake-up can take it
+        if not shared_state.add(
+            "cache_policy:compactor", os.getpid(), ttl=cache_compact_interval * 0.9
+        ):
+            continue
+        try:
+            cache_policy.last_run = await compact_cache()
+            msg.info(f"Cache compacted: {cache_policy.last_run}")
+        except Exception as e:
+            msg.warn(f"Cache compaction failed: {str(e)}")
+
+
+async def run_state_flusher() -> None:
+    """Periodically write the buffered shared state updates in a thread, so the event loop doesn't wait for the database lock"""
+    while True:
+        await asyncio.sleep(shared_state_flush_interval)
+        try:
+            await asyncio.to_thread(shared_state.flush)
+        except Exception as e:
+            msg.warn(f"Shared state flush failed: {str(e)}")
+
+
+async def add_cache_properties() -> None:
+    """Add the bookkeeping properties of the cache policy to a CachedResult class created before it existed"""
+    try:
+        existing = {
+            prop["name"]
+            for prop in (await aclient.get_class("CachedResult"))["properties"]
         }
-      }
-    }
+        for prop in cached_result_class["properties"]:
+            if prop["name"] not in existing:
+                await aclient.add_property("CachedResult", prop)
+                msg.info(f"Added {prop['name']} to the CachedResult class")
+    except Exception as e:
+        msg.warn(f"CachedResult schema could not be updated: {str(e)}")
+
 
-    Example natural language query: 'Products from brand "Life Extension" for glowing skin' produce this GraphQL query:
-
-    {
-  Get {
-    Product(
-      nearText: {concepts: ["glowing skin"]}
-      where: {
-        path: ["brand"],
-        operator: Equal,
-        valueString: "Life Extension"
-      }
-    ) {
-          name
-          brand
-          ingredients
-          reviews
-          image
-          rating
-          description
-          summary
-          effects
-      _additional {
-      id
-        distance
-      }
+async def load_brands() -> list:
+    """Fetch the distinct product brands for the intent fast path
+    @returns list - Brand names, empty if the aggregation failed
+    """
+    query = (
+        client.query.aggregate("Product")
+        .with_group_by_filter(["brand"])
+        .with_fields("groupedBy { value }")
+        .with_limit(10000)
+    )
+    try:
+        results = await aclient.raw(query.build())
+        groups = results["data"]["Aggregate"]["Product"]
+        return [group["groupedBy"]["value"] for group in groups]
+    except Exception as e:
+        msg.warn(
+            f"Brands could not be loaded, the fast path won't filter by brand: {str(e)}"
+        )
+        return []
+
+
+def llm_summary() -> dict:
+    """Return the number of completion requests with their average latency and token usage
+    @returns dict - LLM statistics
+    """
+    llm_stats = shared_state.counters("llm:")
+    calls = int(llm_stats.get("llm:calls", 0))
+    prompt_tokens = int(llm_stats.get("llm:prompt_tokens", 0))
+    return {
+        "calls": calls,
+        "avg_ms": round(llm_stats["llm:seconds"] / calls * 1000, 1) if calls else 0.0,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": int(llm_stats.get("llm:completion_tokens", 0)),
+        "avg_prompt_tokens": round(prompt_tokens / calls, 1) if calls else 0.0,
+        "system_prompt_chars": len(system_prompt),
     }
-  }
-}
 
-  Example natural language query: 'Lowest rated products for energy' produce this GraphQL query:
-
-  {
-  Get {
-    Product(
-      nearText: {concepts: ["energy"]}
-      sort: [{
-      path: ["rating"]     
-      order: asc          
-    }]
-    ) {
-      name
-          brand
-          ingredients
-          reviews
-          image
-          rating
-          description
-          summary
-          effects
-      _additional {
-      id
-        distance
-      }
+
+async def embed_query(natural_query: str):
+    """Embed a natural language query
+    @parameter natural_query : str - Natural Query of the user
+    @returns np.ndarray | None - Query vector, None if the embedding request failed
+    """
+    try:
+        return (await embedder.embed([natural_query]))[0]
+    except Exception as e:
+        msg.warn(f"Embedding request failed: {str(e)}")
+        return None
+
+
+async def embed_concepts(concepts: tuple) -> dict:
+    """Embed the nearText concepts of a query, so Weaviate gets a nearVector and doesn't embed them again
+    @parameter concepts : tuple - Concepts
+    @returns dict - Vectors by concept, empty if the embedding request failed (Weaviate embeds the nearText then)
+    """
+    if not concepts:
+        return {}
+    try:
+        return dict(zip(concepts, await embedder.embed(list(concepts))))
+    except Exception as e:
+        msg.warn(f"Embedding request failed: {str(e)}")
+        return {}
+
+
+def embedding_summary() -> dict:
+    """Return the embedding cache lookups and the batched embedding requests
+    @returns dict - Embedding statistics
+    """
+    return {
+        "cache_hits": embedding_cache.hits,
+        "cache_misses": embedding_cache.misses,
+        "requests": batching_embedder.requests,
+        "texts": batching_embedder.texts,
     }
-  }
-}
 
-"""
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup and shutdown of the FastAPI app, opens and closes the pooled OpenAI and Weaviate connections and loads the semantic cache index"""
+    global openai_session, semantic_index, system_prompt
+    openai_session = aiohttp.ClientSession()
+
+    try:
+        system_prompt = build_system_prompt(
+            await aclient.get_class("Product"), data_fields
+        )
+    except Exception as e:
+        msg.warn(f"Product schema could not be loaded, using schema.py: {str(e)}")
+
+    if semantic_index_path and Path(semantic_index_path).with_suffix(".npy").exists():
+        stored_index = VectorIndex.load(Path(semantic_index_path))
+        if stored_index.generation == read_cache_generation():
+            semantic_index = stored_index
+            msg.good(f"Loaded semantic cache index ({len(semantic_index)} entries)")
+    if len(semantic_index) == 0:
+        semantic_index = await load_semantic_index()
+    refresh_task = asyncio.create_task(refresh_semantic_index())
+    intent_parser.set_brands(await load_brands())
+    cache_writer.start()
+    flush_task = asyncio.create_task(run_state_flusher())
+    await add_cache_properties()
+    compact_task = (
+        asyncio.create_task(run_cache_compactor()) if cache_compact_interval else None
+    )
+
+    yield
+
+    # Write the queued cache entries before the Weaviate connection is closed
+    await cache_writer.close()
+    refresh_task.cancel()
+    flush_task.cancel()
+    if compact_task is not None:
+        compact_task.cancel()
+    if semantic_index_path:
+        semantic_index.save(Path(semantic_index_path))
+    await openai_session.close()
+    await aclient.close()
+    embedding_cache.close()
+    shared_state.close()
+    mark_process_dead()
+
 
 # FastAPI App
-app = FastAPI()
+app = FastAPI(lifespan=lifespan, default_response_class=OrjsonResponse)
 
 origins = ["http://localhost:3000", "https://healthsearch-frontend.onrender.com"]
 
@@ -212,12 +492,55 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
 
+# Request ids for the traces and the slow query log, returned in the X-Request-ID header
+app.add_middleware(RequestIdMiddleware)
+
 
-def handle_results(results: dict) -> list:
+def product_record(query_result: dict) -> dict:
+    """Convert a Product object returned by Weaviate to the response format
+    @parameter query_result : dict - Product object with "_additional" id and distance
+    @returns dict - Product record
+    """
+    additional = query_result.get("_additional") or {}
+    reviews = query_result.get("reviews", [])
+    return {
+        "id": additional.get("id", ""),
+        "brand": query_result.get("brand", "No brand"),
+        "name": query_result.get("name", "No name"),
+        "rating": query_result.get("rating", 0.0),
+        "ingredients": query_result.get("ingredients", ""),
+        "description": query_result.get("description", ""),
+        "summary": query_result.get("summary", ""),
+        "effects": query_result.get("effects", ""),
+        "reviews": reviews,
+        "reviewCount": query_result.get("reviewCount", len(reviews)),
+        "image": query_result.get("image", ""),
+        "distance": round(additional.get("distance") or 0, 2),
+    }
+
+
+def project_record(record: dict, fields: Optional[list]) -> dict:
+    """Reduce a product record to the requested fields
+    @parameter record : dict - Product record
+    @parameter fields : list | None - Fields to keep, None keeps all
+    @returns dict - Projected product record with id and distance
+    """
+    if fields is None:
+        return record
+    return {
+        key: value
+        for key, value in record.items()
+        if key in fields or key in ("id", "distance")
+    }
+
+
+def handle_results(results: dict, fields: Optional[list] = None) -> list:
     """Process the results from Weaviate to a defined format
     @parameter results : dict - Dict containing the products retrieved from Weaviate
+    @parameter fields : list | None - Fields of the products to return, None for all
     @returns list - A list of products in dict format
     """
     try:
@@ -227,25 +550,12 @@ def handle_results(results: dict) -> list:
             query_results = data[key]["Product"]
             for query_result in query_results:
                 # Add hard filter
-                if len(query_result.get("reviews", [])) >= 5:
+                review_count = query_result.get(
+                    "reviewCount", len(query_result.get("reviews", []))
+                )
+                if review_count >= 5:
                     end_results.append(
-                        {
-                            "brand": query_result.get("brand", "No brand"),
-                            "name": query_result.get("name", "No name"),
-                            "rating": query_result.get("rating", 0.0),
-                            "ingredients": query_result.get("ingredients", ""),
-                            "description": query_result.get("description", ""),
-                            "summary": query_result.get("summary", ""),
-                            "effects": query_result.get("effects", ""),
-                            "reviews": query_result.get("reviews", []),
-                            "image": query_result.get("image", ""),
-                            "distance": round(
-                                query_result.get("_additional", {"distance": 0})[
-                                    "distance"
-                                ],
-                                2,
-                            ),
-                        }
+                        project_record(product_record(query_result), fields)
                     )
         return end_results
 
@@ -255,6 +565,7 @@ def handle_results(results: dict) -> list:
         print(results)
         return [
             {
+                "id": "",
                 "brand": "Brand",
                 "name": "Product",
                 "rating": 0.0,
@@ -263,13 +574,71 @@ def handle_results(results: dict) -> list:
                 "summary": "summary",
                 "effects": "effects",
                 "reviews": ["Review"],
+                "reviewCount": 1,
                 "image": "",
                 "distance": 0.0,
             }
         ]
 
 
-def get_cache(natural_query: str) -> dict:
+async def fetch_products(ids: list) -> list:
+    """Fetch products by id from Weaviate with a single query
+    @parameter ids : list - Product UUIDs
+    @returns list - Product records of the products that still exist
+    """
+    operands = [{"path": ["id"], "operator": "Equal", "valueText": id} for id in ids]
+    results = await aclient.raw(
+        client.query.get("Product", data_fields)
+        .with_additional(["id"])
+        .with_where(
+            operands[0]
+            if len(operands) == 1
+            else {"operator": "Or", "operands": operands}
+        )
+        .with_limit(len(ids))
+        .build()
+    )
+    if "errors" in results:
+        msg.warn(f"Error in fetch_products: {results['errors']}")
+        return []
+    return [product_record(product) for product in results["data"]["Get"]["Product"]]
+
+
+async def rehydrate_products(cache_entry: dict) -> Optional[list]:
+    """Build the product list of a cached result from its product references
+    @parameter cache_entry : dict - CachedResult object with productIds and productDistances
+    @returns list | None - Product records with the distances of the original query, None for an entry without product references
+    """
+    if cache_entry.get("productIds") is None:
+        # Entries written before the cached results referenced products store records without id and reviewCount
+        return None
+
+    ids = cache_entry["productIds"]
+    missing = product_store.missing(ids)
+    if missing:
+        product_store.put_many(await fetch_products(missing))
+    return product_store.rehydrate(
+        ids, cache_entry.get("productDistances") or [0.0] * len(ids)
+    )
+
+
+async def remove_legacy_entry(entry_id: str) -> None:
+    """Delete a CachedResult object written before the cached results referenced products.
+    Such entries may have a random UUID, so the regenerated result doesn't replace them and they would keep matching.
+    @parameter entry_id : str - UUID of the CachedResult object
+    @returns None
+    """
+    semantic_index.remove({entry_id})
+    try:
+        await aclient.delete_objects(
+            "CachedResult", {"path": ["id"], "operator": "Equal", "valueText": entry_id}
+        )
+        msg.info(f"Removed legacy cache entry {entry_id}")
+    except Exception as e:
+        msg.warn(f"Legacy cache entry {entry_id} could not be removed: {str(e)}")
+
+
+async def get_cache(natural_query: str) -> dict:
     """Check if a natural language query exists in the Weaviate database
     @parameter natural_query : str - Natural Query from the user
     @returns dict - Data object retrieved from weaviate
@@ -280,13 +649,12 @@ def get_cache(natural_query: str) -> dict:
         "valueText": str(natural_query),
     }
 
-    results = (
-        client.query.get(
-            "CachedResult", ["naturalQuery", "graphQuery", "products", "summary"]
-        )
+    results = await aclient.raw(
+        client.query.get("CachedResult", cached_result_fields)
         .with_where(filter)
+        .with_additional(["id"])
         .with_limit(1)
-        .do()
+        .build()
     )
 
     if "errors" in results:
@@ -300,27 +668,72 @@ def get_cache(natural_query: str) -> dict:
     return {"data": {"Get": {"CachedResult": []}}}
 
 
-def get_cache_count() -> list:
-    """Update the global cache count and return all cached queries
-    @returns list of queries
+async def count_cache_entries() -> int:
+    """Count the CachedResult objects with an Aggregate query
+    @returns int - Number of cached results
     """
-    query = client.query.get("CachedResult", ["naturalQuery"]).do()
-    cachedQueries = [
-        naturalQuery["naturalQuery"]
-        for naturalQuery in query["data"]["Get"]["CachedResult"]
-    ]
-    return cachedQueries
+    results = await aclient.raw(
+        client.query.aggregate("CachedResult").with_meta_count().build()
+    )
+    if "errors" in results:
+        raise Exception(results["errors"])
+    return results["data"]["Aggregate"]["CachedResult"][0]["meta"]["count"]
+
 
+async def get_cache_count() -> int:
+    """Update the shared cache count, Weaviate is queried about once every cache_count_ttl seconds by all workers together
+    @returns int - Number of cached results
+    """
+    cached = shared_state.get("cache_count") or {"count": 0, "checked": 0.0}
+    if time.time() - cached["checked"] >= cache_count_ttl:
+        # Concurrent probes of this worker wait for the same count
+        count, _ = await cache_count_flight.do("cache_count", count_cache_entries)
+        cached = {"count": count, "checked": time.time()}
+        shared_state.set("cache_count", cached)
+    return cached["count"]
+
+
+def last_cache_count() -> int:
+    """Return the last cache count of any worker without querying Weaviate
+    @returns int - Number of cached results, 0 before the first count
+    """
+    return (shared_state.get("cache_count") or {}).get("count", 0)
+
+
+async def list_cache_entries(limit: int, after: Optional[str] = None) -> dict:
+    """Return one page of cached queries, ordered by id
+    @parameter limit : int - Entries per page
+    @parameter after : str | None - Id of the last entry of the previous page
+    @returns dict - Weaviate response
+    """
+    query = (
+        client.query.get("CachedResult", policy_properties)
+        .with_additional(["id"])
+        .with_limit(limit)
+    )
+    if after:
+        query = query.with_after(after)
+    return await aclient.raw(query.build())
 
-def check_cache(cache_results: dict, natural_query: str, max_distance: float) -> dict:
+
+async def check_cache(
+    cache_results: dict, natural_query: str, query_vector, max_distance: float
+) -> dict:
     """Check if retrieved results are empty and use semantic search to find similar cached results based on the natural query
     @parameter cache_results : dict - Weaviate retrieved results
     @parameter natural_query : str - Natural Query of the user
+    @parameter query_vector : np.ndarray | None - Embedding of the natural query
     @parameter max_distance : float - Distance threshold for semantic search
     @returns dict | None - Data object retrieved from weaviate
     """
+    global semantic_index
+
     if cache_results["data"]["Get"]["CachedResult"]:
         msg.good("Cache entry exists!")
+        cache_lookups.labels("exact_hit").inc()
+        cache_policy.record_hit(
+            cache_results["data"]["Get"]["CachedResult"][0]["_additional"]["id"]
+        )
         cache_results["data"]["Get"]["CachedResult"][0]["summary"] = (
             "🛰️ RETRIEVED FROM CACHE: "
             + cache_results["data"]["Get"]["CachedResult"][0]["summary"]
@@ -328,280 +741,604 @@ def check_cache(cache_results: dict, natural_query: str, max_distance: float) ->
         return cache_results
     else:
         msg.warn("Cache entry does not exist!")
-        nearText = {"concepts": [natural_query], "max_distance": max_distance}
-        results = (
-            client.query.get(
-                "CachedResult", ["naturalQuery", "graphQuery", "products", "summary"]
-            )
-            .with_near_text(nearText)
-            .with_limit(1)
-            .with_additional(["distance"])
-            .do()
+
+        # Drop the local index if the CachedResult class was recreated
+        if semantic_index.generation != read_cache_generation():
+            semantic_index = VectorIndex()
+            semantic_index.generation = read_cache_generation()
+
+        match = (
+            semantic_index.search(query_vector) if query_vector is not None else None
         )
-        if not results["data"]["Get"]["CachedResult"]:
+        if match is None or match[1] > max_distance:
             msg.warn("No similar cache entry match")
+            cache_lookups.labels("miss").inc()
             return {}
-        elif (
-            results["data"]["Get"]["CachedResult"][0]["_additional"]["distance"]
-            > max_distance
-        ):
+
+        cache_id, distance = match
+        results = await aclient.raw(
+            client.query.get("CachedResult", cached_result_fields)
+            .with_where({"path": ["id"], "operator": "Equal", "valueText": cache_id})
+            .with_limit(1)
+            .build()
+        )
+        if "errors" in results or not results["data"]["Get"]["CachedResult"]:
             msg.warn("No similar cache entry match")
+            cache_lookups.labels("miss").inc()
             return {}
         else:
-            msg.good(
-                f'Retrieved similar results (distance {results["data"]["Get"]["CachedResult"][0]["_additional"]["distance"]})'
-            )
+            results["data"]["Get"]["CachedResult"][0]["_additional"] = {
+                "id": cache_id,
+                "distance": distance,
+            }
+            msg.good(f"Retrieved similar results (distance {distance})")
+            cache_lookups.labels("semantic_hit").inc()
+            cache_policy.record_hit(cache_id)
             results["data"]["Get"]["CachedResult"][0]["summary"] = (
-                f"⭐ RETURNED SIMILAR CACHED RESULTS FROM QUERY '{results['data']['Get']['CachedResult'][0]['naturalQuery']}' ({round(results['data']['Get']['CachedResult'][0]['_additional']['distance'],2)}) : "
+                f"⭐ RETURNED SIMILAR CACHED RESULTS FROM QUERY '{results['data']['Get']['CachedResult'][0]['naturalQuery']}' ({round(distance,2)}) : "
                 + results["data"]["Get"]["CachedResult"][0]["summary"]
             )
             return results
 
 
 def add_cache(naturalQuery: str, graphQuery: str, results: dict, summary: str) -> None:
-    """Add results to the Weaviate cache
+    """Queue results for the Weaviate cache, they are written in batches by the write-behind queue
     @parameter natural_query : str - Natural Query of the user
     @parameter graphQuery : str - Generated GraphQL query
-    @parameter results : dict - Results retrieved from Weaviate
+    @parameter results : list - Product records, only their ids and distances are stored
     @parameter summary : str - Generated product summary
     @returns None
     """
+    now = time.time()
     data_object = {
         "graphQuery": graphQuery,
         "naturalQuery": naturalQuery,
-        "products": json.dumps(results),
+        "productIds": [record["id"] for record in results if record["id"]],
+        "productDistances": [record["distance"] for record in results if record["id"]],
         "summary": summary,
+        "createdAt": now,
+        "lastHitAt": now,
+        "hitCount": 0,
     }
+    data_object["sizeBytes"] = len(json.dumps(data_object).encode())
 
-    with client.batch as batch:
-        batch.batch_size = 1
-        client.batch.add_data_object(data_object, "CachedResult")
+    batch_object: dict = {
+        "class": "CachedResult",
+        "id": cache_entry_id(naturalQuery),
+        "properties": data_object,
+    }
 
-    msg.good("Added new cache entry")
+    if cache_writer.put(batch_object):
+        cache_writes.labels("queued").inc()
+    else:
+        cache_writes.labels("dropped").inc()
+        msg.warn("Cache write queue is full, cache entry dropped")
 
 
-def modify_graphql(graphQuery: str, natural_query: str, fields: list) -> str:
-    """Uses the generated GraphQL query to generate the query for creating the product summary
-    @parameter natural_query : str - Natural Query of the user
-    @parameter graphQuery : str - Generated GraphQL query
-    @parameter fields : list - List of strings for every data field
-    @returns str - GraphQL query with the generate module
+async def flush_cache(entries: list) -> None:
+    """Write queued cache entries with one batch request
+    @parameter entries : list - Batch objects queued by add_cache
+    @returns None
     """
-    # Fields to keep
-    fields_to_keep = ["summary", "description", "ingredients"]
-
-    # All fields present in the query
-    all_fields = fields
-
-    # Fields to remove
-    fields_to_remove = [field for field in all_fields if field not in fields_to_keep]
-
-    # Pattern to match 'where' clause
-    where_pattern = r"where:\s*\{([^\}]*)\}"
-
-    # Check if 'where' field exists
-    where_match = re.search(where_pattern, graphQuery, flags=re.DOTALL)
-    if where_match:
-        # 'where' field exists, extract field names within 'where' clause
-        where_clause = where_match.group(1)
-        where_fields = re.findall(r"path:\s*\[([^\]]*)\]", where_clause)
-
-        # If a field in the 'where' clause is in the fields to be removed, keep it
-        for where_field in where_fields:
-            where_field = where_field.replace('"', "").strip()
-            if where_field in fields_to_remove:
-                fields_to_remove.remove(where_field)
-
-    # Pattern to match 'sort' clause
-    sort_pattern = r"sort:\s*\[\{([^\}]*)\}\]"
-
-    # Check if 'sort' field exists
-    sort_match = re.search(sort_pattern, graphQuery, flags=re.DOTALL)
-    if sort_match:
-        # 'sort' field exists, extract field names within 'sort' clause
-        sort_clause = sort_match.group(1)
-        sort_fields = re.findall(r"path:\s*\[([^\]]*)\]", sort_clause)
-
-        # If a field in the 'sort' clause is in the fields to be removed, keep it
-        for sort_field in sort_fields:
-            sort_field = sort_field.replace('"', "").strip()
-            if sort_field in fields_to_remove:
-                fields_to_remove.remove(sort_field)
-
-    # Remove unwanted fields
-    for field in fields_to_remove:
-        graphQuery = re.sub(rf"\s*{field}", "", graphQuery)
-
-    # Pattern to match '_additional'
-    pattern = r"(_additional\s*\{[^\}]*\})"
-
-    # Pattern to match 'limit'
-    limit_pattern = r"(limit:\s*\d+)"
-
-    # Check if 'limit' field exists and if it's greater than 5
-    limit_match = re.search(limit_pattern, graphQuery)
-    if limit_match:
-        # Limit field exists, ensure it's not greater than 5
-        limit_value = int(limit_match.group().split(":")[1].strip())
-        if limit_value > 5:
-            graphQuery = re.sub(limit_pattern, "limit: 5", graphQuery)
-    else:
-        # 'limit' field doesn't exist, add it
-        graphQuery = re.sub(r"Product\(", "Product(\n      limit: 5", graphQuery)
-
-    # Replacement '_additional'
-    replacement = f"""
-      _additional {{
-        generate(
-          groupedResult: {{
-            task: "Summarize products based on this query: {natural_query}"
-          }}
-        ) {{
-          groupedResult
-          error
-        }}
-        id
-        distance
-      }}"""
-
-    # Replace '_additional'
-    modified_query = re.sub(pattern, replacement, graphQuery, flags=re.DOTALL)
-
-    return modified_query
+    # Embed the text Weaviate's text2vec-openai module would vectorize ("cached result natural query ..."),
+    # so new entries are comparable with the ones Weaviate vectorized and the semantic cache threshold
+    texts = [vectorized_text(cached_result_class, obj["properties"]) for obj in entries]
+    try:
+        vectors: list = list(await embedder.embed(texts))
+    except Exception as e:
+        # Weaviate vectorizes the objects, the semantic index picks them up on its next refresh
+        msg.warn(f"Cache entries could not be embedded: {str(e)}")
+        vectors = [None] * len(entries)
+    for obj, vector in zip(entries, vectors):
+        if vector is not None:
+            obj["vector"] = vector.tolist()
+
+    batch_results = await timed("cache_flush", aclient.batch_objects(entries))
+
+    # Make the new entries available to the semantic lookup right away
+    for vector, result in zip(vectors, batch_results):
+        errors = result.get("result", {}).get("errors")
+        if errors:
+            msg.warn(f"Cache entry could not be added: {errors}")
+        elif vector is not None and "id" in result:
+            semantic_index.add(result["id"], vector)
+
+    msg.good(f"Added {len(entries)} new cache entries")
+
+
+# CachedResult objects are written off the request path, in batches
+cache_writer = WriteBehindQueue(
+    flush_cache,
+    max_size=int(os.environ.get("CACHE_WRITE_QUEUE_SIZE", 1000)),
+    batch_size=int(os.environ.get("CACHE_WRITE_BATCH_SIZE", 50)),
+    flush_interval=float(os.environ.get("CACHE_WRITE_INTERVAL", 0.5)),
+)
+
+
+# Response for the Easter Egg query
+easter_egg = {
+    "query": "🚀 Congratulations, you rolled the demo!",
+    "results": {},
+    "generative_summary": "You just got rick-rolled...",
+}
 
 
 # Class for the Natural Language Query
 class NLQuery(BaseModel):
     text: str
+    # Product fields to return, all fields if not set
+    fields: Optional[List[str]] = None
+
 
+def response_key(query_text: str, fields: Optional[list]) -> str:
+    """Key of a response in the in-process cache and the single-flight group, projections are cached separately
+    @parameter query_text : str - Normalized natural language query
+    @parameter fields : list | None - Projected fields
+    @returns str - Key
+    """
+    if fields is None:
+        return query_text
+    return query_text + "\n" + ",".join(sorted(fields))
 
-# Define health check endpoint
+
+def record_local_hit(key: str) -> None:
+    """Count a hit of the in-process cache for the CachedResult entry that served the response
+    @parameter key : str - Response key
+    @returns None
+    """
+    entry_id = query_cache.tag(key)
+    if entry_id is not None:
+        cache_policy.record_hit(entry_id)
+
+
+def rate_limited(request: Request) -> Optional[OrjsonResponse]:
+    """Return an error response if the client sent more than rate_limit query requests in the current window.
+    The window is a shared state counter that expires after rate_limit_window seconds.
+    """
+    if not rate_limit:
+        return None
+    client_host = request.client.host if request.client else "unknown"
+    count = shared_state.incr(f"rate_limit:{client_host}", ttl=rate_limit_window)
+    if count <= rate_limit:
+        return None
+    return OrjsonResponse(
+        content={
+            "message": f"Rate limit of {rate_limit} requests per {rate_limit_window:g} seconds exceeded"
+        },
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={"Retry-After": str(int(rate_limit_window))},
+    )
+
+
+def unknown_fields(fields: Optional[list]) -> Optional[OrjsonResponse]:
+    """Return an error response if the projection contains unknown fields"""
+    unknown = [field for field in fields or [] if field not in projection_fields]
+    if not unknown:
+        return None
+    return OrjsonResponse(
+        content={
+            "message": f"Unknown fields {unknown}, available fields are {projection_fields}"
+        },
+        status_code=status.HTTP_400_BAD_REQUEST,
+    )
+
+
+# Define liveness endpoint, only reports in-process state and doesn't query Weaviate
 @app.get("/health")
 async def root():
-    global cache_count
+    return OrjsonResponse(
+        content={
+            "message": "Alive!",
+            "requests": int(shared_state.counter("requests")),
+            "cache_count": last_cache_count(),
+            "llm_calls_saved": int(shared_state.counter("llm_calls_saved")),
+            "llm": llm_summary(),
+            "cache_policy": cache_policy.stats(),
+            # The in-process structures of the worker that answered
+            "worker": {
+                "pid": os.getpid(),
+                "local_cache": query_cache.stats(),
+                "single_flight": single_flight.stats(),
+                "fast_path": intent_parser.stats(),
+                "embeddings": embedding_summary(),
+                "cache_writes": cache_writer.stats(),
+                "product_store": product_store.stats(),
+            },
+        }
+    )
+
 
+# Define readiness endpoint, checks the Weaviate connection with a cached count of the cached results
+@app.get("/ready")
+async def ready():
     try:
-        cached_queries = get_cache_count()
-        cache_count = len(cached_queries)
-        return JSONResponse(
+        return OrjsonResponse(
             content={
-                "message": "Alive!",
-                "requests": request_count,
-                "cache_count": cache_count,
-                "cache_queries": cached_queries,
+                "message": "Ready!",
+                "requests": int(shared_state.counter("requests")),
+                "cache_count": await get_cache_count(),
             }
         )
     except Exception as e:
-        msg.fail(f"Healthcheck failed with {str(e)}")
-        return JSONResponse(
+        msg.fail(f"Readiness check failed with {str(e)}")
+        return OrjsonResponse(
             content={
                 "message": "Database connection failed!",
-                "requests": request_count,
-                "cache_count": cache_count,
-                "cache_queries": [],
+                "requests": int(shared_state.counter("requests")),
+                "cache_count": last_cache_count(),
             },
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
         )
 
 
+# Define Prometheus endpoint, combines the metrics of all workers if PROMETHEUS_MULTIPROC_DIR is set
+@app.get("/metrics")
+async def metrics():
+    body, content_type = render()
+    return Response(content=body, media_type=content_type)
+
+
+# Define admin endpoint for paging through the cached queries
+@app.get("/admin/cached_queries")
+async def cached_queries(
+    limit: int = Query(100, ge=1, le=500),
+    after: Optional[str] = None,
+    x_admin_key: str = Header(""),
+):
+    """List the cached queries page by page
+    @parameter limit : int - Entries per page
+    @parameter after : str | None - Cursor returned with the previous page
+    @parameter x_admin_key : str - Must match ADMIN_API_KEY if it is set
+    @returns OrjsonResponse - Cached queries with their id and cache policy properties, and the cursor of the next page
+    """
+    if admin_api_key and x_admin_key != admin_api_key:
+        return OrjsonResponse(
+            content={"message": "Invalid admin key"},
+            status_code=status.HTTP_401_UNAUTHORIZED,
+        )
+
+    try:
+        results = await list_cache_entries(limit, after)
+    except ValueError:
+        return OrjsonResponse(
+            content={"message": f"Invalid cursor {after}"},
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+    if "errors" in results:
+        return OrjsonResponse(
+            content={"message": str(results["errors"])},
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+
+    entries = [
+        dict(entry, id=entry.pop("_additional")["id"])
+        for entry in results["data"]["Get"]["CachedResult"]
+    ]
+    return OrjsonResponse(
+        content={
+            "queries": entries,
+            "next": entries[-1]["id"] if len(entries) == limit else None,
+        }
+    )
+
+
 # Define endpoint for generating GraphQL query from natural language
 @app.post("/generate_query")
-async def generate_query(payload: NLQuery):
+async def generate_query(payload: NLQuery, request: Request):
     """Process the Payload sent by the Frontend, send API request to Open AI API, receive and format the results and send them back to the frontend
     @parameter payload : ProcessTweetsPayload - Payload sent by the frontend containing the prompt, tweets and context tags
-    @returns JSONResponse - JSON containing the results
+    @parameter request : Request - Request, its client address is rate limited
+    @returns OrjsonResponse - JSON containing the results
+    """
+    shared_state.incr("requests")
+    requests_total.labels("generate_query").inc()
+    limit_response = rate_limited(request)
+    if limit_response is not None:
+        return limit_response
+    query_text = normalize_query(payload.text)
+    fields = payload.fields
+    with track_request("generate_query"), start_trace("generate_query", query_text):
+        annotate(fields=fields)
+        error_response = unknown_fields(fields)
+        if error_response is not None:
+            return error_response
+        key = response_key(query_text, fields)
+
+        # Easter Egg
+        if query_text == "easteregg":
+            return OrjsonResponse(content=easter_egg)
+
+        # Local Cache Retrieval
+        cached_response = query_cache.get(key)
+        if cached_response is not None:
+            cache_lookups.labels("local_hit").inc()
+            annotate(cache="local")
+            record_local_hit(key)
+            return json_bytes_response(cached_response)
+
+        # Identical queries that arrive while one is processed wait for its result
+        execution, shared = start_query(key, query_text, fields)
+        content: dict = {"query": "", "results": {}, "generative_summary": ""}
+        async for partial_content in execution.subscribe():
+            content.update(partial_content)
+        if shared:
+            # The spans are recorded by the request that started the execution
+            annotate(shared=True)
+            shared_state.incr("llm_calls_saved", execution.stats["llm_calls"])
+
+        return OrjsonResponse(content=content)
+
+
+# Define streaming endpoint, sends the partial responses as newline delimited JSON
+@app.post("/generate_query_stream")
+async def generate_query_stream(payload: NLQuery, request: Request):
+    """Same as /generate_query, but streams the generated query, the products and the generative summary as soon as each is available
+    @parameter payload : NLQuery - Payload sent by the frontend containing the natural language query
+    @parameter request : Request - Request, its client address is rate limited
+    @returns StreamingResponse - Newline delimited JSON, every line is a partial response
     """
-    global request_count
-    request_count += 1
-    query_text = payload.text.strip().lower()
+    shared_state.incr("requests")
+    requests_total.labels("generate_query_stream").inc()
+    limit_response = rate_limited(request)
+    if limit_response is not None:
+        return limit_response
+    query_text = normalize_query(payload.text)
+    fields = payload.fields
+    error_response = unknown_fields(fields)
+    if error_response is not None:
+        return error_response
+    key = response_key(query_text, fields)
+
+    async def stream() -> AsyncIterator[bytes]:
+        with track_request("generate_query_stream"), start_trace(
+            "generate_query_stream", query_text
+        ):
+            annotate(fields=fields)
+            # Cached queries are sent as one complete response
+            if query_text == "easteregg":
+                yield serialize(easter_egg) + b"\n"
+                return
+            cached_response = query_cache.get(key)
+            if cached_response is not None:
+                cache_lookups.labels("local_hit").inc()
+                annotate(cache="local")
+                record_local_hit(key)
+                yield cached_response + b"\n"
+                return
+
+            # Identical queries share one execution, requests that join late get its partial responses replayed
+            execution, shared = start_query(key, query_text, fields)
+            async for partial_content in execution.subscribe():
+                yield serialize(partial_content) + b"\n"
+            if shared:
+                annotate(shared=True)
+                shared_state.incr("llm_calls_saved", execution.stats["llm_calls"])
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+# Define endpoint for the details of a single product, list responses can be projected to a few fields
+@app.get("/product/{product_id}")
+async def get_product(product_id: str):
+    """Return all fields of a product
+    @parameter product_id : str - UUID of the product
+    @returns OrjsonResponse - Product record, 404 if the product doesn't exist
+    """
+    requests_total.labels("product").inc()
+    if product_store.missing([product_id]):
+        product_store.put_many(
+            await timed("fetch_products", fetch_products([product_id]))
+        )
+    products = product_store.rehydrate([product_id], [0.0])
+    if not products:
+        return OrjsonResponse(
+            content={"message": f"Product {product_id} not found"},
+            status_code=status.HTTP_404_NOT_FOUND,
+        )
+    product = products[0]
+    del product["distance"]
+    return OrjsonResponse(content=product)
+
+
+def start_query(key: str, query_text: str, fields: Optional[list]) -> tuple:
+    """Start the query pipeline, or join the execution of an identical query of either query endpoint
+    @parameter key : str - Response key of the query and fields
+    @parameter query_text : str - Normalized natural language query
+    @parameter fields : list | None - Product fields to return, None for all
+    @returns (Broadcast, bool) - Execution of the pipeline, its stats count the OpenAI completion requests in "llm_calls", and whether it was shared
+    """
+    stats = {"llm_calls": 0}
+    return single_flight.broadcast(
+        key, lambda: query_pipeline(query_text, stats, fields), stats
+    )
+
 
+async def query_pipeline(
+    query_text: str, stats: dict, fields: Optional[list] = None
+) -> AsyncIterator[dict]:
+    """Run the cache lookups and, on a miss, the query generation, product search and generative summary.
+    Partial responses are yielded as soon as they are available, merging them gives the full response.
+    @parameter query_text : str - Normalized natural language query
+    @parameter stats : dict - Counts the OpenAI completion requests in "llm_calls"
+    @parameter fields : list | None - Product fields to return and to query, None for all
+    @returns AsyncIterator[dict] - Partial responses with "query", "results" and/or "generative_summary"
+    """
     start_prompt = f"Convert this natural language to a GraphQL Query and only return the query, it will be directly used: {query_text}"
 
-    # Easter Egg
-    if query_text == "easteregg":
-        return JSONResponse(
-            content={
-                "query": "🚀 Congratulations, you rolled the demo!",
-                "results": {},
-                "generative_summary": "You just got rick-rolled...",
-            }
+    # Cache Retrieval, the query embedding is only needed for the semantic lookup on a miss
+    cache_results = await timed("exact_cache", get_cache(query_text))
+    query_vector = None
+    if cache_results["data"]["Get"]["CachedResult"]:
+        results = await check_cache(cache_results, query_text, query_vector, 0.14)
+    else:
+        query_vector = await timed("embedding", embed_query(query_text))
+        results = await timed(
+            "semantic_cache",
+            check_cache(cache_results, query_text, query_vector, 0.14),
         )
 
-    # Cache Retrieval
-    results = check_cache(get_cache(query_text), query_text, 0.14)
-
+    products = None
     if len(results) > 0:
-        products = json.loads(results["data"]["Get"]["CachedResult"][0]["products"])
-
-        return JSONResponse(
-            content={
-                "query": results["data"]["Get"]["CachedResult"][0]["graphQuery"],
-                "results": products,
-                "generative_summary": results["data"]["Get"]["CachedResult"][0][
-                    "summary"
-                ],
-            }
+        cache_entry = results["data"]["Get"]["CachedResult"][0]
+        products = await timed("rehydrate", rehydrate_products(cache_entry))
+        if products is None:
+            # A legacy entry is a miss, it is deleted so the regenerated result takes its place
+            await remove_legacy_entry(cache_entry["_additional"]["id"])
+
+    if products is not None:
+        annotate(cache="exact" if query_vector is None else "semantic")
+        cached_content = {
+            "query": results["data"]["Get"]["CachedResult"][0]["graphQuery"],
+            "results": [project_record(product, fields) for product in products],
+            "generative_summary": results["data"]["Get"]["CachedResult"][0]["summary"],
+        }
+        # Local hits are counted for the entry that served the response
+        query_cache.put(
+            response_key(query_text, fields),
+            serialize(cached_content),
+            results["data"]["Get"]["CachedResult"][0]["_additional"]["id"],
         )
+        yield cached_content
+        return
 
     # Production
-    else:
-        prompt = start_prompt
-        error_message = ""
-        for i in range(0, 3):
-            try:
-                response = openai.ChatCompletion.create(
-                    model=model_name,
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": system_prompt,
-                        },
-                        {"role": "user", "content": prompt},
-                    ],
-                )
-            except Exception as e:
-                msg.fail("API Request Failed")
-                msg.info(str(e))
-                return JSONResponse(
-                    content={
+    # Reuse the pooled session instead of opening a new one per OpenAI request
+    openai.aiosession.set(openai_session)
+    prompt = start_prompt
+    error_message = ""
+    fast_query = intent_parser.parse(query_text)
+    # The fast path query takes an extra attempt, the LLM still gets three if Weaviate rejects it
+    for i in range(0, 4 if fast_query else 3):
+        with span(
+            "attempt", attempt=i, fast_path=bool(fast_query and i == 0)
+        ) as attempt:
+            if fast_query and i == 0:
+                candidates = [fast_query]
+            else:
+                stats["llm_calls"] += 1
+                llm_start = time.perf_counter()
+                try:
+                    with llm_in_flight.track_inprogress():
+                        response = await timed(
+                            "llm",
+                            openai.ChatCompletion.acreate(
+                                model=model_name,
+                                messages=[
+                                    {
+                                        "role": "system",
+                                        "content": system_prompt,
+                                    },
+                                    {"role": "user", "content": prompt},
+                                ],
+                            ),
+                        )
+                except Exception as e:
+                    llm_requests.labels("error").inc()
+                    msg.fail("API Request Failed")
+                    msg.info(str(e))
+                    yield {
                         "query": f"API request failed...",
                         "results": {},
                         "generative_summary": f"💥 Oh no... API request failed: {str(e)}",
                     }
+                    return
+                llm_requests.labels("ok").inc()
+                shared_state.incr("llm:calls")
+                shared_state.incr("llm:seconds", time.perf_counter() - llm_start)
+                usage = response.get("usage") or {}
+                shared_state.incr("llm:prompt_tokens", usage.get("prompt_tokens", 0))
+                shared_state.incr(
+                    "llm:completion_tokens", usage.get("completion_tokens", 0)
                 )
-
-            for choice in response["choices"]:
-                content = str(choice["message"]["content"])
-                results = client.query.raw(content)
-
-                if "errors" in results:
-                    error_message = str(results["errors"])
+                llm_tokens.labels("prompt").inc(usage.get("prompt_tokens", 0))
+                llm_tokens.labels("completion").inc(usage.get("completion_tokens", 0))
+                candidates = [
+                    str(choice["message"]["content"]) for choice in response["choices"]
+                ]
+
+            for candidate in candidates:
+                # Repair trivial mistakes locally and only ask the LLM again for real errors
+                with stage_timer("validation"):
+                    content, validation_errors = validate_graphql(candidate)
+                annotate(graphql=str(content), attempts=i + 1)
+                yield {"query": content}
+
+                if validation_errors:
+                    error_message = "; ".join(validation_errors)
                     prompt = f"The provided GraphQL is not valid, see this error: {error_message} please fix this GraphQL query for a Weaviate database: {content}"
-                    msg.warn(f"({i}) Query Error detected, retrying...")
+                    query_retries.labels("validation").inc()
+                    attempt["error"] = error_message
+                    msg.warn(f"({i}) Query validation failed, retrying...")
                     msg.info(prompt)
                     continue
 
-                results = handle_results(results)  # type: ignore[assignment]
+                # Weaviate gets the concept vectors, the returned and cached query keeps the nearText
+                concept_vectors = await timed(
+                    "concept_embedding",
+                    embed_concepts(near_text_concepts(str(content))),
+                )
 
+                # The generative query only depends on the generated query, so it runs alongside the product query
                 generative_query = modify_graphql(str(content), query_text, data_fields)
-                generative_results = client.query.raw(str(generative_query))
+                generative_task = asyncio.ensure_future(
+                    timed(
+                        "generative_query",
+                        aclient.raw(
+                            near_vector_graphql(generative_query, concept_vectors)
+                        ),
+                    )
+                )
+
+                # A projection only requests the listed properties, the review count replaces the reviews for the hard filter
+                product_query = (
+                    project_graphql(
+                        content, tuple(dict.fromkeys(fields + ["reviewCount"]))
+                    )
+                    if fields is not None
+                    else content
+                )
+
+                try:
+                    results = await timed(
+                        "product_query",
+                        aclient.raw(
+                            near_vector_graphql(str(product_query), concept_vectors)
+                        ),
+                    )
+
+                    if "errors" in results:
+                        generative_task.cancel()
+                        error_message = str(results["errors"])
+                        prompt = f"The provided GraphQL is not valid, see this error: {error_message} please fix this GraphQL query for a Weaviate database: {content}"
+                        query_retries.labels("weaviate").inc()
+                        attempt["error"] = error_message
+                        msg.warn(f"({i}) Query Error detected, retrying...")
+                        msg.info(prompt)
+                        continue
+
+                    results = handle_results(results, fields)  # type: ignore[assignment]
+                    if fields is None:
+                        product_store.put_many(results)
+
+                    full_query = "".join(
+                        [
+                            str(product_query) + "\n\n",
+                            "# Query with generative module \n\n",
+                            generative_query,
+                        ]
+                    )
+                    yield {"query": full_query, "results": results}
+
+                    generative_results = await generative_task
+                finally:
+                    # Don't leave the generative query running if the product query failed or the client went away
+                    generative_task.cancel()
 
                 if "errors" in generative_results:
                     generative_summary = str(generative_results["errors"])
                     msg.warn("Generative Query Failed!")
-                    return JSONResponse(
-                        content={
-                            "query": "".join(
-                                [
-                                    str(content) + "\n\n",
-                                    "# Query with generative module \n\n",
-                                    generative_query,
-                                ]
-                            ),
-                            "results": results,
-                            "generative_summary": generative_summary,
-                        }
-                    )
+                    yield {"generative_summary": generative_summary}
+                    return
 
                 else:
                     generative_summary = str(
@@ -610,37 +1347,32 @@ async def generate_query(payload: NLQuery):
                         ]["groupedResult"]
                     )
 
-                add_cache(
-                    query_text,
-                    "".join(
-                        [
-                            str(content) + "\n\n",
-                            "# Query with generative module \n\n",
-                            generative_query,
-                        ]
-                    ),
-                    results,
-                    generative_summary,
-                )
+                yield {"generative_summary": "✨ GENERATED: " + generative_summary}
 
-                return JSONResponse(
-                    content={
-                        "query": "".join(
-                            [
-                                str(content) + "\n\n",
-                                "# Query with generative module \n\n",
-                                generative_query,
-                            ]
-                        ),
-                        "results": results,
-                        "generative_summary": "✨ GENERATED: " + generative_summary,
-                    }
+                with stage_timer("add_cache"):
+                    add_cache(
+                        query_text,
+                        full_query,
+                        results,
+                        generative_summary,
+                    )
+
+                query_cache.put(
+                    response_key(query_text, fields),
+                    serialize(
+                        {
+                            "query": full_query,
+                            "results": results,
+                            "generative_summary": "🛰️ RETRIEVED FROM CACHE: "
+                            + generative_summary,
+                        }
+                    ),
+                    cache_entry_id(query_text),
                 )
+                return
 
-        return JSONResponse(
-            content={
-                "query": f"Not able to construct query...",
-                "results": {},
-                "generative_summary": f"💥 Oh no... We couldn't create a GraphQL query from your input!",
-            }
-        )
+    yield {
+        "query": f"Not able to construct query...",
+        "results": {},
+        "generative_summary": f"💥 Oh no... We couldn't create a GraphQL query from your input!",
+    }
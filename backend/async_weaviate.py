@@ -0,0 +1,128 @@
+import aiohttp
+
+from typing import Optional
+
+
+class AsyncWeaviateClient:
+    """Async HTTP client for the Weaviate GraphQL and batch endpoints used on the request path.
+    Queries are still built with the synchronous weaviate.Client query builder (`.build()`),
+    only the network round trips go through this client so they don't block the event loop.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        api_key: str = "",
+        additional_headers: Optional[dict] = None,
+        max_connections: int = 100,
+        timeout: float = 60.0,
+    ) -> None:
+        """Configure the connection to Weaviate, the session itself is opened lazily inside the event loop
+        @parameter url : str - URL of the Weaviate instance
+        @parameter api_key : str - Weaviate API key, empty for anonymous access
+        @parameter additional_headers : dict - Extra headers sent with every request (e.g. X-OpenAI-Api-Key)
+        @parameter max_connections : int - Size of the connection pool
+        @parameter timeout : float - Request timeout in seconds
+        """
+        self.url = url.rstrip("/")
+        self.headers = dict(additional_headers or {})
+        if api_key:
+            self.headers["Authorization"] = f"Bearer {api_key}"
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Pooled session shared by all requests"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+            )
+        return self._session
+
+    async def raw(self, gql_query: str) -> dict:
+        """Send a raw GraphQL query to Weaviate
+        @parameter gql_query : str - GraphQL query
+        @returns dict - Weaviate response, contains an "errors" key if the query failed
+        """
+        async with self.session.post(
+            f"{self.url}/v1/graphql", json={"query": gql_query}
+        ) as response:
+            return await response.json()
+
+    async def get_class(self, class_name: str) -> dict:
+        """Fetch the schema of a class
+        @parameter class_name : str - Name of the class
+        @returns dict - Class definition
+        """
+        async with self.session.get(f"{self.url}/v1/schema/{class_name}") as response:
+            response.raise_for_status()
+            return await response.json()
+
+    async def add_property(self, class_name: str, prop: dict) -> None:
+        """Add a property to an existing class
+        @parameter class_name : str - Name of the class
+        @parameter prop : dict - Property definition
+        @returns None
+        """
+        async with self.session.post(
+            f"{self.url}/v1/schema/{class_name}/properties", json=prop
+        ) as response:
+            response.raise_for_status()
+
+    async def batch_objects(self, objects: list) -> list:
+        """Import data objects with a single batch request
+        @parameter objects : list - Objects in the Weaviate REST format ({"class": ..., "properties": ...})
+        @returns list - Per object results returned by Weaviate
+        """
+        async with self.session.post(
+            f"{self.url}/v1/batch/objects", json={"objects": objects}
+        ) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    async def patch_object(
+        self,
+        class_name: str,
+        uuid: str,
+        properties: dict,
+        vector: Optional[list] = None,
+    ) -> None:
+        """Update some properties of an object
+        @parameter class_name : str - Name of the class
+        @parameter uuid : str - UUID of the object
+        @parameter properties : dict - Properties to overwrite
+        @parameter vector : list | None - Current vector of the object, Weaviate vectorizes the object again without it
+        @returns None
+        """
+        body: dict = {"class": class_name, "properties": properties}
+        if vector is not None:
+            body["vector"] = vector
+        async with self.session.patch(
+            f"{self.url}/v1/objects/{class_name}/{uuid}", json=body
+        ) as response:
+            response.raise_for_status()
+
+    async def delete_objects(self, class_name: str, where: dict) -> dict:
+        """Delete all objects of a class matching a filter with a single batch request
+        @parameter class_name : str - Name of the class
+        @parameter where : dict - Where filter in the REST format ({"path": ..., "operator": ..., ...})
+        @returns dict - Match and deletion counts returned by Weaviate
+        """
+        async with self.session.delete(
+            f"{self.url}/v1/batch/objects",
+            json={
+                "match": {"class": class_name, "where": where},
+                "output": "minimal",
+            },
+        ) as response:
+            response.raise_for_status()
+            return (await response.json())["results"]
+
+    async def close(self) -> None:
+        """Close all pooled connections"""
+        if self._session is not None:
+            await self._session.close()
@@ -0,0 +1,115 @@
+import json
+import random
+import sys
+import time
+import typer
+import numpy as np
+
+from pathlib import Path
+from wasabi import msg  # type: ignore[import]
+
+from stubs import load_products
+
+# The backend modules live one directory up
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from product_store import ProductStore
+
+
+def percentiles(timings: list) -> tuple:
+    """p50 and p99 in milliseconds"""
+    p50, p99 = np.percentile(np.array(timings) * 1000, [50, 99])
+    return round(p50, 3), round(p99, 3)
+
+
+def cache_response(cache_entry: dict) -> str:
+    """Body of the GraphQL response returning a cached result"""
+    return json.dumps({"data": {"Get": {"CachedResult": [cache_entry]}}})
+
+
+def main(entries: int = 1000, products_per_entry: int = 25, hits: int = 2000) -> None:
+    """Compare the size and the hit latency of cached results stored as JSON blobs and as product references.
+    The hit latency covers decoding the Weaviate response and building the product list, the Weaviate round trip is the same for both.
+    """
+    random.seed(0)
+    records = []
+    for product in load_products(limit=100):
+        additional = product.pop("_additional")
+        records.append(dict(product, id=additional["id"]))
+    store = ProductStore()
+    store.put_many(records)
+
+    blob_responses = []
+    reference_responses = []
+    for i in range(entries):
+        results = [
+            dict(record, distance=round(random.random(), 2))
+            for record in random.sample(records, products_per_entry)
+        ]
+        entry = {
+            "naturalQuery": f"query {i}",
+            "graphQuery": '{Get{Product(nearText:{concepts:["query"]}){name}}}',
+            "summary": "Summary " * 40,
+        }
+        blob_responses.append(cache_response(dict(entry, products=json.dumps(results))))
+        reference_responses.append(
+            cache_response(
+                dict(
+                    entry,
+                    productIds=[result["id"] for result in results],
+                    productDistances=[result["distance"] for result in results],
+                )
+            )
+        )
+
+    def blob_hit(response: str) -> list:
+        entry = json.loads(response)["data"]["Get"]["CachedResult"][0]
+        return json.loads(entry["products"])
+
+    def reference_hit(response: str) -> list:
+        entry = json.loads(response)["data"]["Get"]["CachedResult"][0]
+        store.missing(entry["productIds"])
+        return store.rehydrate(entry["productIds"], entry["productDistances"])
+
+    catalog_bytes = len(json.dumps(records))
+    rows = []
+    for name, responses, hit in [
+        ("JSON blob", blob_responses, blob_hit),
+        ("product references", reference_responses, reference_hit),
+    ]:
+        timings = []
+        for i in range(hits):
+            response = responses[i % entries]
+            start = time.perf_counter()
+            hit(response)
+            timings.append(time.perf_counter() - start)
+        total = sum(len(response) for response in responses)
+        rows.append(
+            (
+                name,
+                round(total / entries / 1024, 1),
+                round(total / 1024 / 1024, 1),
+                round(total / catalog_bytes, 1),
+                *percentiles(timings),
+            )
+        )
+
+    msg.info(
+        f"{entries} cached queries with {products_per_entry} products each, catalog {catalog_bytes / 1024:.0f} KB"
+    )
+    msg.table(
+        rows,
+        header=(
+            "Format",
+            "KB/entry",
+            "Cache MB",
+            "x catalog",
+            "Hit p50 (ms)",
+            "Hit p99 (ms)",
+        ),
+        divider=True,
+    )
+
+
+if __name__ == "__main__":
+    typer.run(main)
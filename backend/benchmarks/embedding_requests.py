@@ -0,0 +1,111 @@
+import asyncio
+import sys
+import tempfile
+import time
+import typer
+import numpy as np
+
+from pathlib import Path
+from typing import Union
+from wasabi import msg  # type: ignore[import]
+
+# The backend modules live one directory up
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from embeddings import BatchingEmbedder, CachedEmbedder, EmbeddingCache, HashEmbedder
+
+
+class CountingEmbedder(HashEmbedder):
+    """HashEmbedder that counts its requests and texts like the OpenAI usage would"""
+
+    def __init__(self, latency: float) -> None:
+        super().__init__(latency=latency)
+        self.requests = 0
+        self.texts = 0
+
+    async def embed(self, texts: list) -> np.ndarray:
+        self.requests += 1
+        self.texts += len(texts)
+        return await super().embed(texts)
+
+
+def p50_ms(timings: list) -> float:
+    """p50 in milliseconds"""
+    return round(float(np.percentile(np.array(timings) * 1000, 50)), 1)
+
+
+async def run_requests(
+    embedder, workload: list, concurrency: int, near_text: bool = False
+) -> list:
+    """Embed the query and the concepts of every request, like a cache miss of /generate_query
+    @parameter embedder : object - Embedder with an async embed(texts)
+    @parameter workload : list - (query, concepts) per request
+    @parameter concurrency : int - Requests in flight
+    @parameter near_text : bool - Embed every concept twice with its own request, like Weaviate does for the nearText of the product and the generative query
+    @returns list - Seconds spent embedding per request
+    """
+    requests = iter(workload)
+    timings = []
+
+    async def worker() -> None:
+        for query, concepts in requests:
+            start = time.perf_counter()
+            await embedder.embed([query])
+            if near_text:
+                await asyncio.gather(
+                    *[embedder.embed([c]) for c in concepts for _ in range(2)]
+                )
+            else:
+                await embedder.embed(concepts)
+            timings.append(time.perf_counter() - start)
+
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return timings
+
+
+def main(
+    queries: int = 200,
+    repeats: int = 3,
+    concurrency: int = 16,
+    embed_latency: float = 0.05,
+) -> None:
+    """Count the embedding requests of cache misses with nearText (Weaviate embeds the concepts of the product and
+    the generative query) and with nearVector through the batching embedder, without and with the on-disk cache.
+    Every query is requested --repeats times, half of the queries are their own concept like the fast path generates them.
+    """
+    rng = np.random.default_rng(0)
+    workload = []
+    for i in range(queries):
+        query = f"products for concept {i}"
+        concepts = [query] if i % 2 else [f"concept {i}", f"concept {i + 1}"]
+        workload.extend([(query, concepts)] * repeats)
+    workload = [workload[i] for i in rng.permutation(len(workload))]
+
+    rows = []
+    for name in ["nearText", "nearVector", "nearVector + cache"]:
+        embedder = CountingEmbedder(embed_latency)
+        with tempfile.TemporaryDirectory() as directory:
+            cache = EmbeddingCache(Path(directory) / "embeddings.sqlite")
+            variant: Union[CountingEmbedder, BatchingEmbedder, CachedEmbedder]
+            if name == "nearText":
+                variant = embedder
+            elif name == "nearVector":
+                variant = BatchingEmbedder(embedder)
+            else:
+                variant = CachedEmbedder(BatchingEmbedder(embedder), cache)
+            timings = asyncio.run(
+                run_requests(variant, workload, concurrency, name == "nearText")
+            )
+            cache.close()
+        rows.append((name, embedder.requests, embedder.texts, p50_ms(timings)))
+
+    msg.info(f"{len(workload)} requests for {queries} queries, {concurrency} in flight")
+    msg.table(
+        rows,
+        header=("Variant", "Requests", "Texts", "p50 per request (ms)"),
+        divider=True,
+    )
+
+
+if __name__ == "__main__":
+    typer.run(main)
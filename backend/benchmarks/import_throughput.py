@@ -0,0 +1,115 @@
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+import typer
+import weaviate  # type: ignore[import]
+
+from pathlib import Path
+from wasabi import msg  # type: ignore[import]
+
+from stubs import create_weaviate_stub, serve_process
+
+# The backend modules live one directory up
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from import_data_to_weaviate import import_products, product_object, read_products
+
+DATASET_PATH = (
+    Path(__file__).parent.parent / "data" / "dataset_100_supplements_with_vectors.json"
+)
+
+
+def write_dataset(path: Path, products: int) -> None:
+    """Write a dataset of the given size by repeating the products of the sample dataset"""
+    with open(DATASET_PATH, "r") as reader:
+        sample = list(json.load(reader).values())
+    with open(path, "w") as writer:
+        writer.write("{")
+        for i in range(products):
+            if i:
+                writer.write(",")
+            writer.write(f'"{i}": {json.dumps(sample[i % len(sample)])}')
+        writer.write("}")
+
+
+def peak_memory(parse) -> float:
+    """Peak memory in MB allocated while running parse"""
+    tracemalloc.start()
+    parse()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024 / 1024
+
+
+def main(
+    products: int = 5000,
+    workers: str = "1,2,4,8",
+    batch_size: int = 100,
+    latency: float = 0.02,
+    object_latency: float = 0.002,
+    fail_rate: float = 0.01,
+    port: int = 8095,
+) -> None:
+    """Import a generated dataset into a local Weaviate stand-in with an increasing number of batch workers.
+    The first row imports with a single worker and a fixed batch size like the previous importer.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "products.json"
+        write_dataset(path, products)
+        msg.info(f"{products} products, {path.stat().st_size / 1024 / 1024:.0f} MB")
+
+        full = peak_memory(lambda: json.loads(path.read_text()))
+        streamed = peak_memory(lambda: sum(1 for _ in read_products(path)))
+        msg.info(
+            f"Peak memory json.load {full:.0f} MB, read_products {streamed:.0f} MB"
+        )
+
+        stub = serve_process(
+            create_weaviate_stub,
+            {
+                "latency": latency,
+                "products": [],
+                "object_latency": object_latency,
+                "fail_rate": fail_rate,
+            },
+            port,
+        )
+        client = weaviate.Client(url=f"http://127.0.0.1:{port}")
+
+        levels = [(1, False)] + [(int(w), True) for w in workers.split(",")]
+        rows = []
+        for num_workers, dynamic in levels:
+            start = time.perf_counter()
+            stats = import_products(
+                client,
+                (
+                    product_object(product_id, product)
+                    for product_id, product in read_products(path)
+                ),
+                batch_size=batch_size,
+                num_workers=num_workers,
+                dynamic=dynamic,
+            )
+            rows.append(
+                (
+                    num_workers,
+                    "dynamic" if dynamic else "fixed",
+                    stats["imported"],
+                    stats["failed"],
+                    round(time.perf_counter() - start, 2),
+                    stats["objects_per_second"],
+                )
+            )
+        stub.terminate()
+
+    msg.table(
+        rows,
+        header=("Workers", "Batching", "Imported", "Failed", "Seconds", "Objects/s"),
+        divider=True,
+    )
+
+
+if __name__ == "__main__":
+    typer.run(main)
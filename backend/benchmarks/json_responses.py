@@ -0,0 +1,96 @@
+import json
+import sys
+import time
+import typer
+import numpy as np
+
+from pathlib import Path
+from typing import Optional
+from fastapi.responses import JSONResponse
+from wasabi import msg  # type: ignore[import]
+
+from stubs import load_products
+
+# The backend modules live one directory up
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from responses import OrjsonResponse, json_bytes_response
+
+# Fields the frontend requests for the result list
+LIST_FIELDS = ["name", "brand", "rating", "image", "summary", "reviewCount"]
+
+
+def measure(render, iterations: int) -> float:
+    """p50 of render() in microseconds"""
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        render()
+        timings.append(time.perf_counter() - start)
+    return round(float(np.percentile(np.array(timings) * 1e6, 50)), 1)
+
+
+def build_response(products: list, fields: Optional[list] = None) -> dict:
+    """/generate_query response with the products of the dataset, projected to fields if given"""
+    results = []
+    for product in products:
+        additional = product["_additional"]
+        record = {key: value for key, value in product.items() if key != "_additional"}
+        record.update(
+            id=additional["id"],
+            reviewCount=len(product["reviews"]),
+            distance=round(additional["distance"], 2),
+        )
+        if fields is not None:
+            record = {
+                key: value
+                for key, value in record.items()
+                if key in fields or key in ("id", "distance")
+            }
+        results.append(record)
+    return {
+        "query": '{Get{Product(nearText:{concepts:["joint pain"]}){name}}}',
+        "results": results,
+        "generative_summary": "🛰️ RETRIEVED FROM CACHE: " + "Summary " * 60,
+    }
+
+
+def main(products: int = 25, iterations: int = 2000) -> None:
+    """Compare the serialization of /generate_query responses built from the dataset (with all reviews):
+    the default JSONResponse, OrjsonResponse and the pre-serialized bytes the in-process cache returns on a hit.
+    The previous cache hit path also decoded the stored products string before encoding the response.
+    """
+    dataset_products = load_products(limit=products)
+    rows = []
+    for name, fields in [("full", None), ("projected", LIST_FIELDS)]:
+        content = build_response(dataset_products, fields)
+        products_blob = json.dumps(content["results"])
+        cached_body = bytes(OrjsonResponse(content).body)
+
+        def previous_hit() -> bytes:
+            hit = dict(content, results=json.loads(products_blob))
+            return bytes(JSONResponse(hit).body)
+
+        for variant, render in [
+            ("json.loads + JSONResponse", previous_hit),
+            ("JSONResponse", lambda: JSONResponse(content).body),
+            ("OrjsonResponse", lambda: OrjsonResponse(content).body),
+            ("pre-serialized", lambda: json_bytes_response(cached_body).body),
+        ]:
+            rows.append(
+                (
+                    name,
+                    variant,
+                    round(len(render()) / 1024, 1),
+                    measure(render, iterations),
+                )
+            )
+
+    msg.info(f"{products} products per response")
+    msg.table(
+        rows, header=("Response", "Serialization", "KB", "p50 (µs)"), divider=True
+    )
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import os
+import sys
+import time
+import urllib.request
+import aiohttp
+import typer
+
+from pathlib import Path
+from wasabi import msg  # type: ignore[import]
+
+from stubs import (
+    create_openai_stub,
+    create_weaviate_stub,
+    load_products,
+    serve,
+    serve_process,
+)
+
+# The backend modules live one directory up
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+async def run_level(url: str, concurrency: int, total: int, distinct: int) -> float:
+    """Send requests to /generate_query with a fixed number of requests in flight
+    @parameter url : str - Base URL of the API
+    @parameter concurrency : int - Number of requests in flight
+    @parameter total : int - Number of requests to send
+    @parameter distinct : int - Number of distinct query texts, 0 for a unique text per request
+    @returns float - Throughput in requests per second
+    """
+    counter = iter(range(total))
+
+    async def worker(http: aiohttp.ClientSession) -> None:
+        for i in counter:
+            async with http.post(
+                f"{url}/generate_query",
+                json={
+                    "text": f"load test query {concurrency}-{i % distinct if distinct else i}"
+                },
+            ) as response:
+                response.raise_for_status()
+                await response.read()
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as http:
+        start = time.perf_counter()
+        await asyncio.gather(*[worker(http) for _ in range(concurrency)])
+        return total / (time.perf_counter() - start)
+
+
+def main(
+    concurrency: str = "1,2,4,8,16,32",
+    requests_per_level: int = 64,
+    llm_latency: float = 0.5,
+    weaviate_latency: float = 0.05,
+    distinct: int = 0,
+) -> None:
+    """Load test /generate_query on a single uvicorn worker against local stand-ins for OpenAI and Weaviate"""
+    msg.divider("Starting load test")
+
+    openai_stub = serve_process(create_openai_stub, {"latency": llm_latency}, 8091)
+    weaviate_stub = serve_process(
+        create_weaviate_stub,
+        {"latency": weaviate_latency, "products": load_products()},
+        8092,
+    )
+
+    os.environ["OPENAI_API_KEY"] = "stub"
+    os.environ["OPENAI_API_BASE"] = "http://127.0.0.1:8091/v1"
+    os.environ["HEALTHSEARCH_SERVER"] = "http://127.0.0.1:8092"
+    os.environ["HEALTHSEARCH_API_KEY"] = ""
+
+    from api import app  # Imported after the environment points to the stubs
+
+    api_server = serve(app, 8093)
+
+    for level in [int(c) for c in concurrency.split(",")]:
+        throughput = asyncio.run(
+            run_level("http://127.0.0.1:8093", level, requests_per_level, distinct)
+        )
+        msg.info(f"concurrency {level:>3}: {throughput:8.2f} req/s")
+
+    health = json.load(urllib.request.urlopen("http://127.0.0.1:8093/health"))
+    msg.info(
+        f"single flight: {health['worker']['single_flight']}, LLM calls saved: {health['llm_calls_saved']}"
+    )
+
+    api_server.should_exit = True
+    openai_stub.terminate()
+    weaviate_stub.terminate()
+
+    msg.good("Load test finished")
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -0,0 +1,91 @@
+import json
+import re
+import sys
+import timeit
+import typer
+
+from pathlib import Path
+from wasabi import msg  # type: ignore[import]
+
+# The backend modules live one directory up
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from graphql_transform import transform_graphql
+
+CORPUS_PATH = Path(__file__).parent / "data" / "generated_queries.json"
+
+data_fields = [
+    "name",
+    "brand",
+    "ingredients",
+    "reviews",
+    "image",
+    "rating",
+    "description",
+    "summary",
+    "effects",
+]
+
+
+def regex_modify_graphql(graphQuery: str, natural_query: str, fields: list) -> str:
+    """Previous regex based implementation, kept for comparison"""
+    fields_to_keep = ["summary", "description", "ingredients"]
+    fields_to_remove = [field for field in fields if field not in fields_to_keep]
+    for pattern in [r"where:\s*\{([^\}]*)\}", r"sort:\s*\[\{([^\}]*)\}\]"]:
+        match = re.search(pattern, graphQuery, flags=re.DOTALL)
+        if match:
+            for path in re.findall(r"path:\s*\[([^\]]*)\]", match.group(1)):
+                path = path.replace('"', "").strip()
+                if path in fields_to_remove:
+                    fields_to_remove.remove(path)
+    for field in fields_to_remove:
+        graphQuery = re.sub(rf"\s*{field}", "", graphQuery)
+    limit_pattern = r"(limit:\s*\d+)"
+    limit_match = re.search(limit_pattern, graphQuery)
+    if limit_match:
+        if int(limit_match.group().split(":")[1].strip()) > 5:
+            graphQuery = re.sub(limit_pattern, "limit: 5", graphQuery)
+    else:
+        graphQuery = re.sub(r"Product\(", "Product(\n      limit: 5", graphQuery)
+    replacement = f"""
+      _additional {{
+        generate(
+          groupedResult: {{
+            task: "Summarize products based on this query: {natural_query}"
+          }}
+        ) {{
+          groupedResult
+          error
+        }}
+        id
+        distance
+      }}"""
+    return re.sub(
+        r"(_additional\s*\{[^\}]*\})", replacement, graphQuery, flags=re.DOTALL
+    )
+
+
+def main(iterations: int = 2000) -> None:
+    """Compare the speed of modify_graphql with the regex implementation on the corpus of generated queries.
+    The invariants of modify_graphql are checked by tests/test_modify_graphql.py.
+    """
+    corpus = json.loads(CORPUS_PATH.read_text())
+    entries = [(e["query"], e["natural_query"]) for e in corpus]
+
+    def run(fn) -> float:
+        seconds = timeit.timeit(
+            lambda: [fn(q, n, data_fields) for q, n in entries], number=iterations
+        )
+        return seconds / (iterations * len(entries)) * 1e6
+
+    msg.info(f"regex {run(regex_modify_graphql):8.2f} µs/query")
+
+    # The rewrite itself, without the per-input cache of modify_graphql
+    def ast_modify_graphql(graphQuery: str, natural_query: str, fields: list) -> str:
+        return transform_graphql.__wrapped__(graphQuery, natural_query, tuple(fields))
+
+    msg.info(f"ast   {run(ast_modify_graphql):8.2f} µs/query")
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -0,0 +1,285 @@
+import asyncio
+import json
+import sys
+import typer
+import openai
+
+from pathlib import Path
+from typing import Optional
+from wasabi import msg  # type: ignore[import]
+
+from stubs import count_tokens, create_openai_stub, encoding, serve
+
+# The backend modules live one directory up
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from graphql_validator import validate_graphql
+from prompt import build_system_prompt
+
+CORPUS_PATH = Path(__file__).parent / "data" / "generated_queries.json"
+RECORDING_PATH = Path(__file__).parent / "data" / "prompt_responses.json"
+
+data_fields = [
+    "name",
+    "brand",
+    "ingredients",
+    "reviews",
+    "image",
+    "rating",
+    "description",
+    "summary",
+    "effects",
+]
+
+start_prompt = "Convert this natural language to a GraphQL Query and only return the query, it will be directly used: "
+
+# Previous hand written prompt, kept for comparison
+legacy_system_prompt = """
+
+You are a parser that understands the meaning of natural language queries and parses them into valid graphql queries based on this schema:
+
+    class_obj = {
+        "class": "Product",
+        "description": "Supplementary products from iHerb",
+        "properties": [
+            {
+                "dataType": ["text"],
+                "description": "The name of the product",
+                "name": "name",
+            },
+            {
+                "dataType": ["text"],
+                "description": "The brand of the product",
+                "name": "brand",
+            },
+            {
+                "dataType": ["text"],
+                "description": "The ingredients contained in the product.",
+                "name": "ingredients",
+            },
+            {
+                "dataType": ["text[]"],
+                "description": "Reviews about the product",
+                "name": "reviews",
+            },
+            {
+                "dataType": ["text"],
+                "description": "Image URL of the product",
+                "name": "image",
+            },
+            {
+                "dataType": ["number"],
+                "description": "The Rating of the product",
+                "name": "rating",
+            },
+            {
+                "dataType": ["text"],
+                "description": "The description of the product",
+                "name": "description",
+            },
+            {
+                "dataType": ["text"],
+                "description": "The summary of the reviews",
+                "name": "summary",
+            },
+            {
+                "dataType": ["text"],
+                "description": "The health effects of the product",
+                "name": "effects",
+            },
+        ],
+    }
+
+    The query will be used to retrieve supplement products from a Weaviate database, make sure that all fields are returned with the _additional distance attribute.
+    Your answers are only allowed to contain the query, the results will be used directly.
+
+    Example natural language query: 'Which product is helpful for joint pain?' produce this GraphQL query:
+
+    {
+      Get {
+        Product(
+          nearText: {concepts: ["Helpful", "joint pain"]}
+        ) {
+          name
+          brand
+          ingredients
+          reviews
+          image
+          rating
+          description
+          summary
+          effects
+          _additional {
+            id
+            distance
+          }
+        }
+      }
+    }
+
+    Example natural language query: 'Products from brand "Life Extension" for glowing skin' produce this GraphQL query:
+
+    {
+  Get {
+    Product(
+      nearText: {concepts: ["glowing skin"]}
+      where: {
+        path: ["brand"],
+        operator: Equal,
+        valueString: "Life Extension"
+      }
+    ) {
+          name
+          brand
+          ingredients
+          reviews
+          image
+          rating
+          description
+          summary
+          effects
+      _additional {
+      id
+        distance
+      }
+    }
+  }
+}
+
+  Example natural language query: 'Lowest rated products for energy' produce this GraphQL query:
+
+  {
+  Get {
+    Product(
+      nearText: {concepts: ["energy"]}
+      sort: [{
+      path: ["rating"]     
+      order: asc          
+    }]
+    ) {
+      name
+          brand
+          ingredients
+          reviews
+          image
+          rating
+          description
+          summary
+          effects
+      _additional {
+      id
+        distance
+      }
+    }
+  }
+}
+
+"""
+
+prompt_variants = {
+    "legacy": legacy_system_prompt,
+    "compact": build_system_prompt(fields=data_fields),
+    "compact_no_examples": build_system_prompt(fields=data_fields, examples=[]),
+}
+
+
+async def complete(system_prompt: str, natural_query: str, **kwargs) -> dict:
+    """Send one query generation request the way the API does"""
+    return await openai.ChatCompletion.acreate(
+        model="gpt-4",
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": start_prompt + natural_query},
+        ],
+        **kwargs,
+    )
+
+
+async def record(corpus: list) -> None:
+    """Record the completions of the real model for every prompt variant"""
+    recordings: dict = {}
+    for variant, system_prompt in prompt_variants.items():
+        recordings[variant] = {}
+        for entry in corpus:
+            response = await complete(system_prompt, entry["natural_query"])
+            recordings[variant][entry["natural_query"]] = response["choices"][0][
+                "message"
+            ]["content"]
+        msg.good(f"Recorded {variant}")
+    RECORDING_PATH.write_text(json.dumps(recordings, indent=2))
+
+
+async def replay(system_prompt: str, corpus: list, port: int) -> dict:
+    """Replay the corpus through a stub model and count tokens and valid queries"""
+    stats = {"prompt_tokens": 0, "completion_tokens": 0, "valid": 0}
+    for entry in corpus:
+        response = await complete(
+            system_prompt,
+            entry["natural_query"],
+            api_key="stub",
+            api_base=f"http://127.0.0.1:{port}/v1",
+        )
+        stats["prompt_tokens"] += response["usage"]["prompt_tokens"]
+        stats["completion_tokens"] += response["usage"]["completion_tokens"]
+        _, errors = validate_graphql(response["choices"][0]["message"]["content"])
+        stats["valid"] += not errors
+    return stats
+
+
+def main(record_responses: bool = False, port: int = 8094) -> None:
+    """Compare the prompt variants on tokens per call and on the validity of the generated queries.
+    Completions recorded with --record-responses (needs OPENAI_API_KEY) are replayed per variant,
+    without a recording every variant replays the corpus, so only the token counts are compared.
+    """
+    corpus = json.loads(CORPUS_PATH.read_text())
+    if record_responses:
+        asyncio.run(record(corpus))
+
+    recordings: Optional[dict] = None
+    if RECORDING_PATH.exists():
+        recordings = json.loads(RECORDING_PATH.read_text())
+    corpus_responses = {entry["natural_query"]: entry["query"] for entry in corpus}
+
+    msg.info(
+        f"{len(corpus)} queries, tokens counted with "
+        + ("tiktoken" if encoding is not None else "4 characters per token")
+    )
+    rows: list = []
+    for i, (variant, system_prompt) in enumerate(prompt_variants.items()):
+        responses = (recordings or {}).get(variant)
+        server = serve(
+            create_openai_stub(0.0, responses=responses or corpus_responses), port + i
+        )
+        stats = asyncio.run(replay(system_prompt, corpus, port + i))
+        server.should_exit = True
+        # Every variant replays the same corpus completions, so their validity says nothing
+        rows.append(
+            (
+                variant,
+                count_tokens(system_prompt),
+                round(stats["prompt_tokens"] / len(corpus), 1),
+                round(stats["completion_tokens"] / len(corpus), 1),
+                f"{stats['valid']}/{len(corpus)}" if responses else "-",
+                "recorded" if responses else "corpus",
+            )
+        )
+
+    header = [
+        "Variant",
+        "System tokens",
+        "Prompt/call",
+        "Completion/call",
+        "Valid",
+        "Completions",
+    ]
+    if not recordings:
+        msg.warn(
+            "No recorded completions, run with --record-responses to compare validity"
+        )
+        header.remove("Valid")
+        rows = [row[:4] + row[5:] for row in rows]
+    msg.table(rows, header=header, divider=True)
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -0,0 +1,259 @@
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+import urllib.request
+import aiohttp
+import typer
+
+from pathlib import Path
+from typing import Optional
+from fastapi import FastAPI, Request, Response
+from wasabi import msg  # type: ignore[import]
+
+from stubs import serve, serve_process
+
+# The backend modules live one directory up
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+FIXTURES_PATH = Path(__file__).parent / "data" / "recordings"
+
+# Headers that describe the connection or the body encoding of the original request, aiohttp sets its own
+hop_headers = {
+    "host",
+    "content-length",
+    "connection",
+    "accept-encoding",
+    "transfer-encoding",
+}
+
+
+def recording_key(method: str, path: str, body: bytes) -> Optional[str]:
+    """Key a request is recorded and replayed under, None for requests that aren't recorded (writes).
+    Completions are keyed by their last message, which contains the natural language query or the retry prompt.
+    @parameter method : str - HTTP method
+    @parameter path : str - URL path
+    @parameter body : bytes - Request body
+    @returns str | None - Key
+    """
+    if method == "GET":
+        return f"GET {path}"
+    if method != "POST":
+        return None
+    if path.endswith("/chat/completions"):
+        return f"POST {path} {json.loads(body)['messages'][-1]['content']}"
+    if path.endswith("/embeddings"):
+        return f"POST {path} {json.dumps(json.loads(body)['input'])}"
+    if path == "/v1/graphql":
+        return f"POST {path} {' '.join(json.loads(body)['query'].split())}"
+    return None
+
+
+def acknowledge_write(method: str, path: str, body: bytes) -> Response:
+    """Answer a write (batch import, patch, delete, schema change) without a service, so recording and replaying don't change the cluster
+    @parameter method : str - HTTP method
+    @parameter path : str - URL path
+    @parameter body : bytes - Request body
+    @returns Response - Success response
+    """
+    if path == "/v1/batch/objects" and method == "POST":
+        results = [
+            {
+                "class": obj.get("class"),
+                "id": obj.get("id") or str(uuid.uuid4()),
+                "result": {},
+            }
+            for obj in json.loads(body)["objects"]
+        ]
+        return Response(content=json.dumps(results), media_type="application/json")
+    return Response(
+        content=json.dumps({"results": {"matches": 0, "successful": 0}}),
+        media_type="application/json",
+    )
+
+
+class Cassette:
+    """Recorded responses of one service by request key, the first response recorded for a key is kept"""
+
+    def __init__(self, path: Path) -> None:
+        """
+        @parameter path : Path - JSON file of the recordings, loaded if it exists
+        """
+        self.path = path
+        self.recordings: dict = (
+            json.loads(path.read_text())["recordings"] if path.exists() else {}
+        )
+        self.hits = 0
+        self.misses: list = []
+
+    def record(self, key: str, status: int, body: bytes) -> None:
+        """Store a response and write the cassette
+        @parameter key : str - Request key
+        @parameter status : int - HTTP status
+        @parameter body : bytes - JSON response body, may be empty (e.g. for a 404)
+        @returns None
+        """
+        if key in self.recordings:
+            return
+        self.recordings[key] = {
+            "status": status,
+            "body": json.loads(body) if body else None,
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps({"recordings": self.recordings}, indent=1))
+
+    def replay(self, key: str) -> Optional[dict]:
+        """Return the recorded response of a request
+        @parameter key : str - Request key
+        @returns dict | None - "status" and "body", None if the request wasn't recorded
+        """
+        recording = self.recordings.get(key)
+        if recording is None:
+            self.misses.append(key)
+        else:
+            self.hits += 1
+        return recording
+
+
+def create_recording_proxy(target: str, cassette_path: Path) -> FastAPI:
+    """Proxy that forwards reads to a service and records their responses into a cassette, writes are acknowledged without forwarding them
+    @parameter target : str - Base URL of the real service, e.g. https://api.openai.com
+    @parameter cassette_path : Path - Cassette file
+    @returns FastAPI - Proxy app
+    """
+    app = FastAPI()
+    cassette = Cassette(cassette_path)
+    target = target.rstrip("/")
+
+    @app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
+    async def proxy(path: str, request: Request):
+        body = await request.body()
+        key = recording_key(request.method, f"/{path}", body)
+        if key is None:
+            return acknowledge_write(request.method, f"/{path}", body)
+
+        headers = {
+            key: value
+            for key, value in request.headers.items()
+            if key.lower() not in hop_headers
+        }
+        url = f"{target}/{path}"
+        if request.url.query:
+            url += f"?{request.url.query}"
+        async with aiohttp.ClientSession() as http:
+            async with http.request(
+                request.method, url, data=body, headers=headers
+            ) as response:
+                content = await response.read()
+                status = response.status
+                media_type = response.headers.get("content-type", "")
+
+        if not content or media_type.startswith("application/json"):
+            cassette.record(key, status, content)
+        return Response(content=content, status_code=status, media_type=media_type)
+
+    return app
+
+
+def create_replay_server(cassette_path: Path, latency: float = 0.0) -> FastAPI:
+    """Stand-in that answers requests from a cassette.
+    Writes are acknowledged, unrecorded reads fail like the real service would.
+    @parameter cassette_path : Path - Cassette file
+    @parameter latency : float - Seconds to wait before answering a recorded request
+    @returns FastAPI - Replay app, GET /replay/stats returns the hits and the keys of unrecorded requests
+    """
+    app = FastAPI()
+    cassette = Cassette(cassette_path)
+
+    @app.get("/replay/stats")
+    async def stats():
+        return {"hits": cassette.hits, "misses": cassette.misses}
+
+    @app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
+    async def replay(path: str, request: Request):
+        body = await request.body()
+        key = recording_key(request.method, f"/{path}", body)
+        if key is None:
+            return acknowledge_write(request.method, f"/{path}", body)
+
+        recording = cassette.replay(key)
+        await asyncio.sleep(latency)
+        if recording is None:
+            error = {"message": f"No recording for {key[:200]}"}
+            if f"/{path}" == "/v1/graphql":
+                # Weaviate reports query errors in the body of a 200 response
+                return Response(
+                    content=json.dumps({"errors": [error]}),
+                    media_type="application/json",
+                )
+            return Response(
+                content=json.dumps({"error": error}),
+                status_code=404,
+                media_type="application/json",
+            )
+        if recording["body"] is None:
+            return Response(status_code=recording["status"])
+        return Response(
+            content=json.dumps(recording["body"]),
+            status_code=recording["status"],
+            media_type="application/json",
+        )
+
+    return app
+
+
+def main(
+    queries: str = "joint pain,products for sleep from the now foods brand,best rated product for energy",
+    fixtures: Path = FIXTURES_PATH,
+    openai_url: str = "https://api.openai.com",
+    weaviate_url: str = "",
+) -> None:
+    """Record the OpenAI and Weaviate responses of /generate_query for a list of queries.
+    The API runs against recording proxies that forward to the real services (needs OPENAI_API_KEY,
+    HEALTHSEARCH_SERVER and HEALTHSEARCH_API_KEY), benchmarks/suite.py replays them with --fixtures.
+    """
+    weaviate_url = weaviate_url or os.environ.get("HEALTHSEARCH_SERVER", "")
+    if not weaviate_url:
+        msg.fail("Set HEALTHSEARCH_SERVER or --weaviate-url")
+        raise typer.Exit(1)
+
+    openai_proxy = serve_process(
+        create_recording_proxy,
+        {"target": openai_url, "cassette_path": fixtures / "openai.json"},
+        8095,
+    )
+    weaviate_proxy = serve_process(
+        create_recording_proxy,
+        {"target": weaviate_url, "cassette_path": fixtures / "weaviate.json"},
+        8096,
+    )
+    os.environ["OPENAI_API_BASE"] = "http://127.0.0.1:8095/v1"
+    os.environ["HEALTHSEARCH_SERVER"] = "http://127.0.0.1:8096"
+    os.environ["SLOW_QUERY_THRESHOLD"] = "0"
+
+    from api import app  # Imported after the environment points to the proxies
+
+    api_server = serve(app, 8093)
+    query_list = [query.strip() for query in queries.split(",") if query.strip()]
+    for query in query_list:
+        request = urllib.request.Request(
+            "http://127.0.0.1:8093/generate_query",
+            data=json.dumps({"text": query}).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        content = json.load(urllib.request.urlopen(request))
+        msg.info(f"{query}: {len(content['results'])} products")
+    (fixtures / "queries.json").write_text(json.dumps(query_list, indent=1))
+
+    api_server.should_exit = True
+    # The API flushes its queued cache writes on shutdown, the proxies acknowledge them
+    time.sleep(1)
+    openai_proxy.terminate()
+    weaviate_proxy.terminate()
+    msg.good(f"Recorded {len(query_list)} queries to {fixtures}")
+
+
+if __name__ == "__main__":
+    typer.run(main)
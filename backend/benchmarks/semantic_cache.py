@@ -0,0 +1,84 @@
+import asyncio
+import sys
+import time
+import typer
+import numpy as np
+
+from pathlib import Path
+from wasabi import msg  # type: ignore[import]
+
+from stubs import create_weaviate_stub, serve_process
+
+# The backend modules live one directory up
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from async_weaviate import AsyncWeaviateClient
+from embeddings import HashEmbedder
+from vector_index import VectorIndex
+
+
+def report(name: str, timings: list) -> None:
+    """Print p50 and p99 latency in milliseconds"""
+    p50, p99 = np.percentile(np.array(timings) * 1000, [50, 99])
+    msg.info(f"{name:<7} p50 {p50:8.3f} ms   p99 {p99:8.3f} ms")
+
+
+async def remote_lookup(iterations: int, port: int) -> list:
+    """nearText lookup on CachedResult, Weaviate embeds the query on every call"""
+    aclient = AsyncWeaviateClient(url=f"http://127.0.0.1:{port}")
+    timings = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        await aclient.raw(
+            '{Get{CachedResult(nearText: {concepts: ["query %d"]} limit: 1)'
+            "{naturalQuery _additional {distance}}}}" % i
+        )
+        timings.append(time.perf_counter() - start)
+    await aclient.close()
+    return timings
+
+
+async def local_lookup(iterations: int, entries: int, embed_latency: float) -> list:
+    """Embed the query once and search the local index"""
+    embedder = HashEmbedder(latency=embed_latency)
+    index = VectorIndex()
+    for i, vector in enumerate(
+        await embedder.embed([f"cached query {i}" for i in range(entries)])
+    ):
+        index.add(str(i), vector)
+
+    timings = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        vector = (await embedder.embed([f"query {i}"]))[0]
+        index.search(vector)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main(
+    iterations: int = 200,
+    entries: int = 5000,
+    embed_latency: float = 0.05,
+    weaviate_latency: float = 0.02,
+) -> None:
+    """Compare the semantic cache lookup through Weaviate nearText with the local vector index, using a stubbed embedder"""
+    msg.divider(f"Semantic cache lookup ({entries} cached queries)")
+
+    # The remote path pays the Weaviate round trip plus the embedding Weaviate requests internally
+    weaviate_stub = serve_process(
+        create_weaviate_stub,
+        {"latency": weaviate_latency + embed_latency, "products": []},
+        8094,
+    )
+    report("remote", asyncio.run(remote_lookup(iterations, 8094)))
+    weaviate_stub.terminate()
+
+    report("local", asyncio.run(local_lookup(iterations, entries, embed_latency)))
+
+    # Search only, without the embedding request
+    report("search", asyncio.run(local_lookup(iterations, entries, 0.0)))
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -0,0 +1,272 @@
+import asyncio
+import json
+import multiprocessing
+import random
+import socket
+import threading
+import time
+import uuid
+import uvicorn
+import sys
+import numpy as np
+
+from pathlib import Path
+from typing import Callable, Optional
+from fastapi import FastAPI, Request, Response
+
+# The backend modules live one directory up
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from schema import product_class
+
+try:
+    import tiktoken  # type: ignore[import]
+
+    encoding = tiktoken.encoding_for_model("gpt-4")
+except ImportError:
+    encoding = None
+
+DATASET_PATH = Path(__file__).parent.parent / "data" / "dataset_100_supplements.json"
+
+EXAMPLE_QUERY = """{
+  Get {
+    Product(
+      nearText: {concepts: ["joint pain"]}
+    ) {
+      name
+      brand
+      ingredients
+      reviews
+      image
+      rating
+      description
+      summary
+      effects
+      _additional {
+        id
+        distance
+      }
+    }
+  }
+}"""
+
+
+def load_products(data_path: Path = DATASET_PATH, limit: int = 25) -> list:
+    """Load products from the dataset in the shape Weaviate returns them
+    @parameter data_path : Path - Path to the dataset
+    @parameter limit : int - Maximum number of products
+    @returns list - Products as returned by a Weaviate Get query
+    """
+    with open(data_path, "r") as reader:
+        data = json.load(reader)
+
+    products = []
+    for i, d in enumerate(list(data)[:limit]):
+        products.append(
+            {
+                "name": data[d].get("name", ""),
+                "brand": data[d].get("brand", ""),
+                "ingredients": data[d].get("ingredients", ""),
+                "reviews": data[d].get("reviews", []),
+                "image": data[d].get("img", ""),
+                "rating": float(data[d].get("rating", 0.0)),
+                "description": data[d].get("description", ""),
+                "summary": data[d].get("summary", ""),
+                "effects": data[d].get("effects", ""),
+                "_additional": {"id": d, "distance": 0.1 + i * 0.001},
+            }
+        )
+    return products
+
+
+def count_tokens(text: str) -> int:
+    """Count the GPT-4 tokens of a text with tiktoken, or estimate them with 4 characters per token if it isn't installed
+    @parameter text : str - Text
+    @returns int - Number of tokens
+    """
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def create_openai_stub(
+    latency: float, content: str = EXAMPLE_QUERY, responses: Optional[dict] = None
+) -> FastAPI:
+    """Local stand-in for the OpenAI chat completion API, reports token usage like the real API
+    @parameter latency : float - Seconds to wait before answering
+    @parameter content : str - Message content returned for every completion
+    @parameter responses : dict - Recorded completions by natural language query, used when the last message ends with the query
+    @returns FastAPI - Stub app
+    """
+    app = FastAPI()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        await asyncio.sleep(latency)
+        messages = (await request.json())["messages"]
+        completion = content
+        for natural_query, recorded in (responses or {}).items():
+            if messages[-1]["content"].endswith(natural_query):
+                completion = recorded
+                break
+        prompt_tokens = sum(count_tokens(message["content"]) for message in messages)
+        completion_tokens = count_tokens(completion)
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": completion},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        await asyncio.sleep(latency / 10)
+        texts = (await request.json())["input"]
+        data = []
+        for i, text in enumerate(texts):
+            rng = np.random.default_rng(abs(hash(text)))
+            data.append({"index": i, "embedding": rng.standard_normal(1536).tolist()})
+        return Response(
+            content=json.dumps({"data": data}), media_type="application/json"
+        )
+
+    return app
+
+
+def create_weaviate_stub(
+    latency: float,
+    products: list,
+    object_latency: float = 0.0,
+    fail_rate: float = 0.0,
+) -> FastAPI:
+    """Local stand-in for the Weaviate REST and GraphQL API. CachedResult queries are always empty so every request runs the full pipeline
+    @parameter latency : float - Seconds to wait before answering a GraphQL or batch request
+    @parameter products : list - Products returned for every Product query
+    @parameter object_latency : float - Additional seconds per object of a batch request
+    @parameter fail_rate : float - Share of batch objects answered with an error
+    @returns FastAPI - Stub app
+    """
+    app = FastAPI()
+
+    # Serialize once, FastAPI's encoder would otherwise dominate the stub's latency
+    cache_response = json.dumps({"data": {"Get": {"CachedResult": []}}})
+    cache_count_response = json.dumps(
+        {"data": {"Aggregate": {"CachedResult": [{"meta": {"count": 0}}]}}}
+    )
+    generated = [
+        {"_additional": {"generate": {"groupedResult": "Stub summary", "error": None}}}
+    ]
+    generative_response = json.dumps(
+        {"data": {"Get": {"Product": generated + products[1:5]}}}
+    )
+    product_response = json.dumps({"data": {"Get": {"Product": products}}})
+    brands = sorted({product["brand"] for product in products if product.get("brand")})
+    brand_response = json.dumps(
+        {
+            "data": {
+                "Aggregate": {
+                    "Product": [{"groupedBy": {"value": brand}} for brand in brands]
+                }
+            }
+        }
+    )
+
+    @app.get("/v1/meta")
+    async def meta():
+        return {"hostname": "http://[::]:8080", "modules": {}, "version": "1.19.11"}
+
+    @app.get("/v1/.well-known/ready")
+    async def ready():
+        return {}
+
+    @app.get("/v1/schema/{class_name}")
+    async def schema(class_name: str):
+        if class_name != product_class["class"]:
+            return Response(status_code=404)
+        return product_class
+
+    @app.post("/v1/graphql")
+    async def graphql(request: Request):
+        await asyncio.sleep(latency)
+        query = (await request.json())["query"]
+        if "CachedResult" in query:
+            content = cache_count_response if "Aggregate" in query else cache_response
+        elif "Aggregate" in query:
+            content = brand_response
+        elif "generate(" in query:
+            content = generative_response
+        else:
+            content = product_response
+        return Response(content=content, media_type="application/json")
+
+    @app.get("/v1/nodes")
+    async def nodes():
+        # No batch stats, the client falls back to sizing batches by their duration
+        return {"nodes": [{"name": "stub", "status": "HEALTHY", "stats": {}}]}
+
+    @app.post("/v1/batch/objects")
+    async def batch_objects(request: Request):
+        objects = (await request.json())["objects"]
+        await asyncio.sleep(latency + object_latency * len(objects))
+        results = []
+        for obj in objects:
+            obj_id = obj.get("id") or str(uuid.uuid4())
+            if fail_rate and random.random() < fail_rate:
+                # Failed objects are echoed in full, the client resends them from the response
+                error = {"errors": {"error": [{"message": "stub failure"}]}}
+                results.append(dict(obj, id=obj_id, result=error))
+            else:
+                results.append({"class": obj.get("class"), "id": obj_id, "result": {}})
+        return Response(content=json.dumps(results), media_type="application/json")
+
+    return app
+
+
+def serve(app: FastAPI, port: int) -> uvicorn.Server:
+    """Run an app with uvicorn in a background thread
+    @parameter app : FastAPI - App to serve
+    @parameter port : int - Port on localhost
+    @returns uvicorn.Server - Running server, set should_exit to stop it
+    """
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+def _run_in_process(factory: Callable, kwargs: dict, port: int) -> None:
+    uvicorn.run(factory(**kwargs), host="127.0.0.1", port=port, log_level="warning")
+
+
+def serve_process(
+    factory: Callable, kwargs: dict, port: int
+) -> multiprocessing.Process:
+    """Run a stub app in its own process so it doesn't compete with the app under test for the GIL
+    @parameter factory : Callable - Function creating the app (e.g. create_weaviate_stub)
+    @parameter kwargs : dict - Arguments for the factory
+    @parameter port : int - Port on localhost
+    @returns multiprocessing.Process - Running process, call terminate() to stop it
+    """
+    process = multiprocessing.Process(
+        target=_run_in_process, args=(factory, kwargs, port), daemon=True
+    )
+    process.start()
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.05)
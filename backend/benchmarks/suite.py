@@ -0,0 +1,291 @@
+import asyncio
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+import urllib.request
+import aiohttp
+import typer
+import numpy as np
+
+from pathlib import Path
+from typing import Optional
+from wasabi import msg  # type: ignore[import]
+
+from recording import create_replay_server
+from stubs import (
+    create_openai_stub,
+    create_weaviate_stub,
+    load_products,
+    serve,
+    serve_process,
+)
+
+# The backend modules live one directory up
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from graphql_transform import transform_graphql
+from query_cache import read_cache_generation
+from vector_index import VectorIndex
+
+CORPUS_PATH = Path(__file__).parent / "data" / "generated_queries.json"
+
+
+def percentiles(timings: list) -> tuple:
+    """p50 and p95 in milliseconds"""
+    p50, p95 = np.percentile(np.array(timings) * 1000, [50, 95])
+    return round(float(p50), 2), round(float(p95), 2)
+
+
+def per_call_us(fn, iterations: int) -> float:
+    """Median duration of fn() in microseconds"""
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return round(float(np.median(timings)) * 1e6, 1)
+
+
+def peak_kb(fn) -> float:
+    """Peak memory allocated while fn() runs in KB"""
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+
+def bench_functions(api, iterations: int) -> dict:
+    """Time handle_results on a product response and modify_graphql on the corpus of generated queries"""
+    results = {"data": {"Get": {"Product": load_products(limit=25)}}}
+    corpus = [
+        (entry["query"], entry["natural_query"])
+        for entry in json.loads(CORPUS_PATH.read_text())
+    ]
+
+    def modify_all() -> None:
+        for query, natural_query in corpus:
+            # Uncached, repeated queries are answered by the query cache before the rewrite
+            transform_graphql.__wrapped__(query, natural_query, tuple(api.data_fields))
+
+    return {
+        "handle_results_us": per_call_us(
+            lambda: api.handle_results(results), iterations
+        ),
+        "handle_results_peak_kb": peak_kb(lambda: api.handle_results(results)),
+        "modify_graphql_us": round(
+            per_call_us(modify_all, iterations) / len(corpus), 1
+        ),
+    }
+
+
+async def wait_for_cache_writes(api) -> None:
+    """Wait until the write-behind queue of the API is flushed"""
+    writer = api.cache_writer
+    while (
+        not writer.queue.empty()
+        or writer.pending
+        or (writer.writing is not None and not writer.writing.done())
+    ):
+        await asyncio.sleep(0.005)
+
+
+async def reset_caches(api) -> None:
+    """Wait for the queued cache writes, then empty the in-process caches so the next request for a query runs the whole pipeline"""
+    await wait_for_cache_writes(api)
+    api.query_cache.clear()
+    api.semantic_index = VectorIndex()
+    api.semantic_index.generation = read_cache_generation()
+
+
+async def post_query(http: aiohttp.ClientSession, url: str, text: str) -> float:
+    """Send one /generate_query request
+    @returns float - Seconds until the response was read
+    """
+    start = time.perf_counter()
+    async with http.post(f"{url}/generate_query", json={"text": text}) as response:
+        response.raise_for_status()
+        await response.read()
+    return time.perf_counter() - start
+
+
+async def throughput(url: str, texts: list, concurrency: int, total: int) -> float:
+    """Requests per second with a fixed number of requests in flight, cycling through texts"""
+    counter = iter(range(total))
+
+    async def worker(http: aiohttp.ClientSession) -> None:
+        for i in counter:
+            await post_query(http, url, texts[i % len(texts)])
+
+    async with aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=concurrency)
+    ) as http:
+        start = time.perf_counter()
+        await asyncio.gather(*[worker(http) for _ in range(concurrency)])
+        return round(total / (time.perf_counter() - start), 1)
+
+
+async def bench_api(
+    api, url: str, queries: list, repeats: int, concurrency: int, distinct: bool
+) -> dict:
+    """Measure cold and warm latency, throughput and memory of /generate_query
+    @parameter queries : list - Natural language queries
+    @parameter repeats : int - Cold and warm requests per query
+    @parameter concurrency : int - Requests in flight for the throughput
+    @parameter distinct : bool - Whether the backends answer any query, cold throughput needs a new query per request
+    """
+    cold, warm = [], []
+    async with aiohttp.ClientSession() as http:
+        for _ in range(repeats):
+            for text in queries:
+                await reset_caches(api)
+                cold.append(await post_query(http, url, text))
+                await wait_for_cache_writes(api)
+                warm.append(await post_query(http, url, text))
+
+        await reset_caches(api)
+        tracemalloc.start()
+        await post_query(http, url, queries[0])
+        _, cold_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    total = concurrency * 20
+    metrics = {
+        "cold_p50_ms": percentiles(cold)[0],
+        "cold_p95_ms": percentiles(cold)[1],
+        "warm_p50_ms": percentiles(warm)[0],
+        "warm_p95_ms": percentiles(warm)[1],
+        "warm_rps": await throughput(url, queries, concurrency, total),
+    }
+    if distinct:
+        texts = [f"{queries[i % len(queries)]} {i}" for i in range(total)]
+        metrics["cold_rps"] = await throughput(url, texts, concurrency, total)
+    await wait_for_cache_writes(api)
+    metrics["cold_request_peak_kb"] = round(cold_peak / 1024, 1)
+    # ru_maxrss is in KB on Linux
+    metrics["max_rss_mb"] = round(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+    )
+    return metrics
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Compare results with a baseline, throughput (_rps) is better when higher, everything else when lower
+    @returns list - Names of the metrics that regressed by more than tolerance
+    """
+    rows = []
+    regressions = []
+    for name, value in results.items():
+        base = baseline.get(name)
+        if not base:
+            rows.append((name, "", value, ""))
+            continue
+        change = (value - base) / base
+        regressed = -change > tolerance if name.endswith("_rps") else change > tolerance
+        if regressed:
+            regressions.append(name)
+        rows.append(
+            (name, base, value, f"{change:+.0%}" + (" REGRESSION" if regressed else ""))
+        )
+    msg.table(rows, header=("Metric", "Baseline", "Current", "Change"), divider=True)
+    return regressions
+
+
+def main(
+    fixtures: Optional[Path] = None,
+    llm_latency: float = 0.05,
+    weaviate_latency: float = 0.01,
+    repeats: int = 5,
+    concurrency: int = 8,
+    iterations: int = 200,
+    output: Optional[Path] = None,
+    baseline: Optional[Path] = None,
+    tolerance: float = 0.25,
+) -> None:
+    """Benchmark handle_results, modify_graphql and /generate_query (cold and warm latency, throughput and memory).
+    The API runs against stubs for OpenAI and Weaviate, or replays recorded responses with --fixtures (see recording.py).
+    Write the results with --output and compare a later run with --baseline, the run fails if a metric regressed by more than --tolerance.
+    """
+    if fixtures is not None:
+        openai_server = serve_process(
+            create_replay_server,
+            {"cassette_path": fixtures / "openai.json", "latency": llm_latency},
+            8091,
+        )
+        weaviate_server = serve_process(
+            create_replay_server,
+            {"cassette_path": fixtures / "weaviate.json", "latency": weaviate_latency},
+            8092,
+        )
+        queries = json.loads((fixtures / "queries.json").read_text())
+    else:
+        openai_server = serve_process(
+            create_openai_stub, {"latency": llm_latency}, 8091
+        )
+        weaviate_server = serve_process(
+            create_weaviate_stub,
+            {"latency": weaviate_latency, "products": load_products()},
+            8092,
+        )
+        queries = ["joint pain", "helpful for sleep", "best rated product for energy"]
+
+    os.environ["OPENAI_API_KEY"] = os.environ.get("OPENAI_API_KEY") or "stub"
+    os.environ["OPENAI_API_BASE"] = "http://127.0.0.1:8091/v1"
+    os.environ["HEALTHSEARCH_SERVER"] = "http://127.0.0.1:8092"
+    os.environ["HEALTHSEARCH_API_KEY"] = ""
+    os.environ["SLOW_QUERY_THRESHOLD"] = "0"
+    # Cache writes are flushed right away, so a cold request doesn't leave work for the next one
+    os.environ["CACHE_WRITE_INTERVAL"] = "0"
+
+    import api  # Imported after the environment points to the stand-ins
+
+    api_server = serve(api.app, 8093)
+
+    msg.divider("Functions")
+    results = bench_functions(api, iterations)
+    msg.divider("API")
+    results.update(
+        asyncio.run(
+            bench_api(
+                api,
+                "http://127.0.0.1:8093",
+                queries,
+                repeats,
+                concurrency,
+                fixtures is None,
+            )
+        )
+    )
+
+    if fixtures is not None:
+        for port in [8091, 8092]:
+            stats = json.load(
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/replay/stats")
+            )
+            if stats["misses"]:
+                msg.warn(
+                    f"{len(stats['misses'])} requests without a recording, e.g. {stats['misses'][0][:300]}"
+                )
+
+    api_server.should_exit = True
+    openai_server.terminate()
+    weaviate_server.terminate()
+
+    if baseline is not None:
+        regressions = compare(results, json.loads(baseline.read_text()), tolerance)
+    else:
+        msg.table(list(results.items()), header=("Metric", "Value"), divider=True)
+        regressions = []
+    if output is not None:
+        output.write_text(json.dumps(results, indent=2))
+        msg.good(f"Results written to {output}")
+    if regressions:
+        msg.fail(f"Regressions: {', '.join(regressions)}")
+        raise typer.Exit(1)
+
+
+if __name__ == "__main__":
+    typer.run(main)
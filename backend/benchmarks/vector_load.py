@@ -0,0 +1,142 @@
+import json
+import multiprocessing
+import sys
+import tempfile
+import time
+import typer
+import numpy as np
+
+from pathlib import Path
+from wasabi import msg  # type: ignore[import]
+
+# The backend modules live one directory up
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from import_data_to_weaviate import read_products
+from vector_file import VectorFile
+
+DATASET_PATH = Path(__file__).parent.parent / "data" / "dataset_100_supplements.json"
+
+
+def write_datasets(directory: Path, products: int, dimensions: int) -> None:
+    """Write the same generated products as a dataset with JSON vectors and as a dataset without vectors plus a vector file"""
+    with open(DATASET_PATH, "r") as reader:
+        sample = list(json.load(reader).values())
+    rng = np.random.default_rng(0)
+    matrix = np.lib.format.open_memmap(
+        directory / "vectors.npy",
+        mode="w+",
+        dtype=np.float32,
+        shape=(products, dimensions),
+    )
+    with open(directory / "with_vectors.json", "w") as with_vectors, open(
+        directory / "without_vectors.json", "w"
+    ) as without_vectors:
+        with_vectors.write("{")
+        without_vectors.write("{")
+        for i in range(products):
+            vector = rng.standard_normal(dimensions, dtype=np.float32) / 40
+            matrix[i] = vector
+            product = json.dumps(sample[i % len(sample)])[:-1]
+            separator = "," if i else ""
+            with_vectors.write(
+                f'{separator}"{i}": {product}, "vector": {json.dumps(vector.tolist())}}}'
+            )
+            without_vectors.write(f'{separator}"{i}": {product}}}')
+        with_vectors.write("}")
+        without_vectors.write("}")
+    matrix.flush()
+    (directory / "vectors.json").write_text(
+        json.dumps({"ids": [str(i) for i in range(products)]})
+    )
+
+
+def megabytes(*paths: Path) -> float:
+    """Combined size of files in MB"""
+    return sum(path.stat().st_size for path in paths) / 1024 / 1024
+
+
+def load_json(directory: Path) -> int:
+    """Previous importer: json.load of the whole dataset"""
+    with open(directory / "with_vectors.json", "r") as reader:
+        data = json.load(reader)
+    return sum(len(product["vector"]) for product in data.values())
+
+
+def stream_json(directory: Path) -> int:
+    """Incremental parsing of the dataset with JSON vectors"""
+    return sum(
+        len(product["vector"])
+        for _, product in read_products(directory / "with_vectors.json")
+    )
+
+
+def stream_binary(directory: Path) -> int:
+    """Incremental parsing of the dataset without vectors, vectors sliced from the memory-mapped file.
+    They are converted to lists like the weaviate client does before sending them.
+    """
+    vectors = VectorFile.load(directory / "vectors")
+    total = 0
+    for product_id, _ in read_products(directory / "without_vectors.json"):
+        vector = vectors.get(product_id)
+        total += 0 if vector is None else len(vector.tolist())
+    return total
+
+
+def measure(loader, directory: Path, results) -> None:
+    start = time.perf_counter()
+    loader(directory)
+    seconds = time.perf_counter() - start
+    # Peak resident set size in KB, unlike ru_maxrss it isn't carried over from the parent on Linux
+    status = Path("/proc/self/status").read_text()
+    peak = int(status.split("VmHWM:")[1].split()[0])
+    results.put((seconds, peak / 1024))
+
+
+def run(loader, directory: Path) -> tuple:
+    """Run a loader in a fresh interpreter, so its peak RSS isn't inflated by earlier runs"""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=measure, args=(loader, directory, results))
+    process.start()
+    seconds, rss = results.get()
+    process.join()
+    return round(seconds, 3), round(rss)
+
+
+def main(
+    sizes: str = "100,10000,100000",
+    dimensions: int = 1536,
+    max_json_load: int = 20000,
+) -> None:
+    """Compare load time and peak RSS of the dataset with JSON vectors and the binary vector file.
+    json.load needs several GB at 100k products with 1536 dimensions, it is skipped above --max-json-load products.
+    """
+    rows = []
+    for size in [int(size) for size in sizes.split(",")]:
+        with tempfile.TemporaryDirectory() as name:
+            directory = Path(name)
+            write_datasets(directory, size, dimensions)
+            msg.info(
+                f"{size} products: {megabytes(directory / 'with_vectors.json'):.0f} MB with JSON vectors, "
+                f"{megabytes(directory / 'without_vectors.json', directory / 'vectors.npy'):.0f} MB with the vector file"
+            )
+
+            for name, loader in [
+                ("json.load", load_json),
+                ("read_products", stream_json),
+                ("read_products + .npy", stream_binary),
+            ]:
+                if loader is load_json and size > max_json_load:
+                    rows.append((size, name, "skipped", "skipped"))
+                    continue
+                seconds, rss = run(loader, directory)
+                rows.append((size, name, seconds, rss))
+
+    msg.table(
+        rows, header=("Products", "Loader", "Seconds", "Peak RSS (MB)"), divider=True
+    )
+
+
+if __name__ == "__main__":
+    typer.run(main)
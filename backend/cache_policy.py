@@ -0,0 +1,133 @@
+import time
+
+from typing import Optional
+
+from weaviate.util import generate_uuid5  # type: ignore[import]
+
+from shared_state import LocalState
+
+# Bookkeeping properties of CachedResult objects read and written by the compactor
+policy_properties = ["naturalQuery", "createdAt", "lastHitAt", "hitCount", "sizeBytes"]
+
+
+def cache_entry_id(natural_query: str) -> str:
+    """Return the UUID of the CachedResult object of a query, so writing the same query again replaces it
+    @parameter natural_query : str - Normalized natural language query
+    @returns str - UUID
+    """
+    return generate_uuid5(natural_query, "CachedResult")
+
+
+class CachePolicy:
+    """Eviction policy for the CachedResult class.
+    Hits are counted in the shared state, so the hits of all workers are written back by the compactor, which evicts entries older than ttl first
+    and then the lowest scored entries until max_entries and max_bytes are met.
+    The score is the last hit time for "lru" and the hit count (ties broken by the last hit time) for "lfu".
+    """
+
+    def __init__(
+        self,
+        ttl: float = 7 * 24 * 3600,
+        max_entries: int = 10000,
+        max_bytes: int = 256 * 1024 * 1024,
+        mode: str = "lfu",
+        state: Optional[LocalState] = None,
+    ) -> None:
+        """
+        @parameter ttl : float - Seconds after their creation entries are evicted, 0 disables the TTL
+        @parameter max_entries : int - Entries kept, 0 for no limit
+        @parameter max_bytes : int - Combined size of the entries kept, 0 for no limit
+        @parameter mode : str - Eviction order once a budget is exceeded, "lfu" or "lru"
+        @parameter state : LocalState | SQLiteState - Where hits and the last compaction are kept, local to the process by default
+        """
+        if mode not in ("lfu", "lru"):
+            raise ValueError(f"Unknown cache eviction mode {mode}, use lfu or lru")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.mode = mode
+        self.state = state if state is not None else LocalState()
+
+    @property
+    def last_run(self) -> dict:
+        """Result of the last compaction of any worker"""
+        return self.state.get("cache_policy:last_run") or {}
+
+    @last_run.setter
+    def last_run(self, result: dict) -> None:
+        self.state.set("cache_policy:last_run", result)
+
+    def record_hit(self, entry_id: str, now: Optional[float] = None) -> None:
+        """Count a hit on a cache entry, it is written to Weaviate by the next compaction
+        @parameter entry_id : str - UUID of the CachedResult object
+        @parameter now : float - Time of the hit, defaults to the current time
+        @returns None
+        """
+        now = time.time() if now is None else now
+        self.state.incr(f"cache_policy:hits:{entry_id}")
+        self.state.maximum(f"cache_policy:last_hit:{entry_id}", now)
+
+    def take_hits(self) -> dict:
+        """Return and reset the hits recorded since the last call
+        @returns dict - [hit count, last hit time] by entry id
+        """
+        counts = self.state.take("cache_policy:hits:")
+        last_hits = self.state.take("cache_policy:last_hit:")
+        now = time.time()
+        return {
+            key[len("cache_policy:hits:") :]: [
+                int(count),
+                last_hits.get(key.replace(":hits:", ":last_hit:", 1), now),
+            ]
+            for key, count in counts.items()
+        }
+
+    def score(self, entry: dict) -> tuple:
+        """Sort key of an entry, lower scores are evicted first"""
+        if self.mode == "lru":
+            return (entry["lastHitAt"],)
+        return (entry["hitCount"], entry["lastHitAt"])
+
+    def select_evictions(self, entries: list, now: Optional[float] = None) -> tuple:
+        """Choose the entries to evict
+        @parameter entries : list - Entries with "id", "createdAt", "lastHitAt", "hitCount" and "sizeBytes"
+        @parameter now : float - Current time
+        @returns (list, list) - Expired entries and entries evicted to meet the budgets
+        """
+        now = time.time() if now is None else now
+        expired = []
+        kept = []
+        for entry in entries:
+            if self.ttl and now - entry["createdAt"] > self.ttl:
+                expired.append(entry)
+            else:
+                kept.append(entry)
+
+        kept.sort(key=self.score)
+        total_bytes = sum(entry["sizeBytes"] for entry in kept)
+        evicted: list = []
+        for entry in kept:
+            over_entries = (
+                self.max_entries and len(kept) - len(evicted) > self.max_entries
+            )
+            over_bytes = self.max_bytes and total_bytes > self.max_bytes
+            if not (over_entries or over_bytes):
+                break
+            evicted.append(entry)
+            total_bytes -= entry["sizeBytes"]
+        return expired, evicted
+
+    def stats(self) -> dict:
+        """Return the configuration, pending hits and the result of the last compaction
+        @returns dict - Policy statistics
+        """
+        return {
+            "mode": self.mode,
+            "ttl": self.ttl,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "pending_hits": int(
+                sum(self.state.counters("cache_policy:hits:").values())
+            ),
+            "last_compaction": self.last_run,
+        }
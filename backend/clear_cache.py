@@ -7,6 +7,9 @@ from wasabi import msg  # type: ignore[import]
 
 from dotenv import load_dotenv
 
+from query_cache import bump_cache_generation
+from schema import cached_result_class
+
 load_dotenv()
 
 
@@ -34,63 +37,14 @@ def main() -> None:
 
     msg.good("Client connected to Weaviate Instance")
 
-    cache_obj = {
-        "class": "CachedResult",
-        "description": "Cached results",
-        "properties": [
-            {
-                "dataType": ["text"],
-                "description": "GraphQL Query",
-                "name": "graphQuery",
-                "moduleConfig": {
-                    "text2vec-openai": {
-                        "skip": True,
-                        "vectorizePropertyName": False,
-                    }
-                },
-            },
-            {
-                "dataType": ["text"],
-                "description": "Natural Language Query",
-                "name": "naturalQuery",
-                "moduleConfig": {
-                    "text2vec-openai": {
-                        "skip": False,
-                        "vectorizePropertyName": True,
-                    }
-                },
-            },
-            {
-                "dataType": ["text"],
-                "description": "Retrieved Products",
-                "name": "products",
-                "moduleConfig": {
-                    "text2vec-openai": {
-                        "skip": True,
-                        "vectorizePropertyName": False,
-                    }
-                },
-            },
-            {
-                "dataType": ["text"],
-                "description": "Generated Summary",
-                "name": "summary",
-                "moduleConfig": {
-                    "text2vec-openai": {
-                        "skip": True,
-                        "vectorizePropertyName": False,
-                    }
-                },
-            },
-        ],
-        "vectorizer": "text2vec-openai",
-    }
-
     if not client.schema.exists("CachedResult"):
-        client.schema.create_class(cache_obj)
+        client.schema.create_class(cached_result_class)
     else:
         client.schema.delete_class("CachedResult")
-        client.schema.create_class(cache_obj)
+        client.schema.create_class(cached_result_class)
+
+    # Invalidate the in-process caches of running API workers
+    bump_cache_generation()
 
     msg.good("Cache cleared")
 
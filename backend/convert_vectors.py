@@ -0,0 +1,83 @@
+import json
+import typer
+import numpy as np
+
+from pathlib import Path
+from wasabi import msg  # type: ignore[import]
+
+from import_data_to_weaviate import read_products
+from vector_file import VectorFile
+
+app = typer.Typer()
+
+
+@app.command()
+def to_binary(data_path: Path, output_path: Path, vectors_path: Path) -> None:
+    """Split a dataset with vectors into a dataset without vectors and a binary vector file
+    @parameter data_path : Path - Dataset with "vector" keys
+    @parameter output_path : Path - Dataset without the vectors
+    @parameter vectors_path : Path - Vector file path without suffix (.npy and .json are written)
+    @returns None
+    """
+    ids = []
+    dimensions = 0
+    rows_path = vectors_path.with_suffix(".rows")
+
+    # Rows are appended to a raw file first, the number of rows is only known at the end
+    with open(output_path, "w") as writer, open(rows_path, "wb") as rows:
+        writer.write("{")
+        for i, (product_id, product) in enumerate(read_products(data_path)):
+            vector = product.pop("vector", None)
+            if vector is not None:
+                if dimensions and len(vector) != dimensions:
+                    raise ValueError(
+                        f"Product {product_id} has {len(vector)} dimensions, expected {dimensions}"
+                    )
+                dimensions = len(vector)
+                rows.write(np.asarray(vector, dtype=np.float32).tobytes())
+                ids.append(product_id)
+            writer.write(("," if i else "") + json.dumps({product_id: product})[1:-1])
+        writer.write("}")
+
+    matrix = np.lib.format.open_memmap(
+        vectors_path.with_suffix(".npy"),
+        mode="w+",
+        dtype=np.float32,
+        shape=(len(ids), dimensions),
+    )
+    if ids:
+        matrix[:] = np.memmap(
+            rows_path, dtype=np.float32, mode="r", shape=(len(ids), dimensions)
+        )
+    matrix.flush()
+    rows_path.unlink()
+    vectors_path.with_suffix(".json").write_text(json.dumps({"ids": ids}))
+
+    msg.good(f"Wrote {len(ids)} vectors with {dimensions} dimensions")
+
+
+@app.command()
+def to_json(data_path: Path, vectors_path: Path, output_path: Path) -> None:
+    """Merge a dataset and a binary vector file into a dataset with "vector" keys
+    @parameter data_path : Path - Dataset without vectors
+    @parameter vectors_path : Path - Vector file path without suffix
+    @parameter output_path : Path - Dataset with the vectors
+    @returns None
+    """
+    vectors = VectorFile.load(vectors_path)
+    merged = 0
+    with open(output_path, "w") as writer:
+        writer.write("{")
+        for i, (product_id, product) in enumerate(read_products(data_path)):
+            vector = vectors.get(product_id)
+            if vector is not None:
+                product["vector"] = vector.tolist()
+                merged += 1
+            writer.write(("," if i else "") + json.dumps({product_id: product})[1:-1])
+        writer.write("}")
+
+    msg.good(f"Merged {merged} vectors")
+
+
+if __name__ == "__main__":
+    app()
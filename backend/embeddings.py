@@ -0,0 +1,250 @@
+import asyncio
+import hashlib
+import re
+import sqlite3
+import openai
+import numpy as np
+
+from pathlib import Path
+from typing import Optional
+
+# Same model the text2vec-openai module uses for the Product and CachedResult classes
+embedding_model = "text-embedding-ada-002"
+embedding_dimensions = 1536
+
+
+class OpenAIEmbedder:
+    """Embeds texts with the OpenAI embeddings API"""
+
+    def __init__(self, model: str = embedding_model) -> None:
+        self.model = model
+
+    async def embed(self, texts: list) -> np.ndarray:
+        """Embed a list of texts with a single API request
+        @parameter texts : list - Texts to embed
+        @returns np.ndarray - float32 matrix with one row per text
+        """
+        response = await openai.Embedding.acreate(model=self.model, input=texts)
+        data = sorted(response["data"], key=lambda item: item["index"])
+        return np.array([item["embedding"] for item in data], dtype=np.float32)
+
+
+class HashEmbedder:
+    """Deterministic local embedder for tests and benchmarks, equal texts get equal vectors"""
+
+    def __init__(
+        self, dimensions: int = embedding_dimensions, latency: float = 0.0
+    ) -> None:
+        """
+        @parameter dimensions : int - Vector size
+        @parameter latency : float - Seconds to wait per call, to simulate a remote API
+        """
+        self.dimensions = dimensions
+        self.latency = latency
+        self.model = f"hash-{dimensions}"
+
+    async def embed(self, texts: list) -> np.ndarray:
+        """Embed a list of texts by seeding a random generator with their hash
+        @parameter texts : list - Texts to embed
+        @returns np.ndarray - float32 matrix with one row per text
+        """
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        vectors = np.empty((len(texts), self.dimensions), dtype=np.float32)
+        for i, text in enumerate(texts):
+            seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+            vectors[i] = np.random.default_rng(seed).standard_normal(self.dimensions)
+        return vectors
+
+
+class EmbeddingCache:
+    """Content-addressed on-disk cache of embeddings in SQLite, keyed by the hash of model and text"""
+
+    def __init__(self, path: Path) -> None:
+        """
+        @parameter path : Path - SQLite database, created if it doesn't exist
+        """
+        self.connection = sqlite3.connect(
+            str(path), check_same_thread=False, timeout=30
+        )
+        # Several API workers read and write the same database
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)"
+        )
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        """Return the cache key of a text embedded with a model"""
+        return hashlib.sha256(f"{model}\n{text}".encode()).hexdigest()
+
+    def get_many(self, keys: list) -> dict:
+        """Look up embeddings
+        @parameter keys : list - Cache keys
+        @returns dict - float32 vectors by key, missing keys are left out
+        """
+        found = {}
+        # Stay below SQLite's limit of variables per statement
+        for start in range(0, len(keys), 500):
+            chunk = keys[start : start + 500]
+            rows = self.connection.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            for key, vector in rows:
+                found[key] = np.frombuffer(vector, dtype=np.float32)
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, vectors: dict) -> None:
+        """Store embeddings
+        @parameter vectors : dict - Vectors by key
+        @returns None
+        """
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [
+                    (key, np.asarray(vector, dtype=np.float32).tobytes())
+                    for key, vector in vectors.items()
+                ],
+            )
+
+    def close(self) -> None:
+        """Close the database"""
+        self.connection.close()
+
+
+class BatchingEmbedder:
+    """Wraps an embedder: the texts of concurrent embed() calls are combined into one request"""
+
+    def __init__(self, embedder, max_wait: float = 0.005, max_batch: int = 256) -> None:
+        """
+        @parameter embedder : OpenAIEmbedder | HashEmbedder - Embedder with an async embed(texts) and a model name
+        @parameter max_wait : float - Seconds the first text of a batch waits for others
+        @parameter max_batch : int - Texts per request, a full batch is sent right away
+        """
+        self.embedder = embedder
+        self.model = embedder.model
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self.pending: list = []  # (texts, future) of the waiting calls
+        self.pending_texts = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.requests = 0
+        self.texts = 0
+
+    async def embed(self, texts: list) -> np.ndarray:
+        """Embed a list of texts with the next batch
+        @parameter texts : list - Texts to embed
+        @returns np.ndarray - float32 matrix with one row per text
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((texts, future))
+        self.pending_texts += len(texts)
+        if self.pending_texts >= self.max_batch:
+            self.flush()
+        elif self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(
+                self.max_wait, self.flush
+            )
+        return await future
+
+    def flush(self) -> None:
+        """Send the waiting texts"""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending, self.pending_texts = self.pending, [], 0
+        if batch:
+            asyncio.ensure_future(self.send(batch))
+
+    async def send(self, batch: list) -> None:
+        """Embed the texts of a batch with one request and resolve the waiting calls"""
+        # Concurrent requests for the same query embed it once
+        texts = list(
+            dict.fromkeys(text for call_texts, _ in batch for text in call_texts)
+        )
+        self.requests += 1
+        self.texts += len(texts)
+        try:
+            vectors = await self.embedder.embed(texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        rows = {text: i for i, text in enumerate(texts)}
+        for call_texts, future in batch:
+            if not future.done():
+                future.set_result(vectors[[rows[text] for text in call_texts]])
+
+
+class CachedEmbedder:
+    """Wraps an embedder: texts are deduplicated, looked up in the cache and only the misses are embedded, in batches"""
+
+    def __init__(self, embedder, cache: EmbeddingCache, batch_size: int = 512) -> None:
+        """
+        @parameter embedder : OpenAIEmbedder | HashEmbedder - Embedder with an async embed(texts) and a model name
+        @parameter cache : EmbeddingCache - On-disk cache
+        @parameter batch_size : int - Texts per embedding request
+        """
+        self.embedder = embedder
+        self.cache = cache
+        self.batch_size = batch_size
+        self.model = embedder.model
+
+    async def embed(self, texts: list) -> np.ndarray:
+        """Embed a list of texts
+        @parameter texts : list - Texts to embed
+        @returns np.ndarray - float32 matrix with one row per text
+        """
+        keys = [EmbeddingCache.key(self.model, text) for text in texts]
+        vectors = self.cache.get_many(list(set(keys)))
+
+        missing = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        missing_keys = list(missing)
+        for start in range(0, len(missing_keys), self.batch_size):
+            batch = missing_keys[start : start + self.batch_size]
+            embedded = await self.embedder.embed([missing[key] for key in batch])
+            new_vectors = dict(zip(batch, embedded))
+            self.cache.put_many(new_vectors)
+            vectors.update(new_vectors)
+
+        return np.array([vectors[key] for key in keys], dtype=np.float32)
+
+
+def camel_case_to_lower(name: str) -> str:
+    """Split a camel case name into lower case words, e.g. contentHash -> content hash"""
+    return re.sub(r"(?<=[a-z0-9])(?=[A-Z])", " ", name).lower()
+
+
+def vectorized_text(class_obj: dict, properties: dict) -> str:
+    """Build the text Weaviate's text2vec-openai module would embed for an object: the class name and the
+    properties that aren't skipped in alphabetical order, with their name if vectorizePropertyName is set, lower cased
+    @parameter class_obj : dict - Weaviate class definition
+    @parameter properties : dict - Properties of the object
+    @returns str - Text to embed
+    """
+    class_config = class_obj.get("moduleConfig", {}).get("text2vec-openai", {})
+    parts = []
+    if class_config.get("vectorizeClassName", True):
+        parts.append(camel_case_to_lower(class_obj["class"]))
+
+    for prop in sorted(class_obj["properties"], key=lambda prop: prop["name"]):
+        config = prop.get("moduleConfig", {}).get("text2vec-openai", {})
+        value = properties.get(prop["name"])
+        if config.get("skip", False) or not prop["dataType"][0].startswith("text"):
+            continue
+        for text in value if isinstance(value, list) else [value]:
+            if not isinstance(text, str) or not text:
+                continue
+            if config.get("vectorizePropertyName", False):
+                parts.append(f"{camel_case_to_lower(prop['name'])} {text.lower()}")
+            else:
+                parts.append(text.lower())
+    return " ".join(parts)
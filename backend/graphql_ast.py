@@ -0,0 +1,240 @@
+import json
+import re
+
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+
+class GraphQLSyntaxError(ValueError):
+    """Raised when a query can't be parsed"""
+
+
+@dataclass
+class Enum:
+    """Enum value such as Equal or asc, serialized without quotes"""
+
+    name: str
+
+
+@dataclass
+class Field:
+    """Field of a selection set with its arguments and optional sub-selection"""
+
+    name: str
+    arguments: List[Tuple[str, object]] = field(default_factory=list)
+    selections: Optional[List["Field"]] = None
+
+    def get_argument(self, name: str):
+        """Return the value of an argument, None if it doesn't exist"""
+        for argument_name, value in self.arguments:
+            if argument_name == name:
+                return value
+        return None
+
+    def set_argument(self, name: str, value, first: bool = False) -> None:
+        """Replace the value of an argument or add it (at the front if first is set)"""
+        for i, (argument_name, _) in enumerate(self.arguments):
+            if argument_name == name:
+                self.arguments[i] = (name, value)
+                return
+        if first:
+            self.arguments.insert(0, (name, value))
+        else:
+            self.arguments.append((name, value))
+
+    def get_selection(self, name: str) -> Optional["Field"]:
+        """Return a sub-field by name, None if it isn't selected"""
+        for selection in self.selections or []:
+            if selection.name == name:
+                return selection
+        return None
+
+
+# Block strings, strings, names, numbers, spreads, comments and single punctuators; whitespace and commas are insignificant
+TOKEN_PATTERN = re.compile(
+    r'"""(?:\\"""|(?!""")[\s\S])*"""|"(?:\\.|[^"\\\n])*"|[_A-Za-z]\w*'
+    r"|-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?|\.\.\.|#[^\n]*|[^\s,]"
+)
+NAME_START = set("_abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ")
+NUMBER_START = set("-0123456789")
+
+
+def tokenize(query: str) -> list:
+    """Split a GraphQL query into tokens, whitespace, commas and comments are dropped
+    @parameter query : str - GraphQL query
+    @returns list - Tokens as strings, the kind is given by their first character
+    """
+    return [token for token in TOKEN_PATTERN.findall(query) if token[0] != "#"]
+
+
+class Parser:
+    """Recursive descent parser for the query subset of GraphQL used with Weaviate (no fragments or variables)"""
+
+    def __init__(self, query: str) -> None:
+        self.tokens = tokenize(query) + [""]
+        self.position = 0
+
+    def next(self) -> str:
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def expect(self, text: str) -> None:
+        token = self.next()
+        if token != text:
+            raise GraphQLSyntaxError(
+                f"Expected {text!r} but got {token or 'end of query'!r}"
+            )
+
+    def name(self) -> str:
+        token = self.next()
+        if not token or token[0] not in NAME_START:
+            raise GraphQLSyntaxError(
+                f"Expected a name but got {token or 'end of query'!r}"
+            )
+        return token
+
+    def parse_document(self) -> List[Field]:
+        # Optional operation type and name: query Name { ... }
+        if self.tokens[self.position] == "query":
+            self.position += 1
+            if self.tokens[self.position] != "{":
+                self.name()
+        selections = self.parse_selection_set()
+        if self.tokens[self.position]:
+            raise GraphQLSyntaxError(
+                f"Unexpected {self.tokens[self.position]!r} after the query"
+            )
+        return selections
+
+    def parse_selection_set(self) -> List[Field]:
+        self.expect("{")
+        selections = []
+        while self.tokens[self.position] != "}":
+            selections.append(self.parse_field())
+        self.position += 1
+        return selections
+
+    def parse_field(self) -> Field:
+        node = Field(self.name())
+        if self.tokens[self.position] == "(":
+            self.position += 1
+            while self.tokens[self.position] != ")":
+                node.arguments.append(self.parse_argument())
+            self.position += 1
+        if self.tokens[self.position] == "{":
+            node.selections = self.parse_selection_set()
+        return node
+
+    def parse_argument(self) -> Tuple[str, object]:
+        name = self.name()
+        self.expect(":")
+        return name, self.parse_value()
+
+    def parse_value(self):
+        token = self.next()
+        if not token:
+            raise GraphQLSyntaxError("Unexpected end of query")
+
+        first = token[0]
+        if token.startswith('"""') and len(token) >= 6:
+            return token[3:-3].replace('\\"""', '"""')
+        if first == '"':
+            try:
+                return json.loads(token)
+            except ValueError:
+                raise GraphQLSyntaxError(f"Invalid string {token}") from None
+        if first in NUMBER_START and token != "-":
+            return float(token) if any(c in token for c in ".eE") else int(token)
+        if first in NAME_START:
+            if token in ("true", "false"):
+                return token == "true"
+            if token == "null":
+                return None
+            return Enum(token)
+        if token == "[":
+            values = []
+            while self.tokens[self.position] != "]":
+                values.append(self.parse_value())
+            self.position += 1
+            return values
+        if token == "{":
+            values_by_name = {}
+            while self.tokens[self.position] != "}":
+                name, value = self.parse_argument()
+                values_by_name[name] = value
+            self.position += 1
+            return values_by_name
+        raise GraphQLSyntaxError(f"Unexpected {token!r}")
+
+
+def parse(query: str) -> List[Field]:
+    """Parse a GraphQL query into its top level selection set
+    @parameter query : str - GraphQL query
+    @returns list - Top level fields (e.g. [Field("Get")])
+    """
+    return Parser(query).parse_document()
+
+
+def serialize_value(value) -> str:
+    """Serialize an argument value to GraphQL"""
+    if isinstance(value, Enum):
+        return value.name
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if value is None:
+        return "null"
+    if isinstance(value, str):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, list):
+        return "[" + ", ".join(serialize_value(v) for v in value) + "]"
+    if isinstance(value, dict):
+        return (
+            "{"
+            + ", ".join(f"{k}: {serialize_value(v)}" for k, v in value.items())
+            + "}"
+        )
+    raise TypeError(f"Can't serialize {value!r}")
+
+
+def serialize(selections: List[Field], indent: int = 0) -> str:
+    """Serialize a selection set back to an indented GraphQL query
+    @parameter selections : list - Fields returned by parse()
+    @parameter indent : int - Indentation level
+    @returns str - GraphQL query
+    """
+    padding = "  " * indent
+    lines = ["{"]
+    for node in selections:
+        line = padding + "  " + node.name
+        if node.arguments:
+            arguments = [
+                f"{padding}    {name}: {serialize_value(value)}"
+                for name, value in node.arguments
+            ]
+            line += "(\n" + "\n".join(arguments) + "\n" + padding + "  )"
+        if node.selections is not None:
+            line += " " + serialize(node.selections, indent + 1)
+        lines.append(line)
+    lines.append(padding + "}")
+    return "\n".join(lines)
+
+
+def collect_paths(value) -> list:
+    """Return every property name used in a "path" of a where or sort argument, including nested operands
+    @parameter value : object - Argument value
+    @returns list - Property names
+    """
+    paths: list = []
+    if isinstance(value, dict):
+        for key, inner in value.items():
+            if key == "path" and isinstance(inner, list):
+                paths.extend(p for p in inner if isinstance(p, str))
+            else:
+                paths.extend(collect_paths(inner))
+    elif isinstance(value, list):
+        for inner in value:
+            paths.extend(collect_paths(inner))
+    return paths
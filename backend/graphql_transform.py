@@ -0,0 +1,175 @@
+import numpy as np
+
+from functools import lru_cache
+from wasabi import msg  # type: ignore[import]
+
+from graphql_ast import Field, GraphQLSyntaxError, collect_paths, parse, serialize
+
+
+def modify_graphql(graphQuery: str, natural_query: str, fields: list) -> str:
+    """Uses the generated GraphQL query to generate the query for creating the product summary
+    @parameter natural_query : str - Natural Query of the user
+    @parameter graphQuery : str - Generated GraphQL query
+    @parameter fields : list - List of strings for every data field
+    @returns str - GraphQL query with the generate module
+    """
+    return transform_graphql(graphQuery, natural_query, tuple(fields))
+
+
+@lru_cache(maxsize=1024)
+def transform_graphql(graphQuery: str, natural_query: str, fields: tuple) -> str:
+    """Parse the generated query and rewrite it in one pass over the AST, results are cached per input like the other rewrites of this module
+    @parameter graphQuery : str - Generated GraphQL query
+    @parameter natural_query : str - Natural Query of the user
+    @parameter fields : tuple - Data fields that can be removed from the selection
+    @returns str - GraphQL query with the generate module, the unchanged query if it can't be parsed
+    """
+    try:
+        document = parse(graphQuery)
+    except GraphQLSyntaxError as e:
+        msg.warn(f"Generated query could not be parsed: {str(e)}")
+        return graphQuery
+
+    # Fields to keep
+    fields_to_keep = {"summary", "description", "ingredients"}
+
+    for get in document:
+        for class_field in get.selections or []:
+            # Keep fields used in the 'where' and 'sort' clause
+            kept = fields_to_keep.union(
+                collect_paths(class_field.get_argument("where")),
+                collect_paths(class_field.get_argument("sort")),
+            )
+
+            # Remove unwanted fields
+            class_field.selections = [
+                selection
+                for selection in class_field.selections or []
+                if selection.name not in fields or selection.name in kept
+            ]
+
+            # Ensure 'limit' exists and is not greater than 5
+            limit = class_field.get_argument("limit")
+            if not isinstance(limit, int) or limit > 5:
+                class_field.set_argument("limit", 5, first=limit is None)
+
+            # Replace '_additional' with the generate module, id and distance
+            task = f"Summarize products based on this query: {natural_query}"
+            additional = Field(
+                "_additional",
+                selections=[
+                    Field(
+                        "generate",
+                        arguments=[("groupedResult", {"task": task})],
+                        selections=[Field("groupedResult"), Field("error")],
+                    ),
+                    Field("id"),
+                    Field("distance"),
+                ],
+            )
+            class_field.selections = [
+                selection
+                for selection in class_field.selections
+                if selection.name != "_additional"
+            ] + [additional]
+
+    return serialize(document)
+
+
+@lru_cache(maxsize=1024)
+def project_graphql(graphQuery: str, fields: tuple) -> str:
+    """Replace the selected properties of a validated query with a projection, '_additional' is kept
+    @parameter graphQuery : str - Validated GraphQL query
+    @parameter fields : tuple - Properties to select
+    @returns str - GraphQL query selecting only the given properties, the unchanged query if it can't be parsed
+    """
+    try:
+        document = parse(graphQuery)
+    except GraphQLSyntaxError as e:
+        msg.warn(f"Query could not be parsed for the projection: {str(e)}")
+        return graphQuery
+
+    for get in document:
+        for class_field in get.selections or []:
+            class_field.selections = [Field(name) for name in fields] + [
+                selection
+                for selection in class_field.selections or []
+                if selection.name == "_additional"
+            ]
+
+    return serialize(document)
+
+
+# nearText arguments that carry over to nearVector, moveTo and moveAwayFrom need Weaviate's vectorizer
+near_vector_arguments = {"distance", "certainty"}
+
+
+@lru_cache(maxsize=1024)
+def near_text_concepts(graphQuery: str) -> tuple:
+    """Return the nearText concepts of a validated query
+    @parameter graphQuery : str - Validated GraphQL query
+    @returns tuple - Distinct concepts in query order, empty if the query can't be parsed
+    """
+    try:
+        document = parse(graphQuery)
+    except GraphQLSyntaxError:
+        return ()
+
+    concepts: dict = {}
+    for get in document:
+        for class_field in get.selections or []:
+            near_text = class_field.get_argument("nearText")
+            if isinstance(near_text, dict) and isinstance(
+                near_text.get("concepts"), list
+            ):
+                concepts.update(
+                    dict.fromkeys(
+                        c for c in near_text["concepts"] if isinstance(c, str)
+                    )
+                )
+    return tuple(concepts)
+
+
+def near_vector_graphql(graphQuery: str, vectors: dict) -> str:
+    """Replace nearText with nearVector, the vector is the mean of the concept vectors like Weaviate combines them.
+    A nearText with moveTo, moveAwayFrom or a concept without a vector is left to Weaviate.
+    @parameter graphQuery : str - GraphQL query
+    @parameter vectors : dict - Vectors by concept
+    @returns str - GraphQL query with nearVector, the unchanged query if nothing was replaced
+    """
+    if not vectors:
+        return graphQuery
+    try:
+        document = parse(graphQuery)
+    except GraphQLSyntaxError:
+        return graphQuery
+
+    replaced = False
+    for get in document:
+        for class_field in get.selections or []:
+            near_text = class_field.get_argument("nearText")
+            if not isinstance(near_text, dict):
+                continue
+            concepts = near_text.get("concepts")
+            if (
+                not isinstance(concepts, list)
+                or not concepts
+                or not all(isinstance(c, str) and c in vectors for c in concepts)
+                or not set(near_text) <= near_vector_arguments | {"concepts"}
+            ):
+                continue
+
+            vector = np.mean([vectors[c] for c in concepts], axis=0)
+            near_vector = {"vector": [round(float(v), 6) for v in vector]}
+            near_vector.update(
+                (key, value)
+                for key, value in near_text.items()
+                if key in near_vector_arguments
+            )
+            class_field.arguments = [
+                ("nearVector", near_vector) if name == "nearText" else (name, value)
+                for name, value in class_field.arguments
+            ]
+            replaced = True
+
+    return serialize(document) if replaced else graphQuery
@@ -0,0 +1,278 @@
+import difflib
+import re
+
+from typing import List, Tuple
+
+from graphql_ast import Enum, Field, GraphQLSyntaxError, parse, serialize
+from schema import product_class, public_properties
+
+# Arguments Weaviate accepts on a class in a Get query
+class_arguments = {
+    "nearText",
+    "nearVector",
+    "nearObject",
+    "hybrid",
+    "bm25",
+    "where",
+    "sort",
+    "limit",
+    "offset",
+    "after",
+    "autocut",
+    "group",
+    "groupBy",
+}
+
+additional_fields = {
+    "id",
+    "distance",
+    "certainty",
+    "score",
+    "explainScore",
+    "vector",
+    "creationTimeUnix",
+    "lastUpdateTimeUnix",
+    "generate",
+}
+
+where_operators = {
+    "And",
+    "Or",
+    "Equal",
+    "NotEqual",
+    "GreaterThan",
+    "GreaterThanEqual",
+    "LessThan",
+    "LessThanEqual",
+    "Like",
+    "IsNull",
+    "ContainsAny",
+    "ContainsAll",
+}
+
+CODE_FENCE_PATTERN = re.compile(r"^\s*```[a-zA-Z]*\s*|\s*```\s*$")
+
+
+def closest(name: str, candidates, cutoff: float = 0.75):
+    """Return the candidate closest to name (ignoring case), None if nothing is close enough"""
+    lowered = {candidate.lower(): candidate for candidate in candidates}
+    if name.lower() in lowered:
+        return lowered[name.lower()]
+    matches = difflib.get_close_matches(name.lower(), list(lowered), 1, cutoff)
+    return lowered[matches[0]] if matches else None
+
+
+class GraphQLValidator:
+    """Validates a generated Get query against a class schema and repairs trivial mistakes.
+    Everything that can't be repaired is reported as an error, so it can be sent back to the LLM without a Weaviate round trip.
+    """
+
+    def __init__(self, class_obj: dict = product_class) -> None:
+        self.class_name = class_obj["class"]
+        self.properties = {
+            prop["name"]: prop["dataType"][0] for prop in public_properties(class_obj)
+        }
+
+    def validate(self, query: str) -> Tuple[str, List[str]]:
+        """Validate and normalize a query
+        @parameter query : str - GraphQL query generated by the LLM
+        @returns (str, list) - Normalized query and the errors that couldn't be repaired
+        """
+        query = CODE_FENCE_PATTERN.sub("", query)
+        try:
+            document = parse(query)
+        except GraphQLSyntaxError as e:
+            # Truncated output often only misses the closing braces
+            missing = query.count("{") - query.count("}")
+            try:
+                if missing <= 0:
+                    raise
+                document = parse(query + "}" * missing)
+            except GraphQLSyntaxError:
+                return query, [f"Syntax error: {str(e)}"]
+
+        errors: List[str] = []
+        if len(document) != 1 or document[0].name != "Get":
+            if len(document) == 1 and document[0].name.lower() == "get":
+                document[0].name = "Get"
+            else:
+                return query, ["The query must contain exactly one Get block"]
+
+        get = document[0]
+        if not get.selections:
+            return query, [f"The Get block must select the {self.class_name} class"]
+
+        for class_field in get.selections:
+            if class_field.name != self.class_name:
+                if closest(class_field.name, [self.class_name], 0.6):
+                    class_field.name = self.class_name
+                else:
+                    errors.append(f"Unknown class {class_field.name}")
+                    continue
+            self.validate_class(class_field, errors)
+
+        return serialize(document), errors
+
+    def validate_class(self, class_field: Field, errors: List[str]) -> None:
+        arguments = []
+        for name, value in class_field.arguments:
+            argument = closest(name, class_arguments, 0.8)
+            if argument is None:
+                errors.append(f"Unknown argument {name} on {self.class_name}")
+                continue
+            arguments.append((argument, value))
+        class_field.arguments = arguments
+
+        near_text = class_field.get_argument("nearText")
+        if isinstance(near_text, dict) and isinstance(near_text.get("concepts"), str):
+            near_text["concepts"] = [near_text["concepts"]]
+
+        limit = class_field.get_argument("limit")
+        if isinstance(limit, str) and limit.strip().isdigit():
+            class_field.set_argument("limit", int(limit))
+        elif limit is not None and not isinstance(limit, int):
+            errors.append(f"limit must be an integer, got {limit!r}")
+
+        where = class_field.get_argument("where")
+        if where is not None:
+            self.validate_where(where, errors)
+
+        sort = class_field.get_argument("sort")
+        if sort is not None:
+            if isinstance(sort, dict):
+                sort = [sort]
+                class_field.set_argument("sort", sort)
+            for clause in sort:
+                self.validate_sort(clause, errors)
+
+        selections = []
+        for selection in class_field.selections or []:
+            if selection.name == "_additional":
+                selection.selections = [
+                    additional
+                    for additional in selection.selections or []
+                    if closest(additional.name, additional_fields, 0.8)
+                ]
+                for additional in selection.selections:
+                    additional.name = closest(additional.name, additional_fields, 0.8)
+                selections.append(selection)
+                continue
+            name = self.property_name(selection.name)
+            # Unknown fields are dropped, they can't contribute to the results
+            if name is not None:
+                selection.name = name
+                selections.append(selection)
+        class_field.selections = selections
+
+        if not class_field.selections:
+            errors.append(f"No valid fields selected on {self.class_name}")
+            return
+
+        # Cached results reference the products by id
+        additional_field = class_field.get_selection("_additional")
+        if additional_field is None:
+            additional_field = Field("_additional", selections=[])
+            class_field.selections.append(additional_field)
+        if additional_field.get_selection("id") is None:
+            additional_field.selections = (additional_field.selections or []) + [
+                Field("id")
+            ]
+
+    def validate_where(self, where, errors: List[str]) -> None:
+        if not isinstance(where, dict):
+            errors.append("where must be an object")
+            return
+
+        operator = where.get("operator")
+        operator_name = operator.name if isinstance(operator, Enum) else operator
+        if not isinstance(operator_name, str) or not closest(
+            operator_name, where_operators, 0.8
+        ):
+            errors.append(f"Unknown where operator {operator_name!r}")
+            return
+        operator_name = closest(operator_name, where_operators, 0.8)
+        where["operator"] = Enum(operator_name)
+
+        if operator_name in ("And", "Or"):
+            operands = where.get("operands")
+            if not isinstance(operands, list) or not operands:
+                errors.append(f"{operator_name} needs a list of operands")
+                return
+            for operand in operands:
+                self.validate_where(operand, errors)
+            return
+
+        path = where.get("path")
+        if isinstance(path, str):
+            path = [path]
+        if not isinstance(path, list) or not path:
+            errors.append("where needs a path")
+            return
+        property_name = self.property_name(str(path[0]))
+        if property_name is None:
+            errors.append(f"Unknown property {path[0]!r} in where path")
+            return
+        where["path"] = [property_name] + path[1:]
+        self.normalize_value(where, property_name, errors)
+
+    def normalize_value(self, where: dict, property_name: str, errors: List[str]):
+        """Make the value key match the data type of the filtered property"""
+        keys = [key for key in where if key.startswith("value")]
+        if len(keys) != 1:
+            if where["operator"].name != "IsNull":
+                errors.append(f"where on {property_name} needs exactly one value")
+            return
+
+        key = keys[0]
+        value = where.pop(key)
+        data_type = self.properties[property_name].rstrip("[]")
+        if data_type == "number":
+            try:
+                where["valueNumber"] = float(value)
+            except (TypeError, ValueError):
+                errors.append(f"{property_name} is a number, got {value!r}")
+                where[key] = value
+        elif data_type == "text":
+            # valueString is deprecated for text properties but still accepted
+            text_key = key if key in ("valueText", "valueString") else "valueText"
+            where[text_key] = value if isinstance(value, str) else str(value)
+        else:
+            where[key] = value
+
+    def validate_sort(self, clause, errors: List[str]) -> None:
+        if not isinstance(clause, dict):
+            errors.append("sort clauses must be objects")
+            return
+        path = clause.get("path")
+        if isinstance(path, str):
+            path = [path]
+        if not isinstance(path, list) or not path:
+            errors.append("sort needs a path")
+            return
+        property_name = self.property_name(str(path[0]))
+        if property_name is None:
+            errors.append(f"Unknown property {path[0]!r} in sort path")
+            return
+        clause["path"] = [property_name]
+
+        order = clause.get("order", Enum("asc"))
+        order_name = order.name if isinstance(order, Enum) else str(order)
+        if order_name.lower() not in ("asc", "desc"):
+            errors.append(f"Unknown sort order {order_name!r}")
+            return
+        clause["order"] = Enum(order_name.lower())
+
+    def property_name(self, name: str):
+        """Return the schema property matching name, allowing for case and small typos"""
+        return closest(name, self.properties, 0.8)
+
+
+validator = GraphQLValidator()
+
+
+def validate_graphql(query: str) -> Tuple[str, List[str]]:
+    """Validate a generated query against the Product schema and repair trivial mistakes
+    @parameter query : str - GraphQL query generated by the LLM
+    @returns (str, list) - Normalized query and the errors that couldn't be repaired
+    """
+    return validator.validate(query)
@@ -1,17 +1,352 @@
 import weaviate  # type: ignore[import]
+import asyncio
+import hashlib
 import json
+import re
+import threading
+import time
 import typer
 import os
+import openai
+import numpy as np
 
 from pathlib import Path
+from typing import Iterable, Iterator, Optional, Sequence, Tuple
 from wasabi import msg  # type: ignore[import]
+from weaviate.batch.crud_batch import WeaviateErrorRetryConf  # type: ignore[import]
+from weaviate.util import generate_uuid5  # type: ignore[import]
 
 from dotenv import load_dotenv
 
+from embeddings import (
+    CachedEmbedder,
+    EmbeddingCache,
+    HashEmbedder,
+    OpenAIEmbedder,
+    vectorized_text,
+)
+from query_cache import bump_cache_generation
+from schema import cached_result_class, product_class
+from vector_file import VectorFile
+
 load_dotenv()
 
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+def skip_whitespace(buffer: str, position: int) -> int:
+    """Return the position of the next character that isn't JSON whitespace"""
+    match = WHITESPACE.match(buffer, position)
+    return match.end() if match else position
+
+
+def read_products(
+    data_path: Path, chunk_size: int = 1 << 20
+) -> Iterator[Tuple[str, dict]]:
+    """Parse the dataset incrementally, only the products that are being imported are held in memory
+    @parameter data_path : Path - JSON object mapping product ids to products
+    @parameter chunk_size : int - Characters read at a time
+    @returns Iterator[(str, dict)] - Product id and product
+    """
+    decoder = json.JSONDecoder()
+    with open(data_path, "r") as reader:
+        buffer = ""
+        position = 0
+        started = False
+        while True:
+            # Keep the unparsed rest and read the next chunk
+            chunk = reader.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+
+            while True:
+                start = skip_whitespace(buffer, position)
+                if start == len(buffer):
+                    break
+                if not started:
+                    if buffer[start] != "{":
+                        raise ValueError("The dataset must be a JSON object")
+                    position = start + 1
+                    started = True
+                    continue
+                if buffer[start] == "}":
+                    return
+                if buffer[start] == ",":
+                    start = skip_whitespace(buffer, start + 1)
+
+                # A pair that runs past the end of the buffer is parsed again after the next read
+                try:
+                    key, end = decoder.raw_decode(buffer, start)
+                    end = skip_whitespace(buffer, end)
+                    if end < len(buffer) and buffer[end] != ":":
+                        raise ValueError(f"Expected ':' after product id {key}")
+                    value, end = decoder.raw_decode(
+                        buffer, skip_whitespace(buffer, end + 1)
+                    )
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    break
+                # The pair is only complete once the next separator was read, a number could continue
+                separator = skip_whitespace(buffer, end)
+                if buffer[separator : separator + 1] not in (",", "}"):
+                    if eof:
+                        raise ValueError(f"Expected ',' or '}}' after product {key}")
+                    break
+
+                yield key, value
+                position = end
+
+            if eof:
+                raise ValueError("The dataset ended before its closing brace")
+
+
+def product_properties(product: dict) -> dict:
+    """Map a product of the dataset to the properties of the Product class
+    @parameter product : dict - Product from the dataset
+    @returns dict - Product properties
+    """
+    reviews = product.get("reviews", ["Example review"])
+    return {
+        "name": product.get("name", "Productname"),
+        "brand": product.get("brand", "Productbrand"),
+        "ingredients": product.get("ingredients", "Product ingredients"),
+        "reviews": reviews,
+        "reviewCount": len(reviews),
+        "rating": product.get("rating", 3.0),
+        "image": product.get(
+            "img",
+            "https://en.wikipedia.org/wiki/Rickrolling#/media/File:RickRoll.png",
+        ),
+        "effects": product.get("effects", "Good for something"),
+        "description": product.get("description", "Product description"),
+        "summary": product.get("summary", "Review summary"),
+    }
+
+
+def product_object(
+    product_id: str, product: dict, vectors: Optional[VectorFile] = None
+) -> Tuple[str, dict, Optional[Sequence]]:
+    """Build the Weaviate object of a product, the UUID is derived from the product id so re-imports update the same object
+    @parameter product_id : str - Key of the product in the dataset
+    @parameter product : dict - Product from the dataset
+    @parameter vectors : VectorFile - Vectors of products without a "vector" key
+    @returns (str, dict, list | np.ndarray | None) - UUID, properties including the content hash and vector
+    """
+    properties = product_properties(product)
+    vector = product.get("vector")
+    if vector is None and vectors is not None:
+        vector = vectors.get(product_id)
+
+    # The vector is hashed as float32 so JSON and binary vectors give the same hash
+    content = hashlib.sha256(json.dumps(properties, sort_keys=True).encode())
+    if vector is not None:
+        content.update(np.asarray(vector, dtype=np.float32).tobytes())
+    properties["contentHash"] = content.hexdigest()
+    return generate_uuid5(product_id, "Product"), properties, vector
+
+
+def embed_products(
+    products: Iterable[Tuple[str, dict]],
+    embedder: CachedEmbedder,
+    vectors: Optional[VectorFile] = None,
+    chunk_size: int = 2048,
+) -> Iterator[Tuple[str, dict]]:
+    """Add a "vector" to every product that doesn't have one, embedding the text Weaviate would vectorize
+    @parameter products : Iterable[(str, dict)] - Product ids and products, e.g. from read_products()
+    @parameter embedder : CachedEmbedder - Embedder with the on-disk cache
+    @parameter vectors : VectorFile - Vectors of products without a "vector" key, these aren't embedded
+    @parameter chunk_size : int - Products embedded together
+    @returns Iterator[(str, dict)] - Product ids and products with vectors
+    """
+    loop = asyncio.new_event_loop()
+    products = iter(products)
+    while True:
+        chunk = [product for _, product in zip(range(chunk_size), products)]
+        if not chunk:
+            break
+        missing = [
+            product
+            for product_id, product in chunk
+            if "vector" not in product
+            and (vectors is None or vectors.get(product_id) is None)
+        ]
+        if missing:
+            texts = [
+                vectorized_text(product_class, product_properties(product))
+                for product in missing
+            ]
+            for product, vector in zip(
+                missing, loop.run_until_complete(embedder.embed(texts))
+            ):
+                product["vector"] = vector
+        yield from chunk
+    loop.close()
+
+
+def import_products(
+    client: weaviate.Client,
+    objects: Iterable[Tuple[str, dict, Optional[Sequence]]],
+    batch_size: int = 100,
+    num_workers: int = 4,
+    dynamic: bool = True,
+    retries: int = 3,
+    report_every: int = 10000,
+) -> dict:
+    """Import products with concurrent batch requests.
+    The batch waits for its workers once num_workers requests are in flight, with dynamic batching the batch size follows the time Weaviate takes per batch.
+    @parameter client : weaviate.Client - Connected client
+    @parameter objects : Iterable[(str, dict, list | np.ndarray | None)] - UUIDs, properties and vectors, see product_object()
+    @parameter batch_size : int - Objects per batch request (initial size with dynamic batching)
+    @parameter num_workers : int - Batch requests in flight
+    @parameter dynamic : bool - Adapt the batch size to the server's throughput
+    @parameter retries : int - How often objects rejected by Weaviate are sent again
+    @parameter report_every : int - Log progress every n products
+    @returns dict - Imported and failed objects, seconds and objects per second
+    """
+    stats = {"imported": 0, "failed": 0}
+    lock = threading.Lock()
+
+    def count_results(results: list) -> None:
+        with lock:
+            for result in results or []:
+                errors = (result.get("result") or {}).get("errors")
+                if errors:
+                    stats["failed"] += 1
+                    msg.fail(f"Product could not be imported: {errors}")
+                else:
+                    stats["imported"] += 1
+
+    client.batch.configure(
+        batch_size=batch_size,
+        dynamic=dynamic,
+        num_workers=num_workers,
+        weaviate_error_retries=(
+            WeaviateErrorRetryConf(number_retries=retries) if retries > 0 else None
+        ),
+        callback=count_results,
+    )
+
+    start = time.perf_counter()
+    with client.batch as batch:
+        for i, (uuid, properties, vector) in enumerate(objects):
+            # Objects with an existing UUID are replaced
+            batch.add_data_object(properties, "Product", uuid=uuid, vector=vector)
+            if (i + 1) % report_every == 0:
+                seconds = time.perf_counter() - start
+                msg.info(
+                    f"{i + 1} products sent, {stats['imported'] / seconds:.0f} objects/s"
+                )
+    seconds = time.perf_counter() - start
+
+    return dict(
+        stats,
+        seconds=round(seconds, 3),
+        objects_per_second=round(stats["imported"] / seconds, 1) if seconds else 0.0,
+    )
+
+
+def fetch_content_hashes(client: weaviate.Client, page_size: int = 1000) -> dict:
+    """Page through all products and collect their content hashes
+    @parameter client : weaviate.Client - Connected client
+    @parameter page_size : int - Products per request
+    @returns dict - Content hash by UUID, None for objects imported without a hash
+    """
+    hashes: dict = {}
+    after = None
+    while True:
+        query = (
+            client.query.get("Product", ["contentHash"])
+            .with_additional(["id"])
+            .with_limit(page_size)
+        )
+        if after:
+            query = query.with_after(after)
+        results = query.do()
+        if "errors" in results:
+            raise Exception(results["errors"])
+        objects = results["data"]["Get"]["Product"]
+        for obj in objects:
+            hashes[obj["_additional"]["id"]] = obj.get("contentHash")
+        if len(objects) < page_size:
+            return hashes
+        after = objects[-1]["_additional"]["id"]
+
 
-def main(data_path: Path) -> None:
+def sync_products(
+    client: weaviate.Client,
+    products: Iterable[Tuple[str, dict]],
+    vectors: Optional[VectorFile] = None,
+    **batch_options,
+) -> dict:
+    """Bring the Product class in line with the dataset: new and changed products are upserted, removed products are deleted and unchanged products are skipped
+    @parameter client : weaviate.Client - Connected client
+    @parameter products : Iterable[(str, dict)] - Product ids and products, e.g. from read_products()
+    @parameter vectors : VectorFile - Vectors of products without a "vector" key
+    @parameter batch_options : dict - Options passed to import_products()
+    @returns dict - Import statistics with the number of created, updated, unchanged and deleted products
+    """
+    existing = fetch_content_hashes(client)
+    msg.info(f"{len(existing)} products in Weaviate")
+    counts = {"created": 0, "updated": 0, "unchanged": 0}
+
+    def changed_objects() -> Iterator[Tuple[str, dict, Optional[Sequence]]]:
+        for product_id, product in products:
+            uuid, properties, vector = product_object(product_id, product, vectors)
+            if uuid not in existing:
+                counts["created"] += 1
+            elif existing.pop(uuid) == properties["contentHash"]:
+                counts["unchanged"] += 1
+                continue
+            else:
+                counts["updated"] += 1
+            yield uuid, properties, vector
+
+    stats = import_products(client, changed_objects(), **batch_options)
+
+    # Whatever wasn't in the dataset has been removed from it
+    for uuid in existing:
+        client.data_object.delete(uuid, class_name="Product")
+
+    return dict(stats, **counts, deleted=len(existing))
+
+
+def clear_cached_results(client: weaviate.Client) -> None:
+    """Delete all CachedResult objects but keep the class, so running API workers don't see it missing
+    @parameter client : weaviate.Client - Connected client
+    @returns None
+    """
+    while True:
+        result = client.batch.delete_objects(
+            "CachedResult",
+            where={"path": ["naturalQuery"], "operator": "Like", "valueText": "*"},
+        )
+        # A single request deletes at most QUERY_MAXIMUM_RESULTS objects
+        if result["results"]["matches"] == 0:
+            return
+        # Objects Weaviate fails to delete would match again on every pass
+        if result["results"]["successful"] == 0:
+            msg.warn(
+                f"Could not delete {result['results']['failed']} of "
+                f"{result['results']['matches']} cached results"
+            )
+            return
+
+
+def main(
+    data_path: Path,
+    vectors_path: Optional[Path] = None,
+    sync: bool = False,
+    embed: bool = False,
+    embedder: str = "openai",
+    embedding_cache: Path = Path("embedding_cache.sqlite"),
+    embed_batch_size: int = 512,
+    batch_size: int = 100,
+    num_workers: int = 4,
+    dynamic: bool = True,
+    retries: int = 3,
+) -> None:
     msg.divider("Starting data import")
 
     # Connect to Weaviate
@@ -34,228 +369,101 @@ def main(data_path: Path) -> None:
 
     msg.good("Client connected to Weaviate Instance")
 
-    # Data import, please see the README for the expected data format
-    data = None
-    try:
-        with open(data_path, "r") as reader:
-            data = json.load(reader)
-            msg.info("Data loaded.")
-    except Exception as e:
-        msg.fail("Data couldn't be imported!")
-        msg.info(e)
-        return
+    # Vectors converted to the binary format with convert_vectors.py
+    vectors = None
+    if vectors_path is not None:
+        vectors = VectorFile.load(vectors_path)
+        msg.info(f"Loaded {len(vectors)} vectors from {vectors_path}")
 
-    class_obj = {
-        "class": "Product",
-        "description": "Supplement products",
-        "properties": [
-            {
-                "dataType": ["text"],
-                "description": "The name of the product",
-                "name": "name",
-                "moduleConfig": {
-                    "text2vec-openai": {
-                        "skip": True,
-                        "vectorizePropertyName": False,
-                    }
-                },
-            },
-            {
-                "dataType": ["text"],
-                "description": "The brand of the product",
-                "name": "brand",
-                "moduleConfig": {
-                    "text2vec-openai": {
-                        "skip": True,
-                        "vectorizePropertyName": False,
-                    }
-                },
-            },
-            {
-                "dataType": ["text"],
-                "description": "The ingredients contained in the product.",
-                "name": "ingredients",
-                "moduleConfig": {
-                    "text2vec-openai": {
-                        "skip": False,
-                        "vectorizePropertyName": True,
-                    }
-                },
-            },
-            {
-                "dataType": ["text[]"],
-                "description": "Reviews about the product",
-                "name": "reviews",
-                "moduleConfig": {
-                    "text2vec-openai": {
-                        "skip": True,
-                        "vectorizePropertyName": False,
-                    }
-                },
-            },
-            {
-                "dataType": ["text"],
-                "description": "Image URL of the product",
-                "name": "image",
-                "moduleConfig": {
-                    "text2vec-openai": {
-                        "skip": True,
-                        "vectorizePropertyName": False,
-                    }
-                },
-            },
-            {
-                "dataType": ["number"],
-                "description": "The Rating of the product",
-                "name": "rating",
-                "moduleConfig": {
-                    "text2vec-openai": {
-                        "skip": True,
-                        "vectorizePropertyName": False,
-                    }
-                },
-            },
-            {
-                "dataType": ["text"],
-                "description": "The description of the product",
-                "name": "description",
-                "moduleConfig": {
-                    "text2vec-openai": {
-                        "skip": True,
-                        "vectorizePropertyName": False,
-                    }
-                },
-            },
-            {
-                "dataType": ["text"],
-                "description": "The summary of the reviews",
-                "name": "summary",
-                "moduleConfig": {
-                    "text2vec-openai": {
-                        "skip": False,
-                        "vectorizePropertyName": True,
-                    }
-                },
-            },
-            {
-                "dataType": ["text"],
-                "description": "The health effects of the product",
-                "name": "effects",
-                "moduleConfig": {
-                    "text2vec-openai": {
-                        "skip": False,
-                        "vectorizePropertyName": True,
-                    }
-                },
-            },
-        ],
-        "moduleConfig": {
-            "generative-openai": {"model": "gpt-3.5-turbo"},
-            "text2vec-openai": {"model": "ada", "modelVersion": "002", "type": "text"},
-        },
-        "vectorizer": "text2vec-openai",
+    products = read_products(data_path)
+    cache = None
+    if embed:
+        # Embed here instead of in Weaviate, so unchanged texts are never embedded twice
+        openai.api_key = openai_key
+        cache = EmbeddingCache(embedding_cache)
+        products = embed_products(
+            products,
+            CachedEmbedder(
+                HashEmbedder() if embedder == "hash" else OpenAIEmbedder(),
+                cache,
+                batch_size=embed_batch_size,
+            ),
+            vectors,
+        )
+
+    batch_options: dict = {
+        "batch_size": batch_size,
+        "num_workers": num_workers,
+        "dynamic": dynamic,
+        "retries": retries,
     }
 
     if not client.schema.exists("Product"):
-        client.schema.create_class(class_obj)
+        client.schema.create_class(product_class)
         msg.warn(f"Product class was created because it didn't exist.")
+    elif sync:
+        # Classes created by earlier versions miss newer properties such as contentHash and reviewCount
+        existing = {prop["name"] for prop in client.schema.get("Product")["properties"]}
+        for prop in product_class["properties"]:
+            if prop["name"] not in existing:
+                client.schema.property.create("Product", prop)
+                msg.info(f"Added the {prop['name']} property to the Product class")
     else:
         # WARNING THIS DELETES ALL PRODUCTS AND CREATES A NEW PRODUCT CLASS
         client.schema.delete_class("Product")
         msg.info(f"Product class was removed because it already exists")
-        client.schema.create_class(class_obj)
+        client.schema.create_class(product_class)
 
-    with client.batch as batch:
-        batch.batch_size = 100
-        for i, d in enumerate(data):
-            msg.info(f"({i+1}/{len(data)}) Importing Product {d}")
-
-            properties = {
-                "name": data[d].get("name", "Productname"),
-                "brand": data[d].get("brand", "Productbrand"),
-                "ingredients": data[d].get("ingredients", "Product ingredients"),
-                "reviews": data[d].get("reviews", ["Example review"]),
-                "rating": data[d].get("rating", 3.0),
-                "image": data[d].get(
-                    "img",
-                    "https://en.wikipedia.org/wiki/Rickrolling#/media/File:RickRoll.png",
+    # Data import, please see the README for the expected data format
+    try:
+        if sync:
+            stats = sync_products(client, products, vectors, **batch_options)
+            msg.info(
+                f"{stats['created']} created, {stats['updated']} updated, {stats['unchanged']} unchanged, {stats['deleted']} deleted"
+            )
+        else:
+            stats = import_products(
+                client,
+                (
+                    product_object(product_id, product, vectors)
+                    for product_id, product in products
                 ),
-                "effects": data[d].get("effects", "Good for something"),
-                "description": data[d].get("description", "Product description"),
-                "summary": data[d].get("summary", "Review summary"),
-            }
-
-            # Check if vector exists in dataset
-            if "vector" in data[d]:
-                client.batch.add_data_object(
-                    properties, "Product", vector=data[d]["vector"]
-                )
-            else:
-                client.batch.add_data_object(properties, "Product")
+                **batch_options,
+            )
+    except Exception as e:
+        msg.fail("Data couldn't be imported!")
+        msg.info(e)
+        return
+    finally:
+        if cache is not None:
+            msg.info(
+                f"Embedding cache: {cache.hits} hits, {cache.misses} texts embedded"
+            )
+            cache.close()
 
-    msg.good("Data imported")
+    msg.good(
+        f"Data imported: {stats['imported']} products, {stats['failed']} failed, {stats['objects_per_second']} objects/s"
+    )
     msg.divider("Starting to initialize Cache")
 
-    cache_obj = {
-        "class": "CachedResult",
-        "description": "Cached results",
-        "properties": [
-            {
-                "dataType": ["text"],
-                "description": "GraphQL Query",
-                "name": "graphQuery",
-                "moduleConfig": {
-                    "text2vec-openai": {
-                        "skip": True,
-                        "vectorizePropertyName": False,
-                    }
-                },
-            },
-            {
-                "dataType": ["text"],
-                "description": "Natural Language Query",
-                "name": "naturalQuery",
-                "moduleConfig": {
-                    "text2vec-openai": {
-                        "skip": False,
-                        "vectorizePropertyName": True,
-                    }
-                },
-            },
-            {
-                "dataType": ["text"],
-                "description": "Retrieved Products",
-                "name": "products",
-                "moduleConfig": {
-                    "text2vec-openai": {
-                        "skip": True,
-                        "vectorizePropertyName": False,
-                    }
-                },
-            },
-            {
-                "dataType": ["text"],
-                "description": "Generated Summary",
-                "name": "summary",
-                "moduleConfig": {
-                    "text2vec-openai": {
-                        "skip": True,
-                        "vectorizePropertyName": False,
-                    }
-                },
-            },
-        ],
-        "vectorizer": "text2vec-openai",
-    }
-
     if not client.schema.exists("CachedResult"):
-        client.schema.create_class(cache_obj)
+        client.schema.create_class(cached_result_class)
         msg.warn(f"CachedResult class was created because it didn't exist.")
+    elif sync:
+        # Cached results contain copies of the products, they are only stale if a product changed
+        if stats["created"] + stats["updated"] + stats["deleted"] == 0:
+            msg.good("No products changed, cache kept")
+            return
+        clear_cached_results(client)
+        msg.info(f"CachedResult objects were removed because products changed")
     else:
         # WARNING THIS DELETES ALL CACHED RESULTS AND CREATES A NEW CACHE CLASS
         client.schema.delete_class("CachedResult")
         msg.info(f"CachedResult class was removed because it already exists")
-        client.schema.create_class(cache_obj)
+        client.schema.create_class(cached_result_class)
+
+    # Invalidate the in-process caches of running API workers
+    bump_cache_generation()
 
     msg.good("Cache initialized")
 
@@ -0,0 +1,210 @@
+import json
+import re
+import time
+
+from typing import Optional
+
+# Phrases that ask for a rating sort, longest first so "lowest rated" wins over "lowest"
+sort_phrases = {
+    "lowest rated": "asc",
+    "worst rated": "asc",
+    "least rated": "asc",
+    "lowest rating": "asc",
+    "worst": "asc",
+    "highest rated": "desc",
+    "best rated": "desc",
+    "top rated": "desc",
+    "highest rating": "desc",
+    "best": "desc",
+}
+
+# Words that carry no concept, e.g. "which products are helpful for ..."
+filler_words = {
+    "a",
+    "an",
+    "the",
+    "which",
+    "what",
+    "show",
+    "me",
+    "find",
+    "give",
+    "i",
+    "need",
+    "want",
+    "looking",
+    "search",
+    "product",
+    "products",
+    "supplement",
+    "supplements",
+    "is",
+    "are",
+    "that",
+    "help",
+    "helps",
+    "helpful",
+    "good",
+    "for",
+    "with",
+    "from",
+    "by",
+    "of",
+    "brand",
+    "to",
+    "against",
+    "some",
+    "any",
+    "please",
+    "my",
+    "our",
+    "your",
+}
+
+# Words the template can't express, queries containing them go to the LLM
+unsupported_words = {
+    "not",
+    "no",
+    "without",
+    "except",
+    "or",
+    "above",
+    "below",
+    "over",
+    "under",
+    "more",
+    "less",
+    "than",
+    "cheaper",
+    "cheapest",
+    "price",
+    "between",
+    "reviews",
+    "review",
+    "ingredient",
+    "ingredients",
+    "containing",
+    "contains",
+    "rating",
+    "rated",
+}
+
+WORD_PATTERN = re.compile(r"[a-z0-9][a-z0-9'\-\.&]*")
+
+query_template = """{{
+  Get {{
+    Product(
+      {arguments}
+    ) {{
+      {fields}
+      _additional {{
+        id
+        distance
+      }}
+    }}
+  }}
+}}"""
+
+
+class IntentParser:
+    """Deterministic parser for the common query shapes: nearText, nearText with a brand filter and nearText with a rating sort.
+    Queries it doesn't fully understand return None and go to the LLM.
+    """
+
+    def __init__(self, fields: list, brands: Optional[list] = None) -> None:
+        self.fields = fields
+        self.brands: dict = {}
+        self.set_brands(brands or [])
+        self.hits = 0
+        self.misses = 0
+        self.seconds = 0.0
+
+    def set_brands(self, brands: list) -> None:
+        """Replace the brand index
+        @parameter brands : list - Brand names as stored in the Product class
+        @returns None
+        """
+        self.brands = {brand.lower(): brand for brand in brands if brand}
+        # Longest names first so "life extension" beats "life"
+        alternatives = "|".join(
+            re.escape(brand) for brand in sorted(self.brands, key=len, reverse=True)
+        )
+        # Any mention of a brand name, and a mention marked as a brand by quotes, "from", "by" or "brand"
+        self.brand_pattern = (
+            re.compile(rf"(?<![\w])({alternatives})(?![\w])") if alternatives else None
+        )
+        self.marked_brand_pattern = (
+            re.compile(rf"(?:\b(?:from|by|brand)\s+\"?|\")({alternatives})\"?(?![\w])")
+            if alternatives
+            else None
+        )
+
+    def parse(self, natural_query: str) -> Optional[str]:
+        """Build a GraphQL query for a normalized natural language query
+        @parameter natural_query : str - Lower case natural language query
+        @returns str | None - GraphQL query, None if the query needs the LLM
+        """
+        start = time.perf_counter()
+        query = self.build(natural_query)
+        self.seconds += time.perf_counter() - start
+        if query is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return query
+
+    def build(self, natural_query: str) -> Optional[str]:
+        text = natural_query.lower()
+        arguments = []
+
+        brand = None
+        if self.brand_pattern is not None and self.marked_brand_pattern is not None:
+            brand_matches = self.marked_brand_pattern.findall(text)
+            if len(set(brand_matches)) > 1:
+                return None
+            if brand_matches:
+                brand = self.brands[brand_matches[0]]
+                text = self.marked_brand_pattern.sub(" ", text)
+            # A brand name that isn't marked as one may be part of the concept, e.g. "pure vegan protein"
+            if self.brand_pattern.search(text):
+                return None
+
+        order = None
+        for phrase, phrase_order in sort_phrases.items():
+            if re.search(rf"\b{phrase}\b", text):
+                order = phrase_order
+                text = re.sub(rf"\b{phrase}\b", " ", text)
+                break
+
+        words = WORD_PATTERN.findall(text.replace('"', " "))
+        if any(word in unsupported_words or word.isdigit() for word in words):
+            return None
+        concepts = " ".join(word for word in words if word not in filler_words)
+        if not concepts:
+            return None
+
+        arguments.append(f'nearText: {{concepts: ["{concepts}"]}}')
+        if brand is not None:
+            arguments.append(
+                f'where: {{path: ["brand"], operator: Equal, valueText: {json.dumps(brand)}}}'
+            )
+        if order is not None:
+            arguments.append(f'sort: [{{path: ["rating"], order: {order}}}]')
+
+        return query_template.format(
+            arguments="\n      ".join(arguments),
+            fields="\n      ".join(self.fields),
+        )
+
+    def stats(self) -> dict:
+        """Return hit rate and parse latency of the fast path
+        @returns dict - Fast path statistics
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "avg_parse_ms": round(self.seconds / total * 1000, 4) if total else 0.0,
+            "brands": len(self.brands),
+        }
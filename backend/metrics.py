@@ -0,0 +1,146 @@
+import os
+import time
+
+from contextlib import contextmanager
+from typing import Awaitable, Iterator
+
+from prometheus_client import (  # type: ignore[import]
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from tracing import span
+
+# Set PROMETHEUS_MULTIPROC_DIR before the workers start to aggregate the metrics of all uvicorn workers
+multiprocess_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR", "")
+
+# Stages range from in-process lookups (sub-millisecond) to LLM completions (tens of seconds)
+latency_buckets = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+requests_total = Counter(
+    "healthsearch_requests_total", "Requests by endpoint", ["endpoint"]
+)
+request_seconds = Histogram(
+    "healthsearch_request_seconds",
+    "Request latency by endpoint, streamed responses until the last line",
+    ["endpoint"],
+    buckets=latency_buckets,
+)
+requests_in_flight = Gauge(
+    "healthsearch_requests_in_flight",
+    "Requests being processed by endpoint",
+    ["endpoint"],
+    multiprocess_mode="livesum",
+)
+stage_seconds = Histogram(
+    "healthsearch_stage_seconds",
+    "Latency of the stages of the query pipeline",
+    ["stage"],
+    buckets=latency_buckets,
+)
+cache_lookups = Counter(
+    "healthsearch_cache_lookups_total",
+    "Cache lookups by result: local_hit, exact_hit, semantic_hit or miss",
+    ["result"],
+)
+query_retries = Counter(
+    "healthsearch_query_retries_total",
+    "Generated queries sent back to the LLM, by reason: validation or weaviate",
+    ["reason"],
+)
+llm_requests = Counter(
+    "healthsearch_llm_requests_total",
+    "OpenAI completion requests by outcome: ok or error",
+    ["outcome"],
+)
+llm_tokens = Counter(
+    "healthsearch_llm_tokens_total",
+    "Tokens reported by the OpenAI completions, by kind: prompt or completion",
+    ["kind"],
+)
+llm_in_flight = Gauge(
+    "healthsearch_llm_requests_in_flight",
+    "OpenAI completion requests waiting for a response",
+    multiprocess_mode="livesum",
+)
+cache_writes = Counter(
+    "healthsearch_cache_writes_total",
+    "CachedResult writes by outcome: queued or dropped",
+    ["outcome"],
+)
+
+
+@contextmanager
+def stage_timer(stage: str, **attributes) -> Iterator[dict]:
+    """Record the latency of a pipeline stage in the histogram and as a span of the current trace.
+    Failed stages are only recorded in the trace.
+    @parameter stage : str - Stage label
+    @parameter attributes : dict - Span attributes
+    """
+    with span(stage, **attributes) as record:
+        start = time.perf_counter()
+        yield record
+        stage_seconds.labels(stage).observe(time.perf_counter() - start)
+
+
+async def timed(stage: str, awaitable: Awaitable, **attributes):
+    """Await a pipeline stage and record its latency with stage_timer
+    @parameter stage : str - Stage label
+    @parameter awaitable : Awaitable - Coroutine or future of the stage
+    @parameter attributes : dict - Span attributes
+    @returns object - Result of the awaitable
+    """
+    with stage_timer(stage, **attributes):
+        return await awaitable
+
+
+@contextmanager
+def track_request(endpoint: str) -> Iterator[None]:
+    """Count a request as in flight and record its latency when the block exits
+    @parameter endpoint : str - Endpoint label
+    """
+    start = time.perf_counter()
+    requests_in_flight.labels(endpoint).inc()
+    try:
+        yield
+    finally:
+        requests_in_flight.labels(endpoint).dec()
+        request_seconds.labels(endpoint).observe(time.perf_counter() - start)
+
+
+def render() -> tuple:
+    """Render all metrics in the Prometheus text format, combined over all workers in multiprocess mode
+    @returns (bytes, str) - Body and content type
+    """
+    if multiprocess_dir:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead() -> None:
+    """Remove the in-flight gauges of this worker on shutdown, so they don't count towards the live sum"""
+    if multiprocess_dir:
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,78 @@
+from collections import OrderedDict
+from pathlib import Path
+
+from query_cache import CACHE_GENERATION_FILE, read_cache_generation
+
+
+class ProductStore:
+    """Bounded in-process store of product records by UUID, used to rehydrate cached results that only reference products.
+    Records are added from query results, the least recently used ones are dropped once max_entries is exceeded.
+    The store is emptied when the cache generation changes, i.e. after products were imported.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 100000,
+        generation_file: Path = CACHE_GENERATION_FILE,
+    ) -> None:
+        self.max_entries = max_entries
+        self.generation_file = generation_file
+        self.generation = read_cache_generation(generation_file)
+        self.records: OrderedDict = OrderedDict()  # id -> product record
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def check_generation(self) -> None:
+        """Drop all records if the products were imported again"""
+        generation = read_cache_generation(self.generation_file)
+        if generation != self.generation:
+            self.records.clear()
+            self.generation = generation
+
+    def put_many(self, records: list) -> None:
+        """Add or replace product records
+        @parameter records : list - Product records with an "id", e.g. from handle_results (the distance is dropped)
+        @returns None
+        """
+        self.check_generation()
+        for record in records:
+            record = {key: value for key, value in record.items() if key != "distance"}
+            self.records[record["id"]] = record
+            self.records.move_to_end(record["id"])
+        while len(self.records) > self.max_entries:
+            self.records.popitem(last=False)
+
+    def missing(self, ids: list) -> list:
+        """Return the ids without a record
+        @parameter ids : list - Product UUIDs
+        @returns list - Ids that have to be fetched
+        """
+        self.check_generation()
+        missing = [product_id for product_id in ids if product_id not in self.records]
+        self.hits += len(ids) - len(missing)
+        self.misses += len(missing)
+        return missing
+
+    def rehydrate(self, ids: list, distances: list) -> list:
+        """Build a result list from product references
+        @parameter ids : list - Product UUIDs in result order
+        @parameter distances : list - Distance of every product to the query
+        @returns list - Product records with their distance, products without a record are left out
+        """
+        self.check_generation()
+        products = []
+        for product_id, distance in zip(ids, distances):
+            record = self.records.get(product_id)
+            if record is not None:
+                self.records.move_to_end(product_id)
+                products.append(dict(record, distance=distance))
+        return products
+
+    def stats(self) -> dict:
+        """Return the store counters
+        @returns dict - Records, and ids found and not found by missing()
+        """
+        return {"records": len(self.records), "hits": self.hits, "misses": self.misses}
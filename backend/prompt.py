@@ -0,0 +1,75 @@
+from typing import List, Optional, Tuple
+
+from graphql_ast import tokenize
+from schema import product_class, public_properties
+
+# Natural language query and the arguments of its Product query, the selected fields are added when rendering
+prompt_examples: List[Tuple[str, str]] = [
+    (
+        "Which product is helpful for joint pain?",
+        'nearText: {concepts: ["joint pain"]}',
+    ),
+    (
+        'Products from brand "Life Extension" for glowing skin',
+        'nearText: {concepts: ["glowing skin"]}, where: {path: ["brand"], operator: Equal, valueText: "Life Extension"}',
+    ),
+    (
+        "Lowest rated products for energy",
+        'nearText: {concepts: ["energy"]}, sort: [{path: ["rating"], order: asc}]',
+    ),
+]
+
+
+def compact_graphql(query: str) -> str:
+    """Render a GraphQL query on a single line with the minimal whitespace
+    @parameter query : str - GraphQL query
+    @returns str - Equivalent single line query
+    """
+    compact = ""
+    previous = ""
+    for token in tokenize(query):
+        # Only names, numbers and strings need a separator between each other
+        if previous and previous[-1] not in "{}()[]:" and token[0] not in "{}()[]:":
+            compact += " "
+        compact += token
+        previous = token
+    return compact
+
+
+def describe_properties(class_obj: dict) -> str:
+    """List the properties of a class as "name (type): description" lines"""
+    return "\n".join(
+        f"- {prop['name']} ({prop['dataType'][0]}): {prop.get('description', '')}"
+        for prop in public_properties(class_obj)
+    )
+
+
+def build_system_prompt(
+    class_obj: dict = product_class,
+    fields: Optional[list] = None,
+    examples: Optional[List[Tuple[str, str]]] = None,
+) -> str:
+    """Build the system prompt for the query generation from a class schema
+    @parameter class_obj : dict - Weaviate class definition, e.g. as returned by the schema endpoint
+    @parameter fields : list - Properties every query has to select, defaults to all properties
+    @parameter examples : list - (natural language query, query arguments) pairs, defaults to prompt_examples
+    @returns str - System prompt
+    """
+    class_name = class_obj["class"]
+    if fields is None:
+        fields = [prop["name"] for prop in public_properties(class_obj)]
+    if examples is None:
+        examples = prompt_examples
+
+    selection = " ".join(fields) + " _additional{id distance}"
+    lines = [
+        f"Translate natural language into one Weaviate GraphQL Get query on the {class_name} class and return only the query.",
+        f"{class_name} properties:",
+        describe_properties(class_obj),
+        f"Always select: {selection}",
+        "Use nearText for the concepts, where (valueText for text, valueNumber for number) for exact filters and sort for ordering.",
+    ]
+    for natural_query, arguments in examples:
+        query = "{Get{%s(%s){%s}}}" % (class_name, arguments, selection)
+        lines.append(f"Q: {natural_query}\nA: {compact_graphql(query)}")
+    return "\n".join(lines)
@@ -0,0 +1,157 @@
+import os
+import time
+
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Optional
+
+# File touched whenever the CachedResult class is recreated (clear_cache.py, import_data_to_weaviate.py)
+CACHE_GENERATION_FILE = Path(
+    os.environ.get("CACHE_GENERATION_FILE", Path(__file__).parent / ".cache_generation")
+)
+
+
+def bump_cache_generation(path: Path = CACHE_GENERATION_FILE) -> None:
+    """Mark all in-process query caches as stale, call this after recreating the CachedResult class
+    @parameter path : Path - Generation marker file
+    @returns None
+    """
+    path.write_text(str(time.time_ns()))
+
+
+def read_cache_generation(path: Path = CACHE_GENERATION_FILE) -> int:
+    """Return the current cache generation
+    @parameter path : Path - Generation marker file
+    @returns int - Modification time of the marker file, 0 if it doesn't exist
+    """
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def normalize_query(natural_query: str) -> str:
+    """Normalize a natural language query to the key used by the caches
+    @parameter natural_query : str - Natural Query from the user
+    @returns str - Lower case query with collapsed whitespace
+    """
+    return " ".join(natural_query.lower().split())
+
+
+class QueryCache:
+    """Bounded in-memory exact-match cache for serialized API responses, keyed on the normalized natural language query.
+    Responses are stored as JSON bytes, so a hit is sent without decoding and encoding it again.
+    Entries are evicted least recently used first once max_entries or max_bytes is exceeded, and expire after ttl seconds.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl: float = 3600.0,
+        generation_file: Path = CACHE_GENERATION_FILE,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.generation_file = generation_file
+        self.generation = read_cache_generation(generation_file)
+        self.entries: OrderedDict = (
+            OrderedDict()
+        )  # key -> (expires_at, size, value, tag)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return a cached response and mark it as recently used
+        @parameter key : str - Normalized natural language query
+        @returns bytes | None - Serialized response or None on a miss
+        """
+        self.check_generation()
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, size, value, _ = entry
+        if expires_at < time.monotonic():
+            self.remove(key)
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: bytes, tag: Optional[str] = None) -> None:
+        """Add a response to the cache and evict entries until it fits the entry and byte budget
+        @parameter key : str - Normalized natural language query
+        @parameter value : bytes - Serialized response
+        @parameter tag : str | None - Kept with the response, e.g. the id of the cache entry that produced it
+        @returns None
+        """
+        size = len(value)
+        if size > self.max_bytes:
+            return
+
+        self.remove(key)
+        self.entries[key] = (time.monotonic() + self.ttl, size, value, tag)
+        self.bytes += size
+
+        while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+            oldest = next(iter(self.entries))
+            self.remove(oldest)
+            self.evictions += 1
+
+    def tag(self, key: str) -> Optional[str]:
+        """Return the tag stored with a response, without counting a lookup
+        @parameter key : str - Normalized natural language query
+        @returns str | None - Tag, None if the key isn't cached or has no tag
+        """
+        entry = self.entries.get(key)
+        return None if entry is None else entry[3]
+
+    def remove(self, key: str) -> None:
+        """Remove a single entry if it exists
+        @parameter key : str - Normalized natural language query
+        @returns None
+        """
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+
+    def remove_where(self, match: Callable[[str], bool]) -> int:
+        """Remove every entry whose key matches, e.g. all projections of a query
+        @parameter match : Callable[[str], bool] - Returns True for keys to remove
+        @returns int - Number of removed entries
+        """
+        keys = [key for key in self.entries if match(key)]
+        for key in keys:
+            self.remove(key)
+        return len(keys)
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        self.entries.clear()
+        self.bytes = 0
+
+    def check_generation(self) -> None:
+        """Clear the cache if the CachedResult class was recreated since the last check"""
+        generation = read_cache_generation(self.generation_file)
+        if generation != self.generation:
+            self.generation = generation
+            self.clear()
+
+    def stats(self) -> dict:
+        """Return entry count, byte size and hit/miss counters
+        @returns dict - Cache statistics
+        """
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
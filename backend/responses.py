@@ -0,0 +1,33 @@
+import orjson
+
+from fastapi.responses import Response
+
+
+def serialize(content) -> bytes:
+    """Serialize a response body with orjson
+    @parameter content : dict - Response content, may contain NumPy arrays and non-string keys
+    @returns bytes - UTF-8 encoded JSON
+    """
+    return orjson.dumps(
+        content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    )
+
+
+class OrjsonResponse(Response):
+    """JSON response serialized with orjson, several times faster than the json module for the product lists"""
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return serialize(content)
+
+
+def json_bytes_response(body: bytes, status_code: int = 200) -> Response:
+    """Send an already serialized JSON body as it is
+    @parameter body : bytes - Serialized JSON, e.g. from the in-process query cache
+    @parameter status_code : int - HTTP status code
+    @returns Response - Response with the body unchanged
+    """
+    return Response(
+        content=body, status_code=status_code, media_type="application/json"
+    )
@@ -0,0 +1,267 @@
+# Weaviate class definitions shared by the API and the scripts
+
+product_class: dict = {
+    "class": "Product",
+    "description": "Supplement products",
+    "properties": [
+        {
+            "dataType": ["text"],
+            "description": "The name of the product",
+            "name": "name",
+            "moduleConfig": {
+                "text2vec-openai": {
+                    "skip": True,
+                    "vectorizePropertyName": False,
+                }
+            },
+        },
+        {
+            "dataType": ["text"],
+            "description": "The brand of the product",
+            "name": "brand",
+            "moduleConfig": {
+                "text2vec-openai": {
+                    "skip": True,
+                    "vectorizePropertyName": False,
+                }
+            },
+        },
+        {
+            "dataType": ["text"],
+            "description": "The ingredients contained in the product.",
+            "name": "ingredients",
+            "moduleConfig": {
+                "text2vec-openai": {
+                    "skip": False,
+                    "vectorizePropertyName": True,
+                }
+            },
+        },
+        {
+            "dataType": ["text[]"],
+            "description": "Reviews about the product",
+            "name": "reviews",
+            "moduleConfig": {
+                "text2vec-openai": {
+                    "skip": True,
+                    "vectorizePropertyName": False,
+                }
+            },
+        },
+        {
+            "dataType": ["text"],
+            "description": "Image URL of the product",
+            "name": "image",
+            "moduleConfig": {
+                "text2vec-openai": {
+                    "skip": True,
+                    "vectorizePropertyName": False,
+                }
+            },
+        },
+        {
+            "dataType": ["number"],
+            "description": "The Rating of the product",
+            "name": "rating",
+            "moduleConfig": {
+                "text2vec-openai": {
+                    "skip": True,
+                    "vectorizePropertyName": False,
+                }
+            },
+        },
+        {
+            "dataType": ["text"],
+            "description": "The description of the product",
+            "name": "description",
+            "moduleConfig": {
+                "text2vec-openai": {
+                    "skip": True,
+                    "vectorizePropertyName": False,
+                }
+            },
+        },
+        {
+            "dataType": ["text"],
+            "description": "The summary of the reviews",
+            "name": "summary",
+            "moduleConfig": {
+                "text2vec-openai": {
+                    "skip": False,
+                    "vectorizePropertyName": True,
+                }
+            },
+        },
+        {
+            "dataType": ["text"],
+            "description": "The health effects of the product",
+            "name": "effects",
+            "moduleConfig": {
+                "text2vec-openai": {
+                    "skip": False,
+                    "vectorizePropertyName": True,
+                }
+            },
+        },
+        {
+            "dataType": ["int"],
+            "description": "Number of reviews, lets list queries skip the reviews",
+            "name": "reviewCount",
+            "moduleConfig": {
+                "text2vec-openai": {
+                    "skip": True,
+                    "vectorizePropertyName": False,
+                }
+            },
+        },
+        {
+            "dataType": ["text"],
+            "description": "Hash of the imported properties and vector, used by the incremental import",
+            "name": "contentHash",
+            "moduleConfig": {
+                "text2vec-openai": {
+                    "skip": True,
+                    "vectorizePropertyName": False,
+                }
+            },
+        },
+    ],
+    "moduleConfig": {
+        "generative-openai": {"model": "gpt-3.5-turbo"},
+        "text2vec-openai": {"model": "ada", "modelVersion": "002", "type": "text"},
+    },
+    "vectorizer": "text2vec-openai",
+}
+
+cached_result_class: dict = {
+    "class": "CachedResult",
+    "description": "Cached results",
+    "properties": [
+        {
+            "dataType": ["text"],
+            "description": "GraphQL Query",
+            "name": "graphQuery",
+            "moduleConfig": {
+                "text2vec-openai": {
+                    "skip": True,
+                    "vectorizePropertyName": False,
+                }
+            },
+        },
+        {
+            "dataType": ["text"],
+            "description": "Natural Language Query",
+            "name": "naturalQuery",
+            "moduleConfig": {
+                "text2vec-openai": {
+                    "skip": False,
+                    "vectorizePropertyName": True,
+                }
+            },
+        },
+        {
+            "dataType": ["text"],
+            "description": "Retrieved Products as JSON, only set on entries written before productIds existed",
+            "name": "products",
+            "moduleConfig": {
+                "text2vec-openai": {
+                    "skip": True,
+                    "vectorizePropertyName": False,
+                }
+            },
+        },
+        {
+            "dataType": ["text[]"],
+            "description": "UUIDs of the retrieved products",
+            "name": "productIds",
+            "moduleConfig": {
+                "text2vec-openai": {
+                    "skip": True,
+                    "vectorizePropertyName": False,
+                }
+            },
+        },
+        {
+            "dataType": ["number[]"],
+            "description": "Distances of the retrieved products",
+            "name": "productDistances",
+            "moduleConfig": {
+                "text2vec-openai": {
+                    "skip": True,
+                    "vectorizePropertyName": False,
+                }
+            },
+        },
+        {
+            "dataType": ["text"],
+            "description": "Generated Summary",
+            "name": "summary",
+            "moduleConfig": {
+                "text2vec-openai": {
+                    "skip": True,
+                    "vectorizePropertyName": False,
+                }
+            },
+        },
+        {
+            "dataType": ["number"],
+            "description": "Creation time (Unix seconds)",
+            "name": "createdAt",
+            "moduleConfig": {
+                "text2vec-openai": {
+                    "skip": True,
+                    "vectorizePropertyName": False,
+                }
+            },
+        },
+        {
+            "dataType": ["number"],
+            "description": "Time of the last hit (Unix seconds)",
+            "name": "lastHitAt",
+            "moduleConfig": {
+                "text2vec-openai": {
+                    "skip": True,
+                    "vectorizePropertyName": False,
+                }
+            },
+        },
+        {
+            "dataType": ["int"],
+            "description": "Number of hits",
+            "name": "hitCount",
+            "moduleConfig": {
+                "text2vec-openai": {
+                    "skip": True,
+                    "vectorizePropertyName": False,
+                }
+            },
+        },
+        {
+            "dataType": ["int"],
+            "description": "Size of the stored query, products and summary in bytes",
+            "name": "sizeBytes",
+            "moduleConfig": {
+                "text2vec-openai": {
+                    "skip": True,
+                    "vectorizePropertyName": False,
+                }
+            },
+        },
+    ],
+    "vectorizer": "text2vec-openai",
+}
+
+# Bookkeeping properties that aren't part of the data model exposed to the LLM
+internal_properties = {"contentHash", "reviewCount"}
+
+
+def public_properties(class_obj: dict) -> list:
+    """Return the properties of a class without the internal bookkeeping ones
+    @parameter class_obj : dict - Weaviate class definition
+    @returns list - Property definitions
+    """
+    return [
+        prop
+        for prop in class_obj["properties"]
+        if prop["name"] not in internal_properties
+    ]
@@ -0,0 +1,363 @@
+import sqlite3
+import threading
+import time
+import orjson
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+
+class LocalState:
+    """Counters and values of a single process, used when the API runs with one worker.
+    Counters and values can expire, a counter with a ttl works as a fixed window for rate limits.
+    """
+
+    def __init__(self) -> None:
+        self.counter_values: dict = {}  # key -> [value, expiry time or None]
+        self.values: dict = {}  # key -> (value, expiry time or None)
+
+    @staticmethod
+    def expired(expires: Optional[float], now: float) -> bool:
+        """Whether an expiry time has passed, None never expires"""
+        return expires is not None and expires <= now
+
+    def incr(self, key: str, amount: float = 1, ttl: Optional[float] = None) -> float:
+        """Add to a counter, an expired counter starts again from zero
+        @parameter key : str - Counter name
+        @parameter amount : float - Value to add
+        @parameter ttl : float | None - Seconds until a new counter expires, None to keep it
+        @returns float - New value
+        """
+        now = time.time()
+        counter = self.counter_values.get(key)
+        if counter is None or self.expired(counter[1], now):
+            counter = self.counter_values[key] = [0, now + ttl if ttl else None]
+        counter[0] += amount
+        return counter[0]
+
+    def maximum(self, key: str, value: float) -> float:
+        """Raise a counter to value if it is lower, e.g. to keep the latest timestamp
+        @parameter key : str - Counter name
+        @parameter value : float - Candidate value
+        @returns float - New value
+        """
+        counter = self.counter_values.get(key)
+        if counter is None:
+            counter = self.counter_values[key] = [value, None]
+        counter[0] = max(counter[0], value)
+        return counter[0]
+
+    def counter(self, key: str) -> float:
+        """Return the value of a counter, 0 if it doesn't exist or expired
+        @parameter key : str - Counter name
+        @returns float - Value
+        """
+        value, expires = self.counter_values.get(key, (0, None))
+        return 0 if self.expired(expires, time.time()) else value
+
+    def counters(self, prefix: str = "") -> dict:
+        """Return the counters whose name starts with prefix
+        @parameter prefix : str - Name prefix
+        @returns dict - Values by name
+        """
+        now = time.time()
+        return {
+            key: value
+            for key, (value, expires) in self.counter_values.items()
+            if key.startswith(prefix) and not self.expired(expires, now)
+        }
+
+    def take(self, prefix: str) -> dict:
+        """Return and remove the counters whose name starts with prefix
+        @parameter prefix : str - Name prefix
+        @returns dict - Values by name
+        """
+        taken = self.counters(prefix)
+        for key in [key for key in self.counter_values if key.startswith(prefix)]:
+            del self.counter_values[key]
+        return taken
+
+    def get(self, key: str):
+        """Return a value, None if it doesn't exist or expired
+        @parameter key : str - Name
+        @returns object - Value
+        """
+        value, expires = self.values.get(key, (None, None))
+        return None if self.expired(expires, time.time()) else value
+
+    def set(self, key: str, value, ttl: Optional[float] = None) -> None:
+        """Store a JSON serializable value
+        @parameter key : str - Name
+        @parameter value : object - Value
+        @parameter ttl : float | None - Seconds until it expires, None to keep it
+        @returns None
+        """
+        self.values[key] = (value, time.time() + ttl if ttl else None)
+
+    def add(self, key: str, value, ttl: Optional[float] = None) -> bool:
+        """Store a value only if it doesn't exist or expired, e.g. to elect one worker for a periodic task
+        @parameter key : str - Name
+        @parameter value : object - Value
+        @parameter ttl : float | None - Seconds until it expires, None to keep it
+        @returns bool - Whether the value was stored
+        """
+        if self.get(key) is not None:
+            return False
+        self.set(key, value, ttl)
+        return True
+
+    def flush(self) -> None:
+        """Nothing to write for the local state"""
+
+    def close(self) -> None:
+        """Nothing to release for the local state"""
+
+
+class SQLiteState(LocalState):
+    """Counters and values in a SQLite database, shared by the uvicorn workers on one host.
+    Counter updates without a ttl, maximums and stored values are buffered in-process and written by flush() in one
+    transaction, which the API runs in a thread so the event loop never waits for the database lock.
+    Reads include the buffered updates of this worker, the other workers' updates are visible after their next flush.
+    Operations that need the result of a write (a counter with a ttl, add and take) run immediately with a short busy timeout.
+    """
+
+    def __init__(self, path: Path, busy_timeout: float = 0.05) -> None:
+        """
+        @parameter path : Path - SQLite database on a local disk, created if it doesn't exist
+        @parameter busy_timeout : float - Seconds an immediate operation waits for the write lock
+        """
+        # Transactions are opened explicitly by transaction(), the writer connection is only used by flush()
+        self.connection = sqlite3.connect(
+            str(path),
+            check_same_thread=False,
+            timeout=busy_timeout,
+            isolation_level=None,
+        )
+        self.writer = sqlite3.connect(
+            str(path), check_same_thread=False, timeout=30, isolation_level=None
+        )
+        self.writer.execute("PRAGMA journal_mode=WAL")
+        for connection in (self.connection, self.writer):
+            connection.execute("PRAGMA synchronous=NORMAL")
+        with self.transaction(self.writer):
+            self.writer.execute(
+                "CREATE TABLE IF NOT EXISTS counters (key TEXT PRIMARY KEY, value REAL, expires REAL)"
+            )
+            self.writer.execute(
+                "CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value BLOB, expires REAL)"
+            )
+        # Updates waiting for the next flush, guarded by lock because flush() runs in another thread
+        self.lock = threading.Lock()
+        # Held while the writer connection is in use
+        self.flush_lock = threading.Lock()
+        self.pending_counters: dict = {}  # key -> amount to add
+        self.pending_maximums: dict = {}  # key -> value
+        self.pending_values: dict = {}  # key -> (value, expiry time or None)
+
+    @contextmanager
+    def transaction(
+        self, connection: Optional[sqlite3.Connection] = None
+    ) -> Iterator[None]:
+        """Run the block in a transaction that holds the write lock from the start, so a read and the following write see the same data
+        @parameter connection : sqlite3.Connection | None - Connection to use, the event loop connection by default
+        """
+        connection = connection or self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def flush(self) -> None:
+        """Write the buffered updates in one transaction, they are kept for the next flush if it fails"""
+        # A flush still running in the flusher's thread finishes before the next one or close() starts
+        with self.flush_lock:
+            self.write_pending()
+
+    def write_pending(self) -> None:
+        """Write the buffered updates with the writer connection, the caller holds flush_lock"""
+        with self.lock:
+            counters, self.pending_counters = self.pending_counters, {}
+            maximums, self.pending_maximums = self.pending_maximums, {}
+            values, self.pending_values = self.pending_values, {}
+        if not (counters or maximums or values):
+            return
+        now = time.time()
+        try:
+            with self.transaction(self.writer):
+                self.writer.executemany(
+                    """INSERT INTO counters (key, value, expires) VALUES (?, ?, NULL)
+                    ON CONFLICT (key) DO UPDATE SET
+                        value = CASE WHEN expires <= ? THEN excluded.value ELSE value + excluded.value END,
+                        expires = CASE WHEN expires <= ? THEN NULL ELSE expires END""",
+                    [(key, amount, now, now) for key, amount in counters.items()],
+                )
+                self.writer.executemany(
+                    """INSERT INTO counters (key, value) VALUES (?, ?)
+                    ON CONFLICT (key) DO UPDATE SET value = max(value, excluded.value)""",
+                    list(maximums.items()),
+                )
+                self.writer.executemany(
+                    "INSERT OR REPLACE INTO state (key, value, expires) VALUES (?, ?, ?)",
+                    [
+                        (key, orjson.dumps(value), expires)
+                        for key, (value, expires) in values.items()
+                    ],
+                )
+        except Exception:
+            with self.lock:
+                for key, amount in counters.items():
+                    self.pending_counters[key] = (
+                        self.pending_counters.get(key, 0) + amount
+                    )
+                for key, value in maximums.items():
+                    self.pending_maximums[key] = max(
+                        self.pending_maximums.get(key, value), value
+                    )
+                for key, value in values.items():
+                    self.pending_values.setdefault(key, value)
+            raise
+
+    def incr(self, key: str, amount: float = 1, ttl: Optional[float] = None) -> float:
+        if ttl is None:
+            with self.lock:
+                self.pending_counters[key] = self.pending_counters.get(key, 0) + amount
+            return self.counter(key)
+        now = time.time()
+        try:
+            value = self.incr_window(key, amount, ttl, now)
+        except sqlite3.OperationalError:
+            # Another worker holds the write lock, like a lease the update is skipped rather than waited for
+            return self.counter(key) + amount
+        return value
+
+    def incr_window(self, key: str, amount: float, ttl: float, now: float) -> float:
+        """Add to a counter with a ttl immediately, the counter starts again from zero once it expired
+        @parameter key : str - Counter name
+        @parameter amount : float - Value to add
+        @parameter ttl : float - Seconds until a new counter expires
+        @parameter now : float - Current time
+        @returns float - New value
+        """
+        with self.transaction():
+            self.connection.execute(
+                """INSERT INTO counters (key, value, expires) VALUES (?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET
+                    value = CASE WHEN expires <= ? THEN excluded.value ELSE value + excluded.value END,
+                    expires = CASE WHEN expires <= ? THEN excluded.expires ELSE expires END""",
+                (key, amount, now + ttl, now, now),
+            )
+            (value,) = self.connection.execute(
+                "SELECT value FROM counters WHERE key = ?", (key,)
+            ).fetchone()
+        return value
+
+    def maximum(self, key: str, value: float) -> float:
+        with self.lock:
+            self.pending_maximums[key] = max(
+                self.pending_maximums.get(key, value), value
+            )
+        return self.counter(key)
+
+    def merge_pending(self, counters: dict, prefix: str) -> dict:
+        """Add the buffered updates of this worker to counters read from the database
+        @parameter counters : dict - Values by name
+        @parameter prefix : str - Name prefix of the counters
+        @returns dict - Values by name
+        """
+        with self.lock:
+            for key, amount in self.pending_counters.items():
+                if key.startswith(prefix):
+                    counters[key] = counters.get(key, 0) + amount
+            for key, value in self.pending_maximums.items():
+                if key.startswith(prefix):
+                    counters[key] = max(counters.get(key, value), value)
+        return counters
+
+    def counter(self, key: str) -> float:
+        row = self.connection.execute(
+            "SELECT value FROM counters WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (key, time.time()),
+        ).fetchone()
+        counters = {} if row is None else {key: row[0]}
+        return self.merge_pending(counters, key).get(key, 0)
+
+    def stored_counters(self, prefix: str) -> dict:
+        """Return the counters in the database whose name starts with prefix, without the buffered updates
+        @parameter prefix : str - Name prefix
+        @returns dict - Values by name
+        """
+        rows = self.connection.execute(
+            "SELECT key, value FROM counters WHERE substr(key, 1, ?) = ? AND (expires IS NULL OR expires > ?)",
+            (len(prefix), prefix, time.time()),
+        )
+        return dict(rows.fetchall())
+
+    def counters(self, prefix: str = "") -> dict:
+        return self.merge_pending(self.stored_counters(prefix), prefix)
+
+    def take(self, prefix: str) -> dict:
+        with self.transaction():
+            taken = self.stored_counters(prefix)
+            self.connection.execute(
+                "DELETE FROM counters WHERE substr(key, 1, ?) = ?",
+                (len(prefix), prefix),
+            )
+        # Buffered updates of this worker are taken too, the other workers' are taken after their next flush
+        taken = self.merge_pending(taken, prefix)
+        with self.lock:
+            for pending in (self.pending_counters, self.pending_maximums):
+                for key in [key for key in pending if key.startswith(prefix)]:
+                    del pending[key]
+        return taken
+
+    def get(self, key: str):
+        with self.lock:
+            pending = self.pending_values.get(key)
+        if pending is not None:
+            value, expires = pending
+            return None if self.expired(expires, time.time()) else value
+        row = self.connection.execute(
+            "SELECT value FROM state WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (key, time.time()),
+        ).fetchone()
+        return None if row is None else orjson.loads(row[0])
+
+    def set(self, key: str, value, ttl: Optional[float] = None) -> None:
+        with self.lock:
+            self.pending_values[key] = (value, time.time() + ttl if ttl else None)
+
+    def add(self, key: str, value, ttl: Optional[float] = None) -> bool:
+        now = time.time()
+        try:
+            with self.transaction():
+                cursor = self.connection.execute(
+                    """INSERT INTO state (key, value, expires) VALUES (?, ?, ?)
+                    ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires
+                    WHERE expires <= ?""",
+                    (key, orjson.dumps(value), now + ttl if ttl else None, now),
+                )
+        except sqlite3.OperationalError:
+            # Another worker holds the write lock, it may be taking the same key
+            return False
+        return cursor.rowcount > 0
+
+    def close(self) -> None:
+        """Write the buffered updates and close the database"""
+        with self.flush_lock:
+            self.write_pending()
+            self.connection.close()
+            self.writer.close()
+
+
+def create_state(path: str = "") -> LocalState:
+    """Create the shared state backend
+    @parameter path : str - SQLite database shared by the workers, empty for state local to the process
+    @returns LocalState | SQLiteState - State backend
+    """
+    if not path:
+        return LocalState()
+    return SQLiteState(Path(path))
@@ -0,0 +1,123 @@
+import asyncio
+
+from typing import AsyncIterator, Awaitable, Callable, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class Broadcast:
+    """Runs an async iterator as its own task and replays its items to every subscriber, also to the ones that join late.
+    A subscriber that stops iterating (e.g. a client that disconnects) doesn't cancel the execution for the others.
+    """
+
+    def __init__(self, iterator: AsyncIterator, stats: Optional[dict] = None) -> None:
+        """
+        @parameter iterator : AsyncIterator - Execution to share
+        @parameter stats : dict | None - Counters the execution updates, readable by the subscribers
+        """
+        self.items: list = []
+        self.stats = stats if stats is not None else {}
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        self.updated = asyncio.Event()
+        self.task = asyncio.ensure_future(self.run(iterator))
+
+    async def run(self, iterator: AsyncIterator) -> None:
+        """Collect the items of the execution and wake up the subscribers for each of them"""
+        try:
+            async for item in iterator:
+                self.items.append(item)
+                self.notify()
+        except asyncio.CancelledError as e:
+            self.error = e
+            raise
+        except Exception as e:
+            # Raised to every subscriber instead of the task
+            self.error = e
+        finally:
+            self.finished = True
+            self.notify()
+
+    def notify(self) -> None:
+        """Wake up the waiting subscribers, later waits use a new event"""
+        self.updated.set()
+        self.updated = asyncio.Event()
+
+    async def subscribe(self) -> AsyncIterator:
+        """Iterate over all items of the execution, starting with the ones already produced
+        @returns AsyncIterator - Items in the order of the execution, raises the error of a failed execution
+        """
+        position = 0
+        while True:
+            while position < len(self.items):
+                yield self.items[position]
+                position += 1
+            if self.finished:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self.updated.wait()
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution.
+    The execution runs as its own task, so a caller that disconnects doesn't cancel it for the others.
+    """
+
+    def __init__(self) -> None:
+        self.calls: dict = {}  # key -> running task or Broadcast
+        self.executions = 0
+        self.shared = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """Run fn, or wait for the running execution with the same key
+        @parameter key : str - Key identifying duplicate calls
+        @parameter fn : Callable - Coroutine function to execute
+        @returns (object, bool) - Result of the execution and whether it was shared with an earlier caller
+        """
+        task = self.calls.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self.calls[key] = task
+            self.executions += 1
+            task.add_done_callback(lambda _: self.calls.pop(key, None))
+        else:
+            self.shared += 1
+
+        return await asyncio.shield(task), shared
+
+    def broadcast(
+        self,
+        key: str,
+        fn: Callable[[], AsyncIterator],
+        stats: Optional[dict] = None,
+    ) -> Tuple[Broadcast, bool]:
+        """Start fn as a broadcast execution, or join the running one with the same key
+        @parameter key : str - Key identifying duplicate calls
+        @parameter fn : Callable - Function returning the async iterator to execute
+        @parameter stats : dict | None - Counters fn updates, only used if a new execution is started
+        @returns (Broadcast, bool) - Execution to subscribe to and whether it was shared with an earlier caller
+        """
+        execution = self.calls.get(key)
+        if isinstance(execution, Broadcast):
+            self.shared += 1
+            return execution, True
+
+        execution = Broadcast(fn(), stats)
+        self.calls[key] = execution
+        self.executions += 1
+        execution.task.add_done_callback(
+            lambda _: self.calls.pop(key) if self.calls.get(key) is execution else None
+        )
+        return execution, False
+
+    def stats(self) -> dict:
+        """Return the execution counters
+        @returns dict - In-flight keys, executions and callers that shared an execution
+        """
+        return {
+            "in_flight": len(self.calls),
+            "executions": self.executions,
+            "shared": self.shared,
+        }
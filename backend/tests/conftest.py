@@ -0,0 +1,39 @@
+import importlib
+import os
+import socket
+import sys
+import pytest
+
+from pathlib import Path
+
+# The backend modules live one directory up
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent / "benchmarks"))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture(scope="session")
+def api(tmp_path_factory):
+    """The api module, connected to the Weaviate stand-in of the benchmarks"""
+    from stubs import create_weaviate_stub, serve_process  # type: ignore[import]
+
+    port = free_port()
+    weaviate_stub = serve_process(
+        create_weaviate_stub, {"latency": 0.0, "products": []}, port
+    )
+    directory = tmp_path_factory.mktemp("api")
+    os.environ.update(
+        OPENAI_API_KEY="stub",
+        HEALTHSEARCH_SERVER=f"http://127.0.0.1:{port}",
+        HEALTHSEARCH_API_KEY="",
+        EMBEDDING_CACHE_PATH=str(directory / "embeddings.sqlite"),
+        CACHE_GENERATION_FILE=str(directory / ".cache_generation"),
+        SLOW_QUERY_THRESHOLD="0",
+    )
+    yield importlib.import_module("api")
+    weaviate_stub.terminate()
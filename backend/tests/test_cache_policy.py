@@ -0,0 +1,55 @@
+import pytest
+
+from cache_policy import CachePolicy
+
+
+def entry(entry_id: str, created: float, last_hit: float, hits: int, size: int = 10):
+    return {
+        "id": entry_id,
+        "createdAt": created,
+        "lastHitAt": last_hit,
+        "hitCount": hits,
+        "sizeBytes": size,
+    }
+
+
+entries = [
+    entry("old", created=0, last_hit=950, hits=50),
+    entry("rare", created=900, last_hit=990, hits=1),
+    entry("stale", created=900, last_hit=910, hits=5),
+    entry("popular", created=900, last_hit=920, hits=20),
+]
+
+
+@pytest.mark.parametrize(
+    "mode, max_entries, max_bytes, expected",
+    [
+        ("lfu", 2, 0, ["rare"]),
+        ("lru", 2, 0, ["stale"]),
+        ("lfu", 0, 10, ["rare", "stale"]),
+        ("lfu", 0, 0, []),
+    ],
+)
+def test_select_evictions(
+    mode: str, max_entries: int, max_bytes: int, expected: list
+) -> None:
+    policy = CachePolicy(
+        ttl=500, max_entries=max_entries, max_bytes=max_bytes, mode=mode
+    )
+    expired, evicted = policy.select_evictions(entries, now=1000)
+    assert [e["id"] for e in expired] == ["old"]
+    assert [e["id"] for e in evicted] == expected
+
+
+def test_hits_are_taken_once() -> None:
+    policy = CachePolicy()
+    policy.record_hit("a", now=1.0)
+    policy.record_hit("a", now=3.0)
+    policy.record_hit("b", now=2.0)
+    assert policy.take_hits() == {"a": [2, 3.0], "b": [1, 2.0]}
+    assert policy.take_hits() == {}
+
+
+def test_unknown_mode() -> None:
+    with pytest.raises(ValueError):
+        CachePolicy(mode="fifo")
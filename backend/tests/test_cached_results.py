@@ -0,0 +1,45 @@
+import asyncio
+
+
+class DeletingWeaviate:
+    def __init__(self) -> None:
+        self.deleted: list = []
+
+    async def delete_objects(self, class_name: str, where: dict) -> dict:
+        self.deleted.append(where["valueText"])
+        return {}
+
+
+def test_legacy_entry_is_a_miss_and_removed(api, monkeypatch) -> None:
+    fake = DeletingWeaviate()
+    monkeypatch.setattr(api, "aclient", fake)
+    api.semantic_index.add("legacy-id", [1.0] * api.semantic_index.dimensions)
+    legacy = {"naturalQuery": "joint pain", "products": "[]", "productIds": None}
+
+    assert asyncio.run(api.rehydrate_products(legacy)) is None
+    asyncio.run(api.remove_legacy_entry("legacy-id"))
+
+    assert fake.deleted == ["legacy-id"]
+    assert "legacy-id" not in api.semantic_index.ids
+
+
+class EntryWeaviate:
+    async def raw(self, query: str) -> dict:
+        entry = {"naturalQuery": "joint pain", "summary": "summary"}
+        return {"data": {"Get": {"CachedResult": [dict(entry, _additional={})]}}}
+
+
+def test_semantic_match_threshold(api, monkeypatch) -> None:
+    index = api.VectorIndex(dimensions=2)
+    index.generation = api.read_cache_generation()
+    index.add("entry-id", [1.0, 0.0])
+    monkeypatch.setattr(api, "semantic_index", index)
+    monkeypatch.setattr(api, "aclient", EntryWeaviate())
+    empty: dict = {"data": {"Get": {"CachedResult": []}}}
+
+    # cos(30°) is at distance 0.134, cos(45°) at 0.293
+    near = asyncio.run(api.check_cache(empty, "joint ache", [0.866, 0.5], 0.14))
+    far = asyncio.run(api.check_cache(empty, "headache", [1.0, 1.0], 0.14))
+
+    assert near["data"]["Get"]["CachedResult"][0]["_additional"]["id"] == "entry-id"
+    assert far == {}
@@ -0,0 +1,42 @@
+from import_data_to_weaviate import clear_cached_results
+
+
+class FakeBatch:
+    def __init__(self, stored: int, limit: int, failing: int = 0) -> None:
+        self.stored = stored
+        self.limit = limit
+        self.failing = failing
+        self.calls = 0
+
+    def delete_objects(self, class_name: str, where: dict) -> dict:
+        self.calls += 1
+        matches = min(self.stored, self.limit)
+        # The failing objects are matched last and then on every pass
+        failed = max(0, self.failing - (self.stored - matches))
+        self.stored -= matches - failed
+        return {
+            "results": {
+                "matches": matches,
+                "successful": matches - failed,
+                "failed": failed,
+            }
+        }
+
+
+class FakeClient:
+    def __init__(self, batch: FakeBatch) -> None:
+        self.batch = batch
+
+
+def test_deletes_every_page() -> None:
+    batch = FakeBatch(stored=25, limit=10)
+    clear_cached_results(FakeClient(batch))  # type: ignore[arg-type]
+    assert batch.stored == 0
+    assert batch.calls == 4
+
+
+def test_stops_when_nothing_is_deleted() -> None:
+    batch = FakeBatch(stored=25, limit=10, failing=10)
+    clear_cached_results(FakeClient(batch))  # type: ignore[arg-type]
+    assert batch.stored == 10
+    assert batch.calls == 3
@@ -0,0 +1,90 @@
+import asyncio
+import re
+import pytest
+
+
+class FakeWeaviate:
+    """CachedResult objects paged like Weaviate's cursor API"""
+
+    def __init__(self, count: int) -> None:
+        self.objects = {
+            f"{i:08d}-0000-0000-0000-000000000000": {
+                "naturalQuery": f"query {i}",
+                "createdAt": 1.0,
+                "lastHitAt": 1.0,
+                "hitCount": 0,
+                "sizeBytes": 10,
+            }
+            for i in range(count)
+        }
+        self.pages = 0
+        self.patched: dict = {}
+        self.deleted: list = []
+
+    async def raw(self, query: str) -> dict:
+        self.pages += 1
+        limit = re.search(r"limit: (\d+)", query)
+        assert limit is not None
+        after = re.search(r'after: "([^"]+)"', query)
+        ids = sorted(self.objects)
+        if after:
+            ids = [i for i in ids if i > after.group(1)]
+        return {
+            "data": {
+                "Get": {
+                    "CachedResult": [
+                        dict(self.objects[i], _additional={"id": i, "vector": [0.5]})
+                        for i in ids[: int(limit.group(1))]
+                    ]
+                }
+            }
+        }
+
+    async def patch_object(self, class_name, uuid, properties, vector=None) -> None:
+        assert vector == [0.5]
+        self.patched[uuid] = properties
+
+    async def delete_objects(self, class_name: str, where: dict) -> dict:
+        for operand in where.get("operands", [where]):
+            self.deleted.append(operand["valueText"])
+            del self.objects[operand["valueText"]]
+        return {}
+
+
+def test_load_cache_entries_pages(api, monkeypatch) -> None:
+    fake = FakeWeaviate(1200)
+    monkeypatch.setattr(api, "aclient", fake)
+    entries = asyncio.run(api.load_cache_entries())
+    assert fake.pages == 3
+    assert len({entry["id"] for entry in entries}) == 1200
+
+
+def test_compaction_writes_hits_and_evicts(api, monkeypatch) -> None:
+    fake = FakeWeaviate(600)
+    monkeypatch.setattr(api, "aclient", fake)
+    monkeypatch.setattr(api.cache_policy, "ttl", 0)
+    monkeypatch.setattr(api.cache_policy, "max_entries", 550)
+    popular = sorted(fake.objects)[0]
+    api.cache_policy.take_hits()
+    api.cache_policy.record_hit(popular, now=5.0)
+
+    result = asyncio.run(api.compact_cache())
+
+    assert fake.patched == {popular: {"hitCount": 1, "lastHitAt": 5.0}}
+    assert result["evicted"] == 50 and result["entries"] == 550
+    assert popular not in fake.deleted
+
+
+def test_failed_load_keeps_the_hits(api, monkeypatch) -> None:
+    async def failing_raw(query: str) -> dict:
+        return {"errors": ["unavailable"]}
+
+    fake = FakeWeaviate(1)
+    monkeypatch.setattr(fake, "raw", failing_raw)
+    monkeypatch.setattr(api, "aclient", fake)
+    api.cache_policy.take_hits()
+    api.cache_policy.record_hit("a", now=5.0)
+
+    with pytest.raises(Exception):
+        asyncio.run(api.compact_cache())
+    assert api.cache_policy.take_hits() == {"a": [1, 5.0]}
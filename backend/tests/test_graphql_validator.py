@@ -0,0 +1,82 @@
+import pytest
+
+from graphql_ast import parse, serialize
+from graphql_validator import validate_graphql
+
+# Input query, expected repaired query (compared after formatting both the same way)
+repairs = [
+    (
+        "code fence",
+        "```graphql\n{Get{Product(limit: 3){name}}}\n```",
+        "{Get{Product(limit: 3){name _additional{id}}}}",
+    ),
+    (
+        "casing of Get, class and field names",
+        "{get{product(limit: 3){Name}}}",
+        "{Get{Product(limit: 3){name _additional{id}}}}",
+    ),
+    (
+        "typos in class and field names",
+        "{Get{Prodcut(limit: 3){name brnad}}}",
+        "{Get{Product(limit: 3){name brand _additional{id}}}}",
+    ),
+    (
+        "typo in an operator, valueString on a number property",
+        '{Get{Product(where: {path: ["Rating"], operator: GreaterThen, valueString: "4.5"}){name}}}',
+        '{Get{Product(where: {path: ["rating"], operator: GreaterThan, valueNumber: 4.5}){name _additional{id}}}}',
+    ),
+    (
+        "missing closing braces",
+        "{Get{Product(limit: 3){name",
+        "{Get{Product(limit: 3){name _additional{id}}}}",
+    ),
+    (
+        "typo in an argument, string limit, casing of the sort order, single concept",
+        '{Get{Product(sort: [{path: ["Rating"], order: DESC}], limt: "5", nearText: {concepts: "sleep"}){name}}}',
+        '{Get{Product(sort: [{path: ["rating"], order: desc}], limit: 5, nearText: {concepts: ["sleep"]}){name _additional{id}}}}',
+    ),
+    (
+        "valueString stays on a text property",
+        '{Get{Product(where: {path: ["brand"], operator: Equal, valueString: "Now"}){name}}}',
+        '{Get{Product(where: {path: ["brand"], operator: Equal, valueString: "Now"}){name _additional{id}}}}',
+    ),
+]
+
+# Input query, errors that can't be repaired
+unrepairable = [
+    (
+        '{Get{Product(where: {path: ["rating"], operator: Equal, valueText: "high"}){name}}}',
+        ["rating is a number, got 'high'"],
+    ),
+    (
+        '{Get{Product(where: {path: ["price"], operator: Equal, valueNumber: 3}){name}}}',
+        ["Unknown property 'price' in where path"],
+    ),
+    (
+        '{Get{Product(where: {path: ["rating"], operator: Between, valueNumber: 3}){name}}}',
+        ["Unknown where operator 'Between'"],
+    ),
+    ("{Get{Product(foo: 1){name}}}", ["Unknown argument foo on Product"]),
+    (
+        "{Aggregate{Product{meta{count}}}}",
+        ["The query must contain exactly one Get block"],
+    ),
+    (
+        "{Get{Product(limit: 3){name}}}}",
+        ["Syntax error: Unexpected '}' after the query"],
+    ),
+]
+
+
+@pytest.mark.parametrize(
+    "query, expected", [r[1:] for r in repairs], ids=[r[0] for r in repairs]
+)
+def test_repairs(query: str, expected: str) -> None:
+    repaired, errors = validate_graphql(query)
+    assert errors == []
+    assert repaired == serialize(parse(expected))
+
+
+@pytest.mark.parametrize("query, expected", unrepairable)
+def test_errors(query: str, expected: list) -> None:
+    assert validate_graphql(query)[1] == expected
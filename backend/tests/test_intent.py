@@ -0,0 +1,49 @@
+import pytest
+
+from intent import IntentParser
+
+brands = ["Pure Vegan", "KAL", "Life Extension", "Now Foods"]
+
+
+@pytest.fixture
+def parser() -> IntentParser:
+    return IntentParser(["name", "brand"], brands)
+
+
+@pytest.mark.parametrize(
+    "natural_query, brand",
+    [
+        ("best rated products from life extension for sleep", "Life Extension"),
+        ('"kal" vitamins for energy', "KAL"),
+        ("sleep aids by now foods", "Now Foods"),
+        ("brand kal for joints", "KAL"),
+    ],
+)
+def test_marked_brand_is_filtered(
+    parser: IntentParser, natural_query: str, brand: str
+) -> None:
+    query = parser.build(natural_query)
+    assert query is not None
+    assert f'valueText: "{brand}"' in query
+
+
+@pytest.mark.parametrize(
+    "natural_query",
+    [
+        "pure vegan protein powder",
+        "what is good for my kal",
+        "joint pain from kal and now foods",
+        "products from kal",
+    ],
+)
+def test_unmarked_or_ambiguous_brand_goes_to_llm(
+    parser: IntentParser, natural_query: str
+) -> None:
+    assert parser.build(natural_query) is None
+
+
+def test_filler_words_are_not_concepts(parser: IntentParser) -> None:
+    query = parser.build("what is good for my joints")
+    assert query is not None
+    assert 'concepts: ["joints"]' in query
+    assert "where" not in query
@@ -0,0 +1,85 @@
+import json
+import random
+import re
+import pytest
+
+from pathlib import Path
+
+from graphql_ast import collect_paths, parse, serialize
+from graphql_transform import modify_graphql
+
+CORPUS_PATH = (
+    Path(__file__).parent.parent / "benchmarks" / "data" / "generated_queries.json"
+)
+CORPUS = json.loads(CORPUS_PATH.read_text())
+
+# Reformatted variants checked per query of the corpus
+VARIANTS = 200
+
+data_fields = [
+    "name",
+    "brand",
+    "ingredients",
+    "reviews",
+    "image",
+    "rating",
+    "description",
+    "summary",
+    "effects",
+]
+
+
+def perturb(query: str, rng: random.Random) -> str:
+    """Reformat a query the way LLM output varies: whitespace, optional commas and field order"""
+    document = parse(query)
+    for get in document:
+        for class_field in get.selections or []:
+            rng.shuffle(class_field.selections or [])
+            rng.shuffle(class_field.arguments)
+    text = serialize(document)
+    separators = [" ", "\n", "  ", ", ", "\n\t"]
+    return re.sub(r"\n\s*", lambda _: rng.choice(separators), text)
+
+
+def check_properties(query: str, natural_query: str) -> None:
+    """Check the invariants of modify_graphql for one query"""
+    original = parse(query)
+    modified = parse(modify_graphql(query, natural_query, data_fields))
+    assert parse(serialize(original)) == original, "round trip changed the query"
+
+    for get, original_get in zip(modified, original):
+        for class_field, original_class in zip(
+            get.selections or [], original_get.selections or []
+        ):
+            names = [selection.name for selection in class_field.selections or []]
+            kept = {"summary", "description", "ingredients"}.union(
+                collect_paths(original_class.get_argument("where")),
+                collect_paths(original_class.get_argument("sort")),
+            )
+            assert all(n not in data_fields or n in kept for n in names), names
+            assert class_field.get_argument("limit") <= 5
+            assert class_field.get_argument("where") == original_class.get_argument(
+                "where"
+            )
+            assert class_field.get_argument("sort") == original_class.get_argument(
+                "sort"
+            )
+            additional = class_field.get_selection("_additional")
+            assert additional is not None
+            generate = additional.get_selection("generate")
+            assert generate is not None
+            task = generate.get_argument("groupedResult")
+            assert task["task"].endswith(natural_query)
+
+
+@pytest.mark.parametrize("entry", CORPUS, ids=[e["natural_query"] for e in CORPUS])
+def test_modify_graphql_properties(entry: dict) -> None:
+    rng = random.Random(entry["natural_query"])
+    check_properties(entry["query"], entry["natural_query"])
+    for _ in range(VARIANTS):
+        check_properties(perturb(entry["query"], rng), entry["natural_query"])
+
+
+def test_unparsable_query_is_returned_unchanged() -> None:
+    query = "{Get{Product(limit: 3){name"
+    assert modify_graphql(query, "joint pain", data_fields) == query
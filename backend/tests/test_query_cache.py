@@ -0,0 +1,81 @@
+import query_cache
+
+from query_cache import QueryCache, bump_cache_generation, normalize_query
+
+
+def test_remove_where_removes_every_projection(tmp_path) -> None:
+    cache = QueryCache(generation_file=tmp_path / ".cache_generation")
+    cache.put("joint pain", b"full")
+    cache.put("joint pain\nbrand,name", b"projected")
+    cache.put("joint pain relief", b"other")
+
+    removed = cache.remove_where(lambda key: key.split("\n", 1)[0] == "joint pain")
+
+    assert removed == 2
+    assert list(cache.entries) == ["joint pain relief"]
+    assert cache.bytes == len(b"other")
+
+
+def test_tag_is_kept_with_the_response(tmp_path) -> None:
+    cache = QueryCache(generation_file=tmp_path / ".cache_generation")
+    cache.put("joint pain", b"full", "entry-id")
+    cache.put("sleep", b"full")
+
+    assert cache.tag("joint pain") == "entry-id"
+    assert cache.tag("sleep") is None
+    assert cache.tag("missing") is None
+    assert cache.hits == cache.misses == 0
+
+
+def test_least_recently_used_is_evicted_first(tmp_path) -> None:
+    cache = QueryCache(max_entries=2, generation_file=tmp_path / ".cache_generation")
+    cache.put("a", b"1")
+    cache.put("b", b"2")
+    assert cache.get("a") == b"1"
+    cache.put("c", b"3")
+
+    assert list(cache.entries) == ["a", "c"]
+    assert cache.get("b") is None
+    assert cache.evictions == 1
+
+
+def test_entries_expire_after_ttl(tmp_path, monkeypatch) -> None:
+    now = [100.0]
+    monkeypatch.setattr(query_cache.time, "monotonic", lambda: now[0])
+    cache = QueryCache(ttl=10, generation_file=tmp_path / ".cache_generation")
+    cache.put("a", b"1")
+
+    now[0] = 109.0
+    assert cache.get("a") == b"1"
+    now[0] = 111.0
+    assert cache.get("a") is None
+    assert cache.bytes == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_byte_budget(tmp_path) -> None:
+    cache = QueryCache(max_bytes=10, generation_file=tmp_path / ".cache_generation")
+    cache.put("a", b"12345")
+    cache.put("b", b"12345")
+    cache.put("c", b"123")
+
+    assert list(cache.entries) == ["b", "c"]
+    assert cache.bytes == 8
+    # A response larger than the whole budget isn't cached
+    cache.put("d", b"x" * 11)
+    assert cache.get("d") is None
+    assert list(cache.entries) == ["b", "c"]
+
+
+def test_new_generation_clears_the_cache(tmp_path) -> None:
+    generation_file = tmp_path / ".cache_generation"
+    cache = QueryCache(generation_file=generation_file)
+    cache.put("a", b"1")
+    bump_cache_generation(generation_file)
+
+    assert cache.get("a") is None
+    assert cache.bytes == 0
+
+
+def test_normalize_query() -> None:
+    assert normalize_query("  Joint   PAIN\n") == "joint pain"
@@ -0,0 +1,23 @@
+from starlette.requests import Request
+
+
+def client_request(host: str) -> Request:
+    return Request({"type": "http", "client": (host, 1234), "headers": []})
+
+
+def test_rate_limit_per_client(api, monkeypatch) -> None:
+    monkeypatch.setattr(api, "rate_limit", 2)
+    monkeypatch.setattr(api, "rate_limit_window", 60)
+
+    assert api.rate_limited(client_request("10.0.0.1")) is None
+    assert api.rate_limited(client_request("10.0.0.1")) is None
+    response = api.rate_limited(client_request("10.0.0.1"))
+    assert response is not None and response.status_code == 429
+    assert response.headers["Retry-After"] == "60"
+    assert api.rate_limited(client_request("10.0.0.2")) is None
+
+
+def test_rate_limit_disabled(api, monkeypatch) -> None:
+    monkeypatch.setattr(api, "rate_limit", 0)
+    for _ in range(5):
+        assert api.rate_limited(client_request("10.0.0.3")) is None
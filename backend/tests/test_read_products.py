@@ -0,0 +1,59 @@
+import json
+import pytest
+
+from import_data_to_weaviate import read_products
+
+products = {
+    "8116": {
+        "name": 'Licorice "Root", 450 mg',
+        "brand": "Nature's Answer",
+        "rating": 4.4,
+        "reviews": ["great {not a brace}", "back\\slash", "café ❤ 😀"],
+    },
+    'id with "quotes" and , : { }': {"rating": 5, "reviews": []},
+    "12": {"rating": 12345678901234567890, "nested": {"a": [1, 2, {"b": None}]}},
+}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 7, 16, 64, 1 << 20])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_chunk_sizes(tmp_path, chunk_size: int, indent) -> None:
+    path = tmp_path / "dataset.json"
+    # ensure_ascii writes \u escapes, so chunk boundaries also fall inside them
+    path.write_text(json.dumps(products, indent=indent, ensure_ascii=True))
+    assert dict(read_products(path, chunk_size)) == products
+
+
+def test_every_chunk_boundary(tmp_path) -> None:
+    path = tmp_path / "dataset.json"
+    text = json.dumps(products, ensure_ascii=False)
+    path.write_text(text)
+    for chunk_size in range(1, len(text) + 1):
+        assert dict(read_products(path, chunk_size)) == products, chunk_size
+
+
+def test_empty_object(tmp_path) -> None:
+    path = tmp_path / "dataset.json"
+    path.write_text(" {\n} ")
+    assert list(read_products(path, 1)) == []
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        "[1, 2]",
+        '{"a": {"x": 1}',
+        '{"a" {"x": 1}}',
+        '{"a": {"x": 1} x}',
+        '{"a": {"x": ',
+        '{"a": 12',
+        '{"a": 1,}',
+    ],
+)
+@pytest.mark.parametrize("chunk_size", [1, 3, 1 << 20])
+def test_malformed_input(tmp_path, text: str, chunk_size: int) -> None:
+    path = tmp_path / "dataset.json"
+    path.write_text(text)
+    with pytest.raises(ValueError):
+        list(read_products(path, chunk_size))
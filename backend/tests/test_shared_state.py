@@ -0,0 +1,91 @@
+import sqlite3
+import threading
+import time
+
+from shared_state import SQLiteState
+
+
+def test_buffered_updates_are_shared_after_flush(tmp_path) -> None:
+    first = SQLiteState(tmp_path / "state.sqlite")
+    second = SQLiteState(tmp_path / "state.sqlite")
+
+    first.incr("requests")
+    first.incr("requests", 2)
+    first.maximum("last_hit", 5.0)
+    first.set("cache_count", {"count": 3})
+    assert first.counter("requests") == 3
+    assert first.get("cache_count") == {"count": 3}
+    assert second.counter("requests") == 0
+
+    first.flush()
+    second.incr("requests")
+    assert second.counter("requests") == 4
+    assert second.counters("last_") == {"last_hit": 5.0}
+    assert second.get("cache_count") == {"count": 3}
+    first.close()
+    second.close()
+
+
+def test_take_includes_buffered_updates(tmp_path) -> None:
+    first = SQLiteState(tmp_path / "state.sqlite")
+    second = SQLiteState(tmp_path / "state.sqlite")
+
+    first.incr("hits:a")
+    first.flush()
+    first.incr("hits:a")
+    second.incr("hits:b")
+
+    assert second.take("hits:") == {"hits:a": 1, "hits:b": 1}
+    assert first.counters("hits:") == {"hits:a": 1}
+    assert first.take("hits:") == {"hits:a": 1}
+    assert first.counters("hits:") == {}
+    first.close()
+    second.close()
+
+
+def test_add_is_a_lease(tmp_path) -> None:
+    first = SQLiteState(tmp_path / "state.sqlite")
+    second = SQLiteState(tmp_path / "state.sqlite")
+
+    assert first.add("compactor", 1, ttl=60)
+    assert not second.add("compactor", 2, ttl=60)
+    assert second.get("compactor") == 1
+    first.close()
+    second.close()
+
+
+def test_window_counter_skips_a_locked_database(tmp_path) -> None:
+    state = SQLiteState(tmp_path / "state.sqlite")
+    assert state.incr("rate_limit:a", ttl=60) == 1
+
+    blocker = sqlite3.connect(str(tmp_path / "state.sqlite"), isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    assert state.incr("rate_limit:a", ttl=60) == 2
+    blocker.execute("ROLLBACK")
+    blocker.close()
+
+    assert state.counter("rate_limit:a") == 1
+    state.close()
+
+
+def test_close_waits_for_a_running_flush(tmp_path) -> None:
+    state = SQLiteState(tmp_path / "state.sqlite")
+    state.incr("requests")
+    released = threading.Event()
+
+    def slow_flush() -> None:
+        with state.flush_lock:
+            released.wait(5)
+            state.write_pending()
+
+    flusher = threading.Thread(target=slow_flush)
+    flusher.start()
+    threading.Timer(0.2, released.set).start()
+    start = time.perf_counter()
+    state.close()
+    flusher.join()
+
+    assert time.perf_counter() - start >= 0.15
+    reopened = SQLiteState(tmp_path / "state.sqlite")
+    assert reopened.counter("requests") == 1
+    reopened.close()
@@ -0,0 +1,133 @@
+import asyncio
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution() -> None:
+    flight = SingleFlight()
+    calls = 0
+
+    async def fn() -> str:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def run() -> list:
+        return await asyncio.gather(*[flight.do("joint pain", fn) for _ in range(5)])
+
+    results = asyncio.run(run())
+    assert calls == 1
+    assert [result for result, _ in results] == ["result"] * 5
+    assert sorted(shared for _, shared in results) == [False] + [True] * 4
+    assert flight.stats() == {"in_flight": 0, "executions": 1, "shared": 4}
+
+
+def test_exception_reaches_every_waiter() -> None:
+    flight = SingleFlight()
+
+    async def fn() -> str:
+        await asyncio.sleep(0.01)
+        raise ValueError("weaviate unavailable")
+
+    async def run() -> list:
+        return await asyncio.gather(
+            *[flight.do("joint pain", fn) for _ in range(3)], return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_finished_execution_is_not_reused() -> None:
+    flight = SingleFlight()
+    calls = 0
+
+    async def fn() -> int:
+        nonlocal calls
+        calls += 1
+        return calls
+
+    async def run() -> list:
+        first = await flight.do("joint pain", fn)
+        second = await flight.do("joint pain", fn)
+        return [first, second]
+
+    assert asyncio.run(run()) == [(1, False), (2, False)]
+
+
+async def collect(iterator) -> list:
+    return [item async for item in iterator]
+
+
+def test_late_subscriber_gets_the_earlier_items_replayed() -> None:
+    flight = SingleFlight()
+
+    async def run() -> tuple:
+        first_sent = asyncio.Event()
+
+        async def items():
+            yield {"query": "{Get{Product{name}}}"}
+            first_sent.set()
+            await asyncio.sleep(0.01)
+            yield {"results": ["product"]}
+            yield {"generative_summary": "summary"}
+
+        execution, _ = flight.broadcast("joint pain", items)
+        early = asyncio.ensure_future(collect(execution.subscribe()))
+        await first_sent.wait()
+        # Joins after the first line was sent
+        late, shared = flight.broadcast("joint pain", items)
+        assert shared and late is execution
+        assert len(execution.items) == 1
+        return await early, await collect(late.subscribe())
+
+    early, late = asyncio.run(run())
+    assert early == late
+    assert [list(item) for item in late] == [
+        ["query"],
+        ["results"],
+        ["generative_summary"],
+    ]
+    assert flight.stats() == {"in_flight": 0, "executions": 1, "shared": 1}
+
+
+def test_broadcast_error_reaches_late_subscribers() -> None:
+    flight = SingleFlight()
+
+    async def items():
+        yield {"query": "{Get{Product{name}}}"}
+        raise ValueError("weaviate unavailable")
+
+    async def run() -> list:
+        execution, _ = flight.broadcast("joint pain", items)
+        await execution.task
+        received = []
+        with pytest.raises(ValueError):
+            async for item in execution.subscribe():
+                received.append(item)
+        return received
+
+    assert asyncio.run(run()) == [{"query": "{Get{Product{name}}}"}]
+
+
+def test_finished_broadcast_keeps_a_newer_registration() -> None:
+    flight = SingleFlight()
+
+    async def items(*values: str):
+        for value in values:
+            await asyncio.sleep(0.01)
+            yield value
+
+    async def run() -> tuple:
+        old, _ = flight.broadcast("joint pain", lambda: items("old"))
+        # A newer execution takes the key before the old one finishes
+        flight.calls.pop("joint pain")
+        new, _ = flight.broadcast("joint pain", lambda: items("new", "newer"))
+        await old.task
+        joined, shared = flight.broadcast("joint pain", lambda: items("unused"))
+        return await collect(joined.subscribe()), joined is new, shared
+
+    assert asyncio.run(run()) == (["new", "newer"], True, True)
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from vector_index import VectorIndex
+
+
+def search(index: VectorIndex, vector: list) -> tuple:
+    match = index.search(vector)
+    assert match is not None
+    return match
+
+
+def test_search_returns_the_closest_id_and_cosine_distance() -> None:
+    index = VectorIndex(dimensions=3, capacity=1)
+    assert index.search([1, 0, 0]) is None
+    index.add("x", [2, 0, 0])
+    index.add("y", [0, 3, 0])
+    index.add("xy", [1, 1, 0])
+
+    assert search(index, [5, 0, 0]) == ("x", pytest.approx(0.0, abs=1e-6))
+    closest, distance = search(index, [1, 0.9, 0])
+    assert closest == "xy"
+    assert distance == pytest.approx(1 - 1.9 / (np.sqrt(2) * np.sqrt(1.81)), abs=1e-6)
+    # Orthogonal vectors are at distance 1
+    assert search(index, [0, 0, 1])[1] == pytest.approx(1.0, abs=1e-6)
+    assert VectorIndex(dimensions=3).search([0, 0, 1]) is None
+
+
+def test_add_replaces_the_vector_of_an_existing_id() -> None:
+    index = VectorIndex(dimensions=2)
+    index.add("a", [1, 0])
+    index.add("b", [0, 1])
+    index.add("a", [-1, 0])
+
+    assert len(index) == 2
+    assert search(index, [-1, 0]) == ("a", pytest.approx(0.0, abs=1e-6))
+
+
+def test_remove() -> None:
+    index = VectorIndex(dimensions=2)
+    index.add("a", [1, 0])
+    index.add("b", [0, 1])
+    index.remove({"a"})
+    index.add("b", [1, 1])
+
+    assert index.ids == ["b"]
+    assert search(index, [1, 0])[0] == "b"
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_save_and_load(tmp_path, mmap: bool) -> None:
+    index = VectorIndex(dimensions=2)
+    index.generation = 7
+    index.add("a", [1, 0])
+    index.add("b", [0, 1])
+    index.save(tmp_path / "semantic_index")
+
+    loaded = VectorIndex.load(tmp_path / "semantic_index", mmap=mmap)
+    assert loaded.generation == 7
+    assert loaded.ids == ["a", "b"]
+    assert search(loaded, [0, 2])[0] == "b"
+    # A memory-mapped matrix is copied before it changes, the file stays as saved
+    loaded.add("a", [0, -1])
+    loaded.add("c", [1, 1])
+    assert loaded.ids == ["a", "b", "c"]
+    assert search(loaded, [0, -1])[0] == "a"
+    assert search(VectorIndex.load(tmp_path / "semantic_index"), [1, 0])[0] == "a"
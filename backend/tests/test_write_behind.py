@@ -0,0 +1,86 @@
+import asyncio
+
+from write_behind import WriteBehindQueue
+
+
+class Recorder:
+    def __init__(self, delay: float = 0.0, fail: bool = False) -> None:
+        self.batches: list = []
+        self.delay = delay
+        self.fail = fail
+
+    async def __call__(self, batch: list) -> None:
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("weaviate unavailable")
+        self.batches.append(batch)
+
+
+def test_items_are_flushed_in_batches() -> None:
+    recorder = Recorder()
+
+    async def run() -> WriteBehindQueue:
+        queue = WriteBehindQueue(recorder, batch_size=3, flush_interval=0.05)
+        queue.start()
+        for i in range(7):
+            assert queue.put(i)
+        await asyncio.sleep(0.2)
+        await queue.close()
+        return queue
+
+    queue = asyncio.run(run())
+    assert recorder.batches == [[0, 1, 2], [3, 4, 5], [6]]
+    assert queue.stats()["batches"] == 3
+    assert queue.stats()["flushed"] == 7
+
+
+def test_full_queue_drops_items() -> None:
+    recorder = Recorder()
+
+    async def run() -> WriteBehindQueue:
+        queue = WriteBehindQueue(recorder, max_size=2)
+        results = [queue.put(i) for i in range(4)]
+        assert results == [True, True, False, False]
+        await queue.close()
+        return queue
+
+    queue = asyncio.run(run())
+    assert recorder.batches == [[0, 1]]
+    assert (queue.enqueued, queue.dropped) == (2, 2)
+
+
+def test_close_drains_queued_and_in_flight_items() -> None:
+    recorder = Recorder(delay=0.05)
+
+    async def run() -> WriteBehindQueue:
+        queue = WriteBehindQueue(recorder, batch_size=2, flush_interval=0.01)
+        queue.start()
+        for i in range(5):
+            queue.put(i)
+        # The first batch is being written when the queue closes
+        await asyncio.sleep(0.03)
+        await queue.close()
+        assert not queue.put(5)
+        return queue
+
+    queue = asyncio.run(run())
+    assert sorted(item for batch in recorder.batches for item in batch) == [
+        0,
+        1,
+        2,
+        3,
+        4,
+    ]
+    assert all(len(batch) <= 2 for batch in recorder.batches)
+    assert queue.dropped == 1
+
+
+def test_failed_batches_are_counted() -> None:
+    async def run() -> WriteBehindQueue:
+        queue = WriteBehindQueue(Recorder(fail=True), batch_size=10)
+        queue.put("entry")
+        await queue.close()
+        return queue
+
+    queue = asyncio.run(run())
+    assert (queue.flushed, queue.failed) == (0, 1)
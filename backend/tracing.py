@@ -0,0 +1,179 @@
+import logging
+import os
+import time
+import uuid
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+from typing import Iterator, Optional
+
+import orjson
+
+# Requests slower than SLOW_QUERY_THRESHOLD seconds are written to the slow query log, 0 disables it
+slow_query_threshold = float(os.environ.get("SLOW_QUERY_THRESHOLD", 5))
+slow_query_log_path = os.environ.get("SLOW_QUERY_LOG", "slow_queries.jsonl")
+slow_query_log_max_bytes = int(
+    os.environ.get("SLOW_QUERY_LOG_MAX_BYTES", 10 * 1024 * 1024)
+)
+slow_query_log_backups = int(os.environ.get("SLOW_QUERY_LOG_BACKUPS", 5))
+
+# Id of the current HTTP request, set by RequestIdMiddleware
+request_id: ContextVar[str] = ContextVar("request_id", default="")
+current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+# Index of the innermost open span, tasks started inside a span inherit it as their parent
+current_span: ContextVar[Optional[int]] = ContextVar("current_span", default=None)
+
+
+class Trace:
+    """Spans and attributes of one request.
+    Spans are kept in start order, every span references its parent by index.
+    """
+
+    def __init__(self, endpoint: str, query: str) -> None:
+        self.id = request_id.get() or uuid.uuid4().hex
+        self.endpoint = endpoint
+        self.query = query
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.seconds = 0.0
+        self.spans: list = []
+        self.attributes: dict = {}
+
+    def offset_ms(self) -> float:
+        """Milliseconds since the request started"""
+        return round((time.perf_counter() - self.start) * 1000, 2)
+
+    def to_dict(self) -> dict:
+        """Return the trace as a slow query log record"""
+        return {
+            "request_id": self.id,
+            "endpoint": self.endpoint,
+            "query": self.query,
+            **self.attributes,
+            "started_at": self.started_at,
+            "ms": round(self.seconds * 1000, 2),
+            "spans": self.spans,
+        }
+
+
+def create_slow_query_logger() -> Optional[logging.Logger]:
+    """Create the logger writing slow requests as JSON lines to a rotating file
+    @returns logging.Logger | None - None if the slow query log is disabled
+    """
+    if not slow_query_threshold or not slow_query_log_path:
+        return None
+    logger = logging.getLogger("healthsearch.slow_queries")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    if not logger.handlers:
+        handler = RotatingFileHandler(
+            slow_query_log_path,
+            maxBytes=slow_query_log_max_bytes,
+            backupCount=slow_query_log_backups,
+            encoding="utf-8",
+            # The file is only created by the first slow query, not by importing the API
+            delay=True,
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+    return logger
+
+
+slow_query_logger = create_slow_query_logger()
+
+
+@contextmanager
+def start_trace(endpoint: str, query: str) -> Iterator[Trace]:
+    """Trace a request, it is written to the slow query log if it took longer than slow_query_threshold
+    @parameter endpoint : str - Endpoint label
+    @parameter query : str - Normalized natural language query
+    """
+    trace = Trace(endpoint, query)
+    trace_token = current_trace.set(trace)
+    span_token = current_span.set(None)
+    try:
+        yield trace
+    except BaseException as e:
+        trace.attributes["error"] = str(e) or type(e).__name__
+        raise
+    finally:
+        trace.seconds = time.perf_counter() - trace.start
+        try:
+            current_trace.reset(trace_token)
+            current_span.reset(span_token)
+        except ValueError:
+            # A streamed response closed by the client is finalized in another context
+            pass
+        if slow_query_logger is not None and trace.seconds >= slow_query_threshold:
+            slow_query_logger.info(orjson.dumps(trace.to_dict()).decode())
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[dict]:
+    """Record a span of the current trace, does nothing outside of a trace
+    @parameter name : str - Span name, e.g. a pipeline stage
+    @parameter attributes : dict - Attributes stored with the span, more can be added to the yielded record
+    """
+    trace = current_trace.get()
+    if trace is None:
+        yield attributes
+        return
+
+    record = {
+        "name": name,
+        "parent": current_span.get(),
+        "start_ms": trace.offset_ms(),
+        "ms": None,
+        **attributes,
+    }
+    token = current_span.set(len(trace.spans))
+    trace.spans.append(record)
+    try:
+        yield record
+    except BaseException as e:
+        record["error"] = str(e) or type(e).__name__
+        raise
+    finally:
+        record["ms"] = round(trace.offset_ms() - record["start_ms"], 2)
+        try:
+            current_span.reset(token)
+        except ValueError:
+            pass
+
+
+def annotate(**attributes) -> None:
+    """Add attributes to the current trace, e.g. the generated GraphQL query"""
+    trace = current_trace.get()
+    if trace is not None:
+        trace.attributes.update(attributes)
+
+
+class RequestIdMiddleware:
+    """ASGI middleware giving every HTTP request an id, taken from the X-Request-ID header or generated.
+    The id is returned in the X-Request-ID response header and used as the trace id.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        value = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")
+        value = value[:128] or uuid.uuid4().hex
+        token = request_id.set(value)
+
+        async def send_with_id(message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-request-id", value.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id.reset(token)
@@ -0,0 +1,50 @@
+import json
+import numpy as np
+
+from pathlib import Path
+from typing import Optional
+
+
+class VectorFile:
+    """Product vectors stored as a float32 matrix (.npy) with the product id of every row (.json).
+    Loaded memory-mapped, so a row is a view into the file and only the rows that are read are paged in.
+    """
+
+    def __init__(self, ids: list, matrix: np.ndarray) -> None:
+        self.ids = ids
+        self.matrix = matrix
+        self.rows = {product_id: row for row, product_id in enumerate(ids)}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def get(self, product_id: str) -> Optional[np.ndarray]:
+        """Return the vector of a product
+        @parameter product_id : str - Key of the product in the dataset
+        @returns np.ndarray | None - Row of the matrix (no copy), None if the product has no vector
+        """
+        row = self.rows.get(product_id)
+        return None if row is None else self.matrix[row]
+
+    def save(self, path: Path) -> None:
+        """Write the vectors as path.npy and the ids as path.json
+        @parameter path : Path - Path without suffix
+        @returns None
+        """
+        np.save(path.with_suffix(".npy"), np.asarray(self.matrix, dtype=np.float32))
+        path.with_suffix(".json").write_text(json.dumps({"ids": self.ids}))
+
+    @classmethod
+    def load(cls, path: Path, mmap: bool = True) -> "VectorFile":
+        """Load vectors written with save()
+        @parameter path : Path - Path without suffix
+        @parameter mmap : bool - Memory-map the matrix instead of reading it
+        @returns VectorFile - Loaded vectors
+        """
+        matrix = np.load(path.with_suffix(".npy"), mmap_mode="r" if mmap else None)
+        ids = json.loads(path.with_suffix(".json").read_text())["ids"]
+        if len(ids) != matrix.shape[0]:
+            raise ValueError(
+                f"{path} has {matrix.shape[0]} vectors but {len(ids)} product ids"
+            )
+        return cls(ids, matrix)
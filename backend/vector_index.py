@@ -0,0 +1,113 @@
+import json
+import numpy as np
+
+from pathlib import Path
+from typing import Optional, Tuple
+
+
+class VectorIndex:
+    """In-memory cosine index over float32 vectors, searched with a single matrix-vector product.
+    Rows are normalized on insert so the cosine distance is 1 - dot product, like Weaviate's cosine distance.
+    """
+
+    def __init__(self, dimensions: int = 1536, capacity: int = 1024) -> None:
+        self.dimensions = dimensions
+        self.matrix = np.zeros((capacity, dimensions), dtype=np.float32)
+        self.ids: list = []
+        self.rows: dict = {}  # id -> row of the matrix
+        self.generation = 0  # Cache generation the vectors belong to
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, id: str, vector) -> None:
+        """Add a vector to the index or replace the vector of an id already in it, the matrix grows by doubling its capacity
+        @parameter id : str - UUID of the Weaviate object
+        @parameter vector : list | np.ndarray - Vector of the object
+        @returns None
+        """
+        row = self.rows.get(id)
+        if row is None:
+            if len(self.ids) == self.matrix.shape[0]:
+                matrix = np.zeros(
+                    (max(1, 2 * self.matrix.shape[0]), self.dimensions),
+                    dtype=np.float32,
+                )
+                matrix[: len(self.ids)] = self.matrix[: len(self.ids)]
+                self.matrix = matrix
+            row = len(self.ids)
+            self.ids.append(id)
+            self.rows[id] = row
+        elif not self.matrix.flags.writeable:
+            # A memory-mapped matrix is copied before it is changed
+            self.matrix = np.array(self.matrix)
+
+        self.matrix[row] = normalize(vector)
+
+    def search(self, vector) -> Optional[Tuple[str, float]]:
+        """Find the closest vector
+        @parameter vector : list | np.ndarray - Query vector
+        @returns (str, float) | None - UUID and cosine distance of the closest object, None if the index is empty
+        """
+        if not self.ids:
+            return None
+
+        similarities = self.matrix[: len(self.ids)] @ normalize(vector)
+        best = int(np.argmax(similarities))
+        return self.ids[best], float(1.0 - similarities[best])
+
+    def remove(self, ids: set) -> None:
+        """Remove vectors from the index
+        @parameter ids : set - UUIDs of the objects to remove
+        @returns None
+        """
+        keep = [row for row, id in enumerate(self.ids) if id not in ids]
+        if len(keep) == len(self.ids):
+            return
+        matrix = np.zeros((max(1024, len(keep)), self.dimensions), dtype=np.float32)
+        matrix[: len(keep)] = self.matrix[keep]
+        self.matrix = matrix
+        self.ids = [self.ids[row] for row in keep]
+        self.rows = {id: row for row, id in enumerate(self.ids)}
+
+    def clear(self) -> None:
+        """Remove all vectors"""
+        self.matrix = np.zeros((1024, self.dimensions), dtype=np.float32)
+        self.ids = []
+        self.rows = {}
+
+    def save(self, path: Path) -> None:
+        """Write the index to disk as a .npy matrix and a .json file with the ids and generation
+        @parameter path : Path - Path without suffix
+        @returns None
+        """
+        np.save(path.with_suffix(".npy"), self.matrix[: len(self.ids)])
+        path.with_suffix(".json").write_text(
+            json.dumps({"generation": self.generation, "ids": self.ids})
+        )
+
+    @classmethod
+    def load(cls, path: Path, mmap: bool = True) -> "VectorIndex":
+        """Load an index written with save()
+        @parameter path : Path - Path without suffix
+        @parameter mmap : bool - Memory-map the matrix instead of reading it, it is copied on the first add()
+        @returns VectorIndex - Loaded index
+        """
+        matrix = np.load(path.with_suffix(".npy"), mmap_mode="r" if mmap else None)
+        index = cls(dimensions=matrix.shape[1], capacity=0)
+        index.matrix = matrix
+        meta = json.loads(path.with_suffix(".json").read_text())
+        index.ids = meta["ids"]
+        index.rows = {id: row for row, id in enumerate(index.ids)}
+        index.generation = meta["generation"]
+        return index
+
+
+def normalize(vector) -> np.ndarray:
+    """Return a float32 unit vector
+    @parameter vector : list | np.ndarray - Vector
+    @returns np.ndarray - Normalized vector
+    """
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
@@ -0,0 +1,148 @@
+import asyncio
+import time
+
+from typing import Awaitable, Callable, Optional
+
+from wasabi import msg  # type: ignore[import]
+
+
+class WriteBehindQueue:
+    """Bounded queue of writes that are flushed in batches by a background task.
+    put() never waits: the caller continues right away, and writes are dropped (and counted) while the queue is full.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[list], Awaitable[None]],
+        max_size: int = 1000,
+        batch_size: int = 50,
+        flush_interval: float = 0.5,
+    ) -> None:
+        """
+        @parameter flush : Callable - Coroutine function that writes a list of items
+        @parameter max_size : int - Items waiting to be flushed before new ones are dropped
+        @parameter batch_size : int - Items per flush
+        @parameter flush_interval : float - Seconds to wait for a batch to fill up after its first item
+        """
+        self.flush = flush
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self.task: Optional[asyncio.Task] = None
+        self.writing: Optional[asyncio.Future] = None
+        self.pending: list = (
+            []
+        )  # batch being collected, flushed by close() if the task is cancelled
+        self.closed = False
+        self.enqueued = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.failed = 0
+        self.batches = 0
+        self.flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+
+    def start(self) -> None:
+        """Start the background flush task, call this inside the event loop"""
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    def put(self, item) -> bool:
+        """Queue an item for the next flush
+        @parameter item : object - Item passed to flush
+        @returns bool - False if the item was dropped because the queue is full or closed
+        """
+        if self.closed:
+            self.dropped += 1
+            return False
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    async def next_batch(self) -> list:
+        """Wait for an item, then collect more until the batch is full or flush_interval passed"""
+        self.pending.append(await self.queue.get())
+        deadline = time.monotonic() + self.flush_interval
+        while len(self.pending) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                self.pending.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        batch, self.pending = self.pending, []
+        return batch
+
+    async def write(self, batch: list) -> None:
+        """Flush one batch and record its latency, a failed batch is logged and dropped"""
+        start = time.perf_counter()
+        try:
+            await self.flush(batch)
+            self.flushed += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            msg.warn(f"Write-behind flush of {len(batch)} items failed: {str(e)}")
+        seconds = time.perf_counter() - start
+        self.batches += 1
+        self.flush_seconds += seconds
+        self.max_flush_seconds = max(self.max_flush_seconds, seconds)
+
+    async def run(self) -> None:
+        """Flush batches until the task is cancelled"""
+        while True:
+            batch = await self.next_batch()
+            # Shielded, so close() cancelling the task doesn't abort a batch half way
+            self.writing = asyncio.ensure_future(self.write(batch))
+            await asyncio.shield(self.writing)
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """Stop accepting items and flush everything that is still queued
+        @parameter timeout : float - Seconds to wait for the remaining flushes
+        @returns None
+        """
+        self.closed = True
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        if self.writing is not None:
+            await self.writing
+
+        async def drain() -> None:
+            while self.pending or not self.queue.empty():
+                batch, self.pending = self.pending, []
+                while not self.queue.empty() and len(batch) < self.batch_size:
+                    batch.append(self.queue.get_nowait())
+                await self.write(batch)
+
+        try:
+            await asyncio.wait_for(drain(), timeout)
+        except asyncio.TimeoutError:
+            msg.warn(f"Write-behind queue closed with {self.queue.qsize()} items left")
+
+    def stats(self) -> dict:
+        """Return queue depth, counters and flush latency
+        @returns dict - Queue statistics
+        """
+        return {
+            "depth": self.queue.qsize(),
+            "max_size": self.queue.maxsize,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "batches": self.batches,
+            "avg_flush_ms": (
+                round(self.flush_seconds / self.batches * 1000, 2)
+                if self.batches
+                else 0.0
+            ),
+            "max_flush_ms": round(self.max_flush_seconds * 1000, 2),
+        }
@@ -6,14 +6,14 @@ import { FaArrowRight, FaArrowLeft } from 'react-icons/fa';
 interface ConsoleCardProps {
     onSend: (inputValue: string) => void;
     loading: boolean;
-    cachedQueries: string[];
+    cached: number;
 }
 
 // Define the ConsoleCard functional component
 const ConsoleCard: React.FC<ConsoleCardProps> = ({
     onSend,
     loading,
-    cachedQueries,
+    cached,
 }) => {
     // Define state variables for tooltip visibility and input value
     const [showTooltip, setShowTooltip] = useState(false);
@@ -37,7 +37,8 @@ const ConsoleCard: React.FC<ConsoleCardProps> = ({
         'improves depression and gives energy',
     ];
 
-    // If you want to display the cached queries, you can combine them with your predefined queries like this:
+    // If you want to display the cached queries, you can fetch them from the /admin/cached_queries endpoint
+    // and combine them with your predefined queries like this:
     // const allSuggestions = [...searchSuggestions, ...cachedQueries];
 
     const allSuggestions = searchSuggestions;
@@ -128,7 +129,7 @@ const ConsoleCard: React.FC<ConsoleCardProps> = ({
                     </div>
                 </div>
                 <div className="text-center text-xs mt-2 font-mono text-zinc-500">
-                    Saved queries: {cachedQueries.length}
+                    Saved queries: {cached}
                 </div>
                 {/* Button for showing the tooltip and sending the input value */}
                 <div className="flex justify-between pt-5">
@@ -1,14 +1,14 @@
 // Import React and other necessary dependencies
 import React from 'react';
-import { Product } from './ResultsCard';
+import { ProductSummary } from './ResultsCard';
 import { GiMedicinePills } from 'react-icons/gi';
 import { FaStar, FaStarHalfAlt, FaRegStar } from 'react-icons/fa';
 import Typewriter from 'typewriter-effect';
 
 // Define the properties of the ProductCard component
 interface ProductCardProps {
-    product: Product | null;
-    onProductSelect: (product: Product) => void;
+    product: ProductSummary | null;
+    onProductSelect: (product: ProductSummary) => void;
 }
 
 // Define the ProductCard functional component
@@ -67,7 +67,7 @@ const ProductCard: React.FC<ProductCardProps> = ({
                         </div>
                         {/* Display the number of reviews */}
                         <div className="text-xs text-slate-500 mt-1">
-                            {product?.reviews.length} reviews - click to see
+                            {product?.reviewCount} reviews - click to see
                             more
                         </div>
                     </div>
@@ -6,6 +6,7 @@ import { useMediaQuery } from 'react-responsive';
 
 // Define the properties of the Product type
 export interface Product {
+    id: string;
     brand: string;
     name: string;
     rating: number;
@@ -14,14 +15,31 @@ export interface Product {
     summary: string;
     effects: string;
     reviews: string[];
+    reviewCount: number;
     image: string;
     distance: number;
 }
 
+// Fields of the products in the result list, the details are loaded when a product is selected
+export const listFields = [
+    'name',
+    'brand',
+    'rating',
+    'image',
+    'summary',
+    'reviewCount',
+] as const;
+
+// Define the properties of the ProductSummary type
+export type ProductSummary = Pick<
+    Product,
+    (typeof listFields)[number] | 'id' | 'distance'
+>;
+
 // Define the properties of the ResultCard component
 interface CardProps {
-    products: Product[] | null;
-    onProductSelect: (product: Product) => void;
+    products: ProductSummary[] | null;
+    onProductSelect: (product: ProductSummary) => void;
 }
 
 // Define the ResultCard functional component
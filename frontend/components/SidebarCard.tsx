@@ -17,7 +17,6 @@ interface SidebarCardProps {
     isSidebarCollapsed: boolean;
     requests: number;
     cached: number;
-    cachedQueries: string[];
 }
 
 // Define the SidebarCard functional component
@@ -31,7 +30,6 @@ const SidebarCard: React.FC<SidebarCardProps> = ({
     isSidebarCollapsed,
     requests,
     cached,
-    cachedQueries,
 }) => {
     // Styles for the global scrollbar
     const scrollBarStyles = `
@@ -155,7 +153,7 @@ const SidebarCard: React.FC<SidebarCardProps> = ({
                     <ConsoleCard
                         onSend={onSend}
                         loading={loading}
-                        cachedQueries={cachedQueries}
+                        cached={cached}
                     />
                     {/* QueryCard for displaying transformed query */}
                     <QueryCard transformedQuery={transformedQuery} />
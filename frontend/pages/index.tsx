@@ -1,6 +1,10 @@
 // Import React and other necessary dependencies
 import React, { useState, useEffect } from 'react';
-import ResultCard, { Product } from '../components/ResultsCard';
+import ResultCard, {
+    Product,
+    ProductSummary,
+    listFields,
+} from '../components/ResultsCard';
 import GenerativeCard from '../components/GenerativeCard';
 import SidebarCard from '../components/SidebarCard';
 import { FaAngleRight, FaAngleLeft } from 'react-icons/fa';
@@ -14,14 +18,13 @@ export default function Home() {
 
     // State variables for product data manipulation
     const [transformedQuery, setTransformedQuery] = useState(''); // Transformed query
-    const [results, setResults] = useState<Product[]>([]); // Search results
+    const [results, setResults] = useState<ProductSummary[]>([]); // Search results
     const [selectedProduct, setSelectedProduct] = useState<Product | null>(
         null,
     ); // Selected product
 
     const [requests, setRequests] = useState<number>(0); // Number of requests
     const [cached, setCached] = useState<number>(0); // Number of cached results
-    const [cachedQueries, setCachedQueries] = useState<string[]>([]); // List of cached queries
 
     // State variable for generative search
     const [generativeResult, setGenerativeResult] = useState<string>(
@@ -32,14 +35,13 @@ export default function Home() {
     const checkApiHealth = async () => {
         try {
             // Change ENDPOINT based on your setup (Default to localhost:8000)
-            const response = await fetch('http://localhost:8000/health');
+            const response = await fetch('http://localhost:8000/ready');
             const responseData = await response.json();
 
             if (response.status === 200) {
                 setApiStatus('Online');
                 setRequests(responseData.requests);
                 setCached(responseData.cache_count);
-                setCachedQueries(responseData.cache_queries);
             } else {
                 setApiStatus('Offline');
             }
@@ -63,20 +65,43 @@ export default function Home() {
         try {
             // Change ENDPOINT based on your setup (Default to localhost:8000)
             const response = await fetch(
-                'http://localhost:8000/generate_query',
+                'http://localhost:8000/generate_query_stream',
                 {
                     method: 'POST',
                     headers: {
                         'Content-Type': 'application/json',
                     },
-                    body: JSON.stringify({ text: inputValue }),
+                    body: JSON.stringify({
+                        text: inputValue,
+                        fields: listFields,
+                    }),
                 },
             );
 
-            const responseData = await response.json();
-            setTransformedQuery(responseData.query);
-            setResults(responseData.results);
-            setGenerativeResult(responseData.generative_summary);
+            // Every line is a partial response, render each part as it arrives
+            const reader = response.body!.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                const lines = buffer.split('\n');
+                buffer = lines.pop() ?? '';
+                for (const line of lines) {
+                    if (!line.trim()) continue;
+                    const responseData = JSON.parse(line);
+                    if ('query' in responseData) {
+                        setTransformedQuery(responseData.query);
+                    }
+                    if ('results' in responseData) {
+                        setResults(responseData.results);
+                    }
+                    if ('generative_summary' in responseData) {
+                        setGenerativeResult(responseData.generative_summary);
+                    }
+                }
+            }
             setLoading(false);
         } catch (error) {
             setLoading(false);
@@ -88,9 +113,19 @@ export default function Home() {
         }
     };
 
-    // Function for handling the selection of a product
-    const handleProductSelect = (product: Product) => {
-        setSelectedProduct(product);
+    // Function for handling the selection of a product, loads all of its fields
+    const handleProductSelect = async (product: ProductSummary) => {
+        try {
+            // Change ENDPOINT based on your setup (Default to localhost:8000)
+            const response = await fetch(
+                `http://localhost:8000/product/${product.id}`,
+            );
+            if (response.status !== 200) return;
+            const details: Product = await response.json();
+            setSelectedProduct({ ...details, distance: product.distance });
+        } catch (error) {
+            checkApiHealth();
+        }
     };
 
     return (
@@ -132,7 +167,6 @@ export default function Home() {
                     isSidebarCollapsed={isSidebarCollapsed}
                     requests={requests}
                     cached={cached}
-                    cachedQueries={cachedQueries}
                 />
             </div>
             <div